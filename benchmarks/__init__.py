@@ -0,0 +1,5 @@
+"""
+Performance benchmarks for the ingest, buffering and plot update paths.
+
+Run with ``python -m benchmarks`` from the repository root.
+"""
@@ -0,0 +1,61 @@
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+from pathlib import Path
+from typing import List
+
+from benchmarks.suite import SUITE, Result
+
+parser = argparse.ArgumentParser(prog="python -m benchmarks")
+parser.add_argument("-o", "--output", type=Path, default=Path("benchmarks.json"))
+parser.add_argument("-r", "--rounds", type=int, default=10)
+parser.add_argument("-s", "--scale", type=int, default=1)
+parser.add_argument("-k", "--select", nargs="*", choices=sorted(SUITE))
+parser.add_argument("--compare", type=Path, help="previous results to compare to")
+parser.add_argument("--tolerance", type=float, default=0.2)
+args = parser.parse_args()
+
+
+def commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+results: List[Result] = []
+for group in args.select or SUITE:
+    for result in SUITE[group](args.rounds, args.scale):
+        print(f"{result.key:<45} {result.median * 1e3:>10.3f} ms")
+        results.append(result)
+
+report = dict(
+    datetime=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    commit=commit(),
+    machine=dict(
+        python=platform.python_version(),
+        implementation=platform.python_implementation(),
+        system=platform.system(),
+        processor=platform.processor() or platform.machine(),
+    ),
+    benchmarks={result.key: result.to_dict() for result in results},
+)
+args.output.write_text(json.dumps(report, indent=2))
+
+if args.compare:
+    previous = json.loads(args.compare.read_text())["benchmarks"]
+    regressions = [
+        (result.key, previous[result.key]["median"], result.median)
+        for result in results
+        if result.key in previous
+        and result.median > previous[result.key]["median"] * (1 + args.tolerance)
+    ]
+    for key, before, after in regressions:
+        print(f"REGRESSION {key}: {before * 1e3:.3f} ms -> {after * 1e3:.3f} ms")
+
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import contextlib
+import itertools
+from collections import Counter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Final,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+)
+from unittest.mock import patch
+
+import can
+import dearpygui.dearpygui as dpg
+import numpy as np
+
+from can_explorer import app, budget, layout, plotting
+from can_explorer.app import MainApp
+from can_explorer.can_bus import Recorder
+
+# Calls which only read state, rather than create or change items
+_QUERIES: Final = ("get_", "is_", "does_")
+
+
+class _Item(int):
+    """
+    Fake item tag which can also be used as a container context manager.
+    """
+
+    def __enter__(self) -> _Item:
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+def _size(value: Any) -> int:
+    # Bytes of data passed to dearpygui, which converts numbers to doubles
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return 8 * len(value)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return 0
+
+
+class FrameStats(NamedTuple):
+    calls: Counter
+    nbytes: int
+
+    @property
+    def operations(self) -> int:
+        """
+        Number of calls which create or change items.
+        """
+        return sum(n for name, n in self.calls.items() if not name.startswith(_QUERIES))
+
+
+class HeadlessDpg:
+    """
+    Stand-in for the dearpygui module where every item call is a no-op.
+
+    Constants (ie `mvXAxis`) are forwarded to the real module so configuration
+    dictionaries built at import time remain valid. Calls and the bytes of data
+    passed are recorded in total and per frame, where `frame` ends a frame and
+    runs the frame callbacks due.
+    """
+
+    def __init__(self) -> None:
+        self.calls: Counter = Counter()
+        self.nbytes = 0
+        self.frames: List[FrameStats] = []
+        self._frame: Counter = Counter()
+        self._frame_bytes = 0
+        self._callbacks: Dict[int, List[Callable]] = {}
+        self._tags = itertools.count(1)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("mv"):
+            return getattr(dpg, name)
+
+        def call(*args, **kwargs) -> _Item:
+            size = sum(map(_size, args)) + sum(map(_size, kwargs.values()))
+            self.calls[name] += 1
+            self.nbytes += size
+            self._frame[name] += 1
+            self._frame_bytes += size
+            return _Item(next(self._tags))
+
+        # Cache so subsequent lookups skip __getattr__
+        setattr(self, name, call)
+        return call
+
+    def get_frame_count(self) -> int:
+        return len(self.frames)
+
+    def set_frame_callback(self, frame: int, callback: Callable) -> None:
+        self._callbacks.setdefault(frame, []).append(callback)
+
+    def frame(self) -> FrameStats:
+        """
+        End the current frame.
+
+        Returns:
+            FrameStats: Calls made and bytes passed since the previous frame
+        """
+        for callback in self._callbacks.pop(len(self.frames), []):
+            callback()
+        stats = FrameStats(self._frame, self._frame_bytes)
+        self.frames.append(stats)
+        self._frame = Counter()
+        self._frame_bytes = 0
+        return stats
+
+
+@contextlib.contextmanager
+def headless() -> Iterator[HeadlessDpg]:
+    """
+    Patch all dearpygui usage within the app, layout and plotting modules.
+
+    Yields:
+        HeadlessDpg: Stub which records the number of calls per function
+    """
+    stub = HeadlessDpg()
+    with patch.object(plotting, "dpg", stub), patch.object(layout, "dpg", stub):
+        with patch.object(app, "dpg", stub):
+            with patch.object(layout.Font, "LABEL", 0, create=True):
+                yield stub
+
+
+class FakeClock:
+    """
+    Stand-in for the time module which only advances when told to.
+
+    Args:
+        start (float): Seconds
+    """
+
+    def __init__(self, start: float = 0.0) -> None:
+        self.now = start
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+    def monotonic(self) -> float:
+        return self.now
+
+    time = perf_counter = monotonic
+
+
+class ScriptedTraffic:
+    """
+    Deliver frames to a listener once the clock reaches their timestamp.
+
+    Args:
+        messages (Iterable[can.Message]): Frames in timestamp order
+        listener (can.Listener)
+    """
+
+    def __init__(self, messages: Iterable[can.Message], listener: can.Listener):
+        self.listener = listener
+        self._messages = iter(messages)
+        self._next: Optional[can.Message] = next(self._messages, None)
+
+    def feed(self, until: float) -> int:
+        """
+        Deliver the frames due.
+
+        Args:
+            until (float): Inclusive timestamp
+
+        Returns:
+            int: Number of frames delivered
+        """
+        count = 0
+        while self._next is not None and self._next.timestamp <= until:
+            self.listener.on_message_received(self._next)
+            self._next = next(self._messages, None)
+            count += 1
+        return count
+
+
+class Harness:
+    """
+    Drive an app one frame at a time without a display or worker thread, so
+    the work done per frame is deterministic.
+
+    Each frame advances a fake clock, delivers the scripted frames due, runs
+    a single iteration of the main loop and records the dearpygui calls made.
+
+    Args:
+        messages (Iterable[can.Message]): Scripted traffic, from timestamp 0
+        frame_time (float): Seconds per frame
+    """
+
+    def __init__(
+        self, messages: Iterable[can.Message], frame_time: float = 1 / 60
+    ) -> None:
+        self.messages = messages
+        self.frame_time = frame_time
+        self.clock = FakeClock()
+        self._stack = contextlib.ExitStack()
+
+    def __enter__(self) -> Harness:
+        self.stub = self._stack.enter_context(headless())
+        for module in (app, plotting, budget):
+            self._stack.enter_context(patch.object(module, "time", self.clock))
+
+        # Note: the state of MainApp is held by the class, so it is replaced
+        self.app = MainApp()
+        self.app.can_recorder = Recorder()
+        self.app.plot_manager = plotting.PlotManager()
+        self.app.overview = plotting.Overview()
+        self.app.heatmap = plotting.Heatmap()
+        self.traffic = ScriptedTraffic(self.messages, self.app.can_recorder.listener())
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self._stack.close()
+        return False
+
+    def frame(self) -> FrameStats:
+        """
+        Run a single frame.
+
+        Returns:
+            FrameStats
+        """
+        self.traffic.feed(self.clock.now)
+        self.app.step()
+        self.clock.advance(self.frame_time)
+        return self.stub.frame()
+
+    def run(self, frames: int) -> List[FrameStats]:
+        """
+        Run a number of frames.
+
+        Args:
+            frames (int)
+
+        Returns:
+            List[FrameStats]
+        """
+        return [self.frame() for _ in range(frames)]
@@ -0,0 +1,425 @@
+from __future__ import annotations
+
+import statistics
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import can
+
+from benchmarks import traffic
+from benchmarks.headless import headless
+from can_explorer import analysis, diff, indexer, ring
+from can_explorer.app import MainApp
+from can_explorer.can_bus import PayloadBuffer, Recorder, _Listener
+from can_explorer.generator import TrafficGenerator
+from can_explorer.layout import Default
+from can_explorer.pipeline import Batch, Filter, Pipeline, Stats, Store
+from can_explorer.plotting import Heatmap, Overview, PlotManager
+from can_explorer.replay import Replay
+from can_explorer.trigger import ByteMatch, Trigger
+
+PLOT_IDS: tuple = (10, 100, 1000)
+
+
+@dataclass
+class Result:
+    name: str
+    params: Dict[str, int]
+    items: int
+    rounds: List[float] = field(repr=False)
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.rounds)
+
+    def to_dict(self) -> dict:
+        result = asdict(self)
+        result.update(
+            min=min(self.rounds),
+            mean=statistics.fmean(self.rounds),
+            median=self.median,
+            stdev=statistics.stdev(self.rounds) if len(self.rounds) > 1 else 0.0,
+            items_per_second=self.items / self.median if self.median else 0.0,
+        )
+        return result
+
+    @property
+    def key(self) -> str:
+        params = ",".join(f"{k}={v}" for k, v in sorted(self.params.items()))
+        return f"{self.name}[{params}]"
+
+
+def measure(func: Callable, rounds: int, *args) -> List[float]:
+    """
+    Time a function over a number of rounds after a single warmup call.
+
+    Args:
+        func (Callable): Function to time
+        rounds (int): Number of timed calls
+        *args: Passed to func
+
+    Returns:
+        List[float]: Duration of each call in seconds
+    """
+    func(*args)
+    durations = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(*args)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def populated_recorder(n_ids: int) -> Recorder:
+    """
+    Create a recorder which has received traffic from a number of ids.
+
+    Args:
+        n_ids (int)
+
+    Returns:
+        Recorder
+    """
+    recorder = Recorder()
+    listener = _Listener(recorder)
+    for msg in traffic.synthetic(n_ids, n_ids * 10):
+        listener.on_message_received(msg)
+    return recorder
+
+
+def _feed(messages: List[can.Message], triggers: Iterable[Trigger] = ()) -> None:
+    recorder = Recorder()
+    for trigger in triggers:
+        recorder.triggers.add(trigger)
+    listener = _Listener(recorder)
+    for msg in messages:
+        listener.on_message_received(msg)
+
+
+def _process(messages: List[can.Message], stages: bool) -> None:
+    recorder = Recorder()
+    pipeline = Pipeline([Store(recorder)])
+    if stages:
+        pipeline.add(Filter(lambda msg: not msg.is_error_frame), inline=True, index=0)
+        pipeline.add(Stats(), inline=True)
+    size = pipeline.batch_size
+    for i in range(0, len(messages), size):
+        pipeline.process(Batch("", messages[i : i + size]))
+
+
+def _append(buffer: PayloadBuffer, payloads: List[bytes]) -> None:
+    for payload in payloads:
+        buffer.append(payload)
+
+
+def _slice(buffer: PayloadBuffer, limit: int) -> None:
+    buffer[len(buffer) - limit :]
+
+
+def _update(manager: PlotManager) -> None:
+    for can_id in manager.row:
+        manager.update(can_id)
+
+
+def bench_listener(rounds: int, scale: int) -> Iterator[Result]:
+    sources = dict(
+        synthetic=traffic.synthetic(100, 20_000 * scale),
+        ic_sim=traffic.ic_sim(scale),
+        fd=traffic.synthetic(100, 20_000 * scale, length=64, is_fd=True),
+    )
+    for source, messages in sources.items():
+        yield Result(
+            f"listener.{source}",
+            dict(scale=scale),
+            len(messages),
+            measure(_feed, rounds, messages),
+        )
+
+    # Triggers on ids which are never received should cost a lookup per frame
+    messages = sources["synthetic"]
+    triggers = [Trigger(ByteMatch(0x800 + i)) for i in range(100)]
+    yield Result(
+        "listener.triggers",
+        dict(scale=scale),
+        len(messages),
+        measure(_feed, rounds, messages, triggers),
+    )
+
+
+def bench_pipeline(rounds: int, scale: int) -> Iterator[Result]:
+    messages = traffic.synthetic(100, 20_000 * scale)
+    for name, stages in (("store", False), ("stages", True)):
+        yield Result(
+            f"pipeline.{name}",
+            dict(scale=scale),
+            len(messages),
+            measure(_process, rounds, messages, stages),
+        )
+
+
+def bench_payload_buffer(rounds: int, scale: int) -> Iterator[Result]:
+    for length in (8, 64):
+        messages = traffic.synthetic(1, PayloadBuffer.MAX * scale, length, length > 8)
+        payloads = [msg.data for msg in messages]
+        buffer = PayloadBuffer()
+
+        yield Result(
+            "payload_buffer.append",
+            dict(scale=scale, length=length),
+            len(payloads),
+            measure(_append, rounds, buffer, payloads),
+        )
+
+        for limit in (Default.BUFFER_SIZE, PayloadBuffer.MAX):
+            yield Result(
+                "payload_buffer.slice",
+                dict(limit=limit, length=length),
+                limit,
+                measure(_slice, rounds, buffer, limit),
+            )
+
+
+def _redraw(heatmap: Heatmap, recorder: Recorder) -> None:
+    heatmap.reset()
+    heatmap.update(recorder)
+
+
+def _classify(classifier: analysis.Classifier, recorder: Recorder) -> None:
+    classifier.update(recorder)
+    classifier.classify(list(recorder))
+
+
+def _classify_all(recorder: Recorder) -> None:
+    _classify(analysis.Classifier(), recorder)
+
+
+def _classify_new(classifier: analysis.Classifier, recorder: Recorder) -> None:
+    for buffer in recorder.values():
+        buffer.append(bytes(buffer.width))
+    _classify(classifier, recorder)
+
+
+def _set_limit(manager: PlotManager, limit: int) -> None:
+    manager.set_limit(limit)
+    manager._changed = 0.0
+    while manager.refresh(len(manager.row)):
+        pass
+
+
+def _index(path: Path) -> None:
+    indexer.index_path(path).unlink()
+    indexer.build(path)
+
+
+def _read(index: indexer.LogIndex, ids: tuple) -> None:
+    for _ in index.read(ids=ids):
+        pass
+
+
+def _replay(index: indexer.LogIndex, speed: Optional[float]) -> Replay:
+    player = Replay(index, Recorder().listener(), speed)
+    player.start()
+    player.wait()
+    return player
+
+
+def bench_plot_manager(rounds: int, scale: int) -> Iterator[Result]:
+    for n_ids in PLOT_IDS:
+        recorder = populated_recorder(n_ids)
+
+        with headless():
+            manager = PlotManager()
+            for can_id, payloads in sorted(recorder.items()):
+                manager.add(can_id, payloads)
+
+            yield Result(
+                "plot_manager.update",
+                dict(ids=n_ids),
+                n_ids,
+                measure(_update, rounds, manager),
+            )
+            yield Result(
+                "plot_manager.set_limit",
+                dict(ids=n_ids, limit=PayloadBuffer.MAX),
+                n_ids,
+                measure(_set_limit, rounds, manager, PayloadBuffer.MAX),
+            )
+
+
+def bench_repopulate(rounds: int, scale: int) -> Iterator[Result]:
+    for n_ids in PLOT_IDS:
+        app = MainApp()
+        app.can_recorder = populated_recorder(n_ids)
+
+        with headless():
+            app.plot_manager = PlotManager()
+
+            yield Result(
+                "app.repopulate",
+                dict(ids=n_ids),
+                n_ids,
+                measure(app.repopulate, rounds),
+            )
+
+
+def bench_overview(rounds: int, scale: int) -> Iterator[Result]:
+    for n_ids in PLOT_IDS:
+        recorder = populated_recorder(n_ids)
+
+        with headless():
+            overview = Overview()
+            overview.set_ids(sorted(recorder))
+
+            yield Result(
+                "overview.update",
+                dict(ids=n_ids),
+                n_ids,
+                measure(overview.update, rounds, recorder),
+            )
+
+
+def bench_heatmap(rounds: int, scale: int) -> Iterator[Result]:
+    for n_ids in PLOT_IDS:
+        recorder = populated_recorder(n_ids)
+
+        with headless():
+            heatmap = Heatmap()
+            heatmap.set_ids(sorted(recorder))
+
+            yield Result(
+                "heatmap.redraw",
+                dict(ids=n_ids),
+                n_ids,
+                measure(_redraw, rounds, heatmap, recorder),
+            )
+
+
+def bench_classifier(rounds: int, scale: int) -> Iterator[Result]:
+    for n_ids in PLOT_IDS:
+        recorder = populated_recorder(n_ids)
+
+        yield Result(
+            "classifier.classify",
+            dict(ids=n_ids),
+            n_ids,
+            measure(_classify_all, rounds, recorder),
+        )
+        classifier = analysis.Classifier()
+        _classify(classifier, recorder)
+        yield Result(
+            "classifier.update",
+            dict(ids=n_ids),
+            n_ids,
+            measure(_classify_new, rounds, classifier, recorder),
+        )
+
+
+def bench_indexer(rounds: int, scale: int) -> Iterator[Result]:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "capture.log"
+        path.write_bytes(traffic.DEMO_FILE.read_bytes() * 5 * scale)
+        index = indexer.build(path)
+        counts = index.counts()
+
+        yield Result(
+            "indexer.build",
+            dict(frames=sum(counts.values())),
+            sum(counts.values()),
+            measure(_index, rounds, path),
+        )
+        can_id = min(counts)
+        yield Result(
+            "indexer.read",
+            dict(frames=sum(counts.values()), ids=1),
+            counts[can_id],
+            measure(_read, rounds, index, (can_id,)),
+        )
+
+
+def _diff(first: Path, second: Path) -> None:
+    diff.compare(diff.load(first), diff.load(second))
+
+
+def bench_diff(rounds: int, scale: int) -> Iterator[Result]:
+    with tempfile.TemporaryDirectory() as tmp:
+        first, second = Path(tmp) / "first.log", Path(tmp) / "second.log"
+        first.write_bytes(traffic.DEMO_FILE.read_bytes() * 5 * scale)
+        second.write_bytes(traffic.DEMO_FILE.read_bytes() * 5 * scale)
+        frames = sum(indexer.build(first).counts().values())
+
+        yield Result(
+            "diff.compare",
+            dict(frames=frames),
+            2 * frames,
+            measure(_diff, rounds, first, second),
+        )
+
+
+def _write_log(path: Path, messages: List[can.Message]) -> indexer.LogIndex:
+    writer = can.CanutilsLogWriter(path)
+    for msg in messages:
+        writer.on_message_received(msg)
+    writer.stop()
+    return indexer.build(path)
+
+
+def bench_replay(rounds: int, scale: int) -> Iterator[Result]:
+    with tempfile.TemporaryDirectory() as tmp:
+        messages = list(TrafficGenerator.uniform(100 * scale).messages(1))
+        index = _write_log(Path(tmp) / "fast.log", messages)
+        yield Result(
+            "replay.max_speed",
+            dict(frames=len(messages)),
+            len(messages),
+            measure(_replay, rounds, index, None),
+        )
+
+        # Mean seconds frames were late rather than the time taken, at a rate
+        # the listener can keep up with
+        messages = list(TrafficGenerator.uniform(100, rate=10).messages(1))
+        index = _write_log(Path(tmp) / "timed.log", messages)
+        yield Result(
+            "replay.lag",
+            dict(frames=len(messages), speed=10),
+            len(messages),
+            [_replay(index, 10).lag for _ in range(rounds)],
+        )
+
+
+def _record(directory: Path, messages: List[can.Message], codec: str) -> None:
+    recorder = ring.RingRecorder(directory, segment_size=4 * 1024**2, codec=codec)
+    for i in range(0, len(messages), 512):
+        recorder.process(Batch("", messages[i : i + 512]))
+    recorder.close()
+
+
+def bench_ring(rounds: int, scale: int) -> Iterator[Result]:
+    messages = traffic.synthetic(100, 20_000 * scale)
+    with tempfile.TemporaryDirectory() as tmp:
+        for codec in sorted(ring.CODECS):
+            directory = Path(tmp) / codec
+            yield Result(
+                f"ring.{codec}",
+                dict(scale=scale),
+                len(messages),
+                measure(_record, rounds, directory, messages, codec),
+            )
+
+
+SUITE: Dict[str, Callable[[int, int], Iterator[Result]]] = dict(
+    listener=bench_listener,
+    pipeline=bench_pipeline,
+    payload_buffer=bench_payload_buffer,
+    plot_manager=bench_plot_manager,
+    repopulate=bench_repopulate,
+    overview=bench_overview,
+    heatmap=bench_heatmap,
+    classifier=bench_classifier,
+    indexer=bench_indexer,
+    diff=bench_diff,
+    replay=bench_replay,
+    ring=bench_ring,
+)
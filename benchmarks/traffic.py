@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from itertools import islice
+from typing import List
+
+import can
+
+from can_explorer.generator import Shape, TrafficGenerator
+from can_explorer.resources.demo import DEMO_FILE
+
+
+def synthetic(
+    n_ids: int, n_frames: int, length: int = 8, is_fd: bool = False
+) -> List[can.Message]:
+    """
+    Generate random frames spread evenly across a set of ids.
+
+    Args:
+        n_ids (int): Number of unique arbitration ids
+        n_frames (int): Total number of frames
+        length (int): Number of data bytes per frame
+        is_fd (bool)
+
+    Returns:
+        List[can.Message]: Frames in transmit order
+    """
+    generator = TrafficGenerator.uniform(n_ids, 1, length, Shape.NOISE, is_fd=is_fd)
+    return list(islice(generator.messages(), n_frames))
+
+
+def ic_sim(scale: int = 1) -> List[can.Message]:
+    """
+    Load the bundled demo log repeated a number of times.
+
+    Args:
+        scale (int): Number of times to repeat the log
+
+    Returns:
+        List[can.Message]: Frames in transmit order
+    """
+    base = list(can.CanutilsLogReader(DEMO_FILE))
+    return base * scale
@@ -1,16 +1,48 @@
 import argparse
 import sys
+from functools import partial
+from pathlib import Path
 
-from can_explorer import app
-from can_explorer.resources.demo import demo_config
+from can_explorer import app, diff, ring
+from can_explorer.resources.demo import demo_config, synthetic_config
+from can_explorer.session import SESSION_FILE
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--demo", action="store_true")
+parser.add_argument("--synthetic", type=int, metavar="IDS")
+parser.add_argument("--session", type=Path, nargs="?", const=SESSION_FILE)
+parser.add_argument("--memory", type=int, metavar="MB")
+parser.add_argument("--log", type=Path)
+parser.add_argument("--replay", type=Path)
+parser.add_argument(
+    "--diff", type=Path, nargs=2, metavar=("FIRST", "SECOND"), help="sessions or logs"
+)
+parser.add_argument("--record", type=Path, metavar="DIR", help="ring recording")
+parser.add_argument("--record-size", type=int, default=1024, metavar="MB")
+parser.add_argument(
+    "--speed", type=float, default=1.0, help="0 for as fast as possible"
+)
 args = parser.parse_args()
 
+if args.memory:
+    app.app.can_recorder.budget.limit = args.memory * 1024**2
 
-if args.demo:
+if args.record:
+    size = args.record_size * 1024**2 // ring.SEGMENTS
+    app.app.can_recorder.pipeline.add(ring.RingRecorder(args.record, size))
+
+if args.diff:
+    print(diff.report(diff.compare(*map(diff.load, args.diff))))
+elif args.demo:
     app.main(demo_config)
+elif args.synthetic:
+    app.main(partial(synthetic_config, args.synthetic))
+elif args.replay:
+    app.main(partial(app.app.set_replay, args.replay, args.speed or None))
+elif args.log:
+    app.main(partial(app.app.load_log, args.log))
+elif args.session:
+    app.main(partial(app.settings_session_load_callback, None, None, args.session))
 else:
     app.main()
 
@@ -0,0 +1,515 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import IntEnum
+from typing import (
+    Callable,
+    Dict,
+    Final,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from can_explorer.can_bus import CanKey, PayloadBuffer
+
+
+def payload_array(buffer: PayloadBuffer) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Copy the received payloads of a buffer into arrays, oldest first.
+
+    Args:
+        buffer (PayloadBuffer)
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Timestamps (n,) and payload bytes (n, width)
+    """
+    rows = buffer.held
+    data = np.frombuffer(buffer.raw(), dtype=np.uint8)
+    times = np.frombuffer(buffer.raw_timestamps(), dtype=np.float64)
+    data = data.reshape(len(times), buffer.width)
+    return times[len(times) - rows :], data[len(times) - rows :]
+
+
+def leading_values(data: np.ndarray) -> np.ndarray:
+    """
+    Get the big endian value of the leading bytes of payloads, as plotted.
+
+    Args:
+        data (np.ndarray): Payload bytes (..., width)
+
+    Returns:
+        np.ndarray: Values (...)
+    """
+    size = min(data.shape[-1], PayloadBuffer.VALUE_SIZE)
+    return data[..., :size] @ 256.0 ** np.arange(size - 1, -1, -1)
+
+
+def _newest_rows(
+    buffers: Sequence[PayloadBuffer], count: Union[int, Sequence[int]]
+) -> Iterator[Tuple[List[int], np.ndarray]]:
+    # Buffers with the same number of rows held and width are stacked together
+    counts = [count] * len(buffers) if isinstance(count, int) else count
+    groups: Dict[Tuple[int, int], List[Tuple[int, bytes]]] = {}
+    for i, buffer in enumerate(buffers):
+        width = buffer.width
+        raw = buffer.raw(min(counts[i], buffer.held))
+        if raw and len(raw) % width == 0:
+            groups.setdefault((len(raw) // width, width), []).append((i, raw))
+
+    for (rows, width), members in groups.items():
+        data = np.frombuffer(b"".join(raw for _, raw in members), dtype=np.uint8)
+        yield [i for i, _ in members], data.reshape(len(members), rows, width)
+
+
+def sample_values(
+    buffers: Sequence[PayloadBuffer], limit: int, columns: int
+) -> np.ndarray:
+    """
+    Sample the newest `limit` values of each buffer at evenly spaced positions.
+
+    Buffers with the same number of rows and width are processed together, so
+    the cost per buffer is little more than copying its rows.
+
+    Args:
+        buffers (Sequence[PayloadBuffer])
+        limit (int): Number of newest values, as plotted
+        columns (int): Number of samples
+
+    Returns:
+        np.ndarray: Values (len(buffers), columns), where payloads not held are 0
+    """
+    values = np.zeros((len(buffers), columns))
+    positions = np.linspace(PayloadBuffer.MAX - limit, PayloadBuffer.MAX - 1, columns)
+    positions = positions.round().astype(int)
+
+    for index, data in _newest_rows(buffers, limit):
+        # Positions before the oldest row held are empty
+        held = positions - (PayloadBuffer.MAX - data.shape[1])
+        valid = np.flatnonzero(held >= 0)
+        values[np.ix_(np.array(index), valid)] = leading_values(data[:, held[valid]])
+
+    return values
+
+
+def newest_bytes(buffers: Sequence[PayloadBuffer], columns: int) -> np.ndarray:
+    """
+    Get the bytes of the newest payload of each buffer.
+
+    Args:
+        buffers (Sequence[PayloadBuffer])
+        columns (int): Number of leading bytes
+
+    Returns:
+        np.ndarray: Bytes (len(buffers), columns), 0 where not received
+    """
+    values = np.zeros((len(buffers), columns), dtype=np.uint8)
+    for index, data in _newest_rows(buffers, 1):
+        width = min(data.shape[2], columns)
+        values[index, :width] = data[:, -1, :width]
+    return values
+
+
+def byte_changes(
+    buffers: Sequence[PayloadBuffer], columns: int, window: int
+) -> np.ndarray:
+    """
+    Get how often each byte changed across the newest payloads of each buffer.
+
+    Args:
+        buffers (Sequence[PayloadBuffer])
+        columns (int): Number of leading bytes
+        window (int): Number of newest payloads
+
+    Returns:
+        np.ndarray: Fraction of payloads changing each byte (len(buffers), columns)
+    """
+    changes = np.zeros((len(buffers), columns))
+    for index, data in _newest_rows(buffers, window):
+        if data.shape[1] < 2:
+            continue
+        width = min(data.shape[2], columns)
+        changed = np.diff(data[:, :, :width], axis=1) != 0
+        changes[index, :width] = changed.mean(axis=1)
+    return changes
+
+
+def masked_values(buffer: PayloadBuffer, mask: np.ndarray) -> np.ndarray:
+    """
+    Get the values of a buffer as plotted, with only the bits of a mask kept.
+
+    Args:
+        buffer (PayloadBuffer)
+        mask (np.ndarray): Mask of each leading byte (columns,)
+
+    Returns:
+        np.ndarray: PayloadBuffer.MAX values, where payloads not held are 0
+    """
+    values = np.zeros(PayloadBuffer.MAX)
+    for _, data in _newest_rows([buffer], buffer.held):
+        width = min(data.shape[2], len(mask))
+        masked = data[0].copy()
+        masked[:, :width] &= mask[:width]
+        values[PayloadBuffer.MAX - data.shape[1] :] = leading_values(masked)
+    return values
+
+
+class _Accumulator(ABC):
+    """
+    Base for statistics of the leading bytes of each id which are accumulated
+    from only the payloads received since the last update, with buffers of the
+    same number of new payloads and width processed together.
+
+    Args:
+        columns (int): Number of leading bytes
+    """
+
+    def __init__(self, columns: int) -> None:
+        self.columns = columns
+        self._slot: Dict[CanKey, int] = {}
+        self._seen: Dict[CanKey, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+
+    @abstractmethod
+    def _grow(self, size: int) -> None:
+        pass
+
+    @abstractmethod
+    def _reset(self, slot: int) -> None:
+        pass
+
+    @abstractmethod
+    def _add(self, slots: np.ndarray, data: np.ndarray) -> None:
+        # data holds the new payloads (len(slots), rows, <= columns), preceded
+        # by the previous payload when it is still held
+        pass
+
+    def _slots(self, can_ids: Sequence[CanKey]) -> np.ndarray:
+        for can_id in can_ids:
+            if can_id not in self._slot:
+                # Note: slots of removed ids are reused before adding more
+                self._slot[can_id] = self._free.pop() if self._free else len(self._slot)
+        if len(self._slot) > self._size:
+            self._size = max(64, 2 * len(self._slot))
+            self._grow(self._size)
+        return np.array([self._slot[can_id] for can_id in can_ids], dtype=int)
+
+    def remove(self, can_id: CanKey) -> None:
+        """
+        Forget the statistics of an id, such as one evicted by the budget.
+
+        Args:
+            can_id (CanKey)
+        """
+        self._seen.pop(can_id, None)
+        slot = self._slot.pop(can_id, None)
+        if slot is not None:
+            self._reset(slot)
+            self._free.append(slot)
+
+    def update(self, buffers: Dict[CanKey, PayloadBuffer]) -> int:
+        """
+        Accumulate the payloads received since the last update.
+
+        Note: payloads overwritten since the last update are missed
+
+        Args:
+            buffers (Dict[CanKey, PayloadBuffer])
+
+        Returns:
+            int: Number of ids which received payloads
+        """
+        can_ids, fresh, counts = [], [], []
+        for can_id, buffer in list(buffers.items()):
+            new = buffer.count - self._seen.get(can_id, 0)
+            if new < 0:
+                # The buffer was replaced, start over
+                new = buffer.count
+                self._reset(self._slots([can_id])[0])
+            if new:
+                self._seen[can_id] = buffer.count
+                can_ids.append(can_id)
+                fresh.append(buffer)
+                counts.append(new + 1)
+
+        slots = self._slots(can_ids)
+        for index, data in _newest_rows(fresh, counts):
+            self._add(slots[index], data[:, :, : self.columns])
+        return len(can_ids)
+
+
+class ByteClass(IntEnum):
+    CONSTANT = 0
+    COUNTER = 1
+    CHECKSUM = 2
+    SIGNAL = 3
+
+
+class Classifier(_Accumulator):
+    """
+    Classify each nibble of the leading bytes of each id as constant, counter,
+    checksum-like or signal, weeding out the noise which dominates plots.
+
+    Statistics of consecutive payloads are accumulated incrementally, then:
+
+    - A nibble which never changed is constant
+    - A byte or nibble incrementing by one (wrapping) in RATIO of payloads is
+      a counter
+    - A byte changing in RATIO of payloads by CHECKSUM_STEP on average, as
+      uniformly random values do, is checksum-like
+    - Anything else is a signal, as is every nibble until MIN_TRANSITIONS
+      consecutive payloads were seen
+
+    Args:
+        columns (int): Number of leading bytes
+    """
+
+    MIN_TRANSITIONS: Final = 16
+    RATIO: Final = 0.9
+    CHECKSUM_STEP: Final = 48
+
+    # Totals of each byte: changed, counted, absolute change, then changed and
+    # counted of the high and low nibbles
+    _STATS: Final = 7
+
+    def __init__(self, columns: int = PayloadBuffer.VALUE_SIZE) -> None:
+        super().__init__(columns)
+        self._totals = np.zeros((0, self._STATS, columns))
+        self._transitions = np.zeros(0)
+
+    def _grow(self, size: int) -> None:
+        totals = np.zeros((size, self._STATS, self.columns))
+        totals[: len(self._totals)] = self._totals
+        transitions = np.zeros(size)
+        transitions[: len(self._transitions)] = self._transitions
+        self._totals, self._transitions = totals, transitions
+
+    def _reset(self, slot: int) -> None:
+        self._totals[slot] = 0
+        self._transitions[slot] = 0
+
+    def _add(self, slots: np.ndarray, data: np.ndarray) -> None:
+        if data.shape[1] < 2:
+            return
+        high, low = data >> 4, data & 0xF
+        step = np.diff(data.astype(np.int16), axis=1)
+        high_step = np.mod(np.diff(high.astype(np.int8), axis=1), 16)
+        low_step = np.mod(np.diff(low.astype(np.int8), axis=1), 16)
+        stats = (
+            step != 0,
+            np.mod(step, 256) == 1,
+            np.abs(step),
+            high_step != 0,
+            high_step == 1,
+            low_step != 0,
+            low_step == 1,
+        )
+        self._totals[slots, :, : data.shape[2]] += np.stack(
+            [stat.sum(axis=1) for stat in stats], axis=1
+        )
+        self._transitions[slots] += data.shape[1] - 1
+
+    def classify(self, can_ids: Sequence[CanKey]) -> np.ndarray:
+        """
+        Get the class of each nibble, high nibble first.
+
+        Args:
+            can_ids (Sequence[CanKey])
+
+        Returns:
+            np.ndarray: ByteClass values (len(can_ids), 2 * columns)
+        """
+        slots = self._slots(can_ids)
+        totals = self._totals[slots]
+        transitions = self._transitions[slots][:, None]
+        ratio = totals / np.maximum(transitions, 1)[:, :, None]
+        ready = transitions >= self.MIN_TRANSITIONS
+
+        counter = ready & (ratio[:, 1] >= self.RATIO)
+        checksum = (
+            ready
+            & ~counter
+            & (ratio[:, 0] >= self.RATIO)
+            & (ratio[:, 2] >= self.CHECKSUM_STEP)
+        )
+        classes = np.empty((len(slots), 2 * self.columns), dtype=np.uint8)
+        for offset, changed, counted in ((0, 3, 4), (1, 5, 6)):
+            varies = totals[:, changed] > 0
+            nibble = np.where(varies, ByteClass.SIGNAL, ByteClass.CONSTANT)
+            nibble[checksum & varies] = ByteClass.CHECKSUM
+            nibble[(counter & varies) | (ready & (ratio[:, counted] >= self.RATIO))] = (
+                ByteClass.COUNTER
+            )
+            classes[:, offset::2] = np.where(ready, nibble, ByteClass.SIGNAL)
+        return classes
+
+
+def noise_mask(classes: np.ndarray) -> np.ndarray:
+    """
+    Get the mask of each byte clearing counter and checksum-like nibbles.
+
+    Args:
+        classes (np.ndarray): ByteClass of each nibble (..., 2 * columns)
+
+    Returns:
+        np.ndarray: Masks (..., columns)
+    """
+    keep = (classes != ByteClass.COUNTER) & (classes != ByteClass.CHECKSUM)
+    return (keep[..., 0::2] * 0xF0 | keep[..., 1::2] * 0x0F).astype(np.uint8)
+
+
+class ValueSets(_Accumulator):
+    """
+    Accumulate the values taken by each leading byte of each id.
+
+    Args:
+        columns (int): Number of leading bytes
+    """
+
+    def __init__(self, columns: int = PayloadBuffer.VALUE_SIZE) -> None:
+        super().__init__(columns)
+        self._present = np.zeros((0, columns, 256), dtype=bool)
+
+    def _grow(self, size: int) -> None:
+        present = np.zeros((size, self.columns, 256), dtype=bool)
+        present[: len(self._present)] = self._present
+        self._present = present
+
+    def _reset(self, slot: int) -> None:
+        self._present[slot] = False
+
+    def _add(self, slots: np.ndarray, data: np.ndarray) -> None:
+        columns = np.arange(data.shape[2])
+        self._present[slots[:, None, None], columns, data] = True
+
+    def get(self, can_ids: Sequence[CanKey]) -> np.ndarray:
+        """
+        Get which values each byte took.
+
+        Args:
+            can_ids (Sequence[CanKey])
+
+        Returns:
+            np.ndarray: Presence of each value (len(can_ids), columns, 256)
+        """
+        return self._present[self._slots(can_ids)]
+
+
+class Score(NamedTuple):
+    can_id: CanKey
+    byte: int
+    correlation: float
+    step: float
+
+
+def _grouped(
+    buffers: Dict[CanKey, PayloadBuffer], size: int
+) -> Iterator[Tuple[List[CanKey], np.ndarray, np.ndarray]]:
+    # Stack ids with the same number of rows and width so they can be
+    # processed together, limiting each stack to `size` ids to bound memory
+    groups: Dict[Tuple[int, ...], list] = {}
+    for can_id, buffer in list(buffers.items()):
+        times, data = payload_array(buffer)
+        if len(times) and data.shape[1]:
+            groups.setdefault(data.shape, []).append((can_id, times, data))
+
+    for group in groups.values():
+        for i in range(0, len(group), size):
+            chunk = group[i : i + size]
+            yield (
+                [can_id for can_id, *_ in chunk],
+                np.stack([times for _, times, _ in chunk]),
+                np.stack([data for *_, data in chunk]),
+            )
+
+
+def correlate(
+    buffers: Dict[CanKey, PayloadBuffer], start: float, stop: float
+) -> List[Score]:
+    """
+    Rank every byte of every id by how well it follows a marked interval.
+
+    Each byte is compared against a signal which is 1 within the interval and 0
+    outside of it using the Pearson correlation. The step is the difference
+    between the mean value inside and outside of the interval.
+
+    Args:
+        buffers (Dict[CanKey, PayloadBuffer])
+        start (float): Timestamp the interval began
+        stop (float): Timestamp the interval ended
+
+    Returns:
+        List[Score]: Best correlated first
+    """
+    scores: List[Score] = []
+    for can_ids, times, data in _grouped(buffers, 64):
+        # ids x rows x bytes
+        x = data.astype(np.float64)
+        rows = x.shape[1]
+        inside = (times >= start) & (times <= stop)
+        y = inside.astype(np.float64)
+
+        # Pearson correlation from sums, where y * y == y as y is binary
+        n_inside = y.sum(axis=1)[:, None]
+        total = x.sum(axis=1)
+        total_inside = np.einsum("kn,knw->kw", y, x)
+        covariance = total_inside - total * n_inside / rows
+        variance_x = np.einsum("knw,knw->kw", x, x) - total**2 / rows
+        variance_y = n_inside - n_inside**2 / rows
+        scale = np.sqrt(np.clip(variance_x * variance_y, 0, None))
+        correlation = np.divide(
+            covariance, scale, out=np.zeros(scale.shape), where=scale > 1e-9
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = total_inside / n_inside - (total - total_inside) / (rows - n_inside)
+
+        for k in np.flatnonzero((n_inside[:, 0] > 0) & (n_inside[:, 0] < rows)):
+            scores.extend(
+                Score(
+                    can_ids[k], byte, float(correlation[k, byte]), float(step[k, byte])
+                )
+                for byte in range(x.shape[2])
+            )
+
+    return sorted(scores, key=lambda score: abs(score.correlation), reverse=True)
+
+
+class Analyzer:
+    """
+    Run analysis jobs on a background worker so the render loop never waits.
+
+    Note: NumPy releases the GIL for the bulk of each job
+    """
+
+    def __init__(self) -> None:
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="analysis")
+
+    def submit(
+        self,
+        func: Callable,
+        *args,
+        callback: Optional[Callable[[Future], None]] = None,
+    ) -> Future:
+        """
+        Queue a job.
+
+        Args:
+            func (Callable): Job to run
+            *args: Passed to func
+            callback (Callable, optional): Called with the future once complete
+
+        Returns:
+            Future
+        """
+        future = self._executor.submit(func, *args)
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
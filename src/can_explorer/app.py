@@ -2,13 +2,25 @@ import enum
 import logging
 import sys
 import threading
-from typing import Callable, Optional
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Collection, Dict, FrozenSet, Optional, Tuple
 
 import can
 import can.player
 import dearpygui.dearpygui as dpg
 
-from can_explorer import can_bus, layout, plotting
+from can_explorer import (
+    analysis,
+    can_bus,
+    indexer,
+    layout,
+    pipeline,
+    plotting,
+    replay,
+    session,
+)
 from can_explorer.layout import Default
 
 
@@ -19,13 +31,31 @@ class State(enum.Flag):
 
 class MainApp:
     _rate = 0.05
+    _status_frames = 30
     _cancel = threading.Event()
     _state = State.STOPPED
     _worker: threading.Thread
 
-    bus: Optional[can.bus.BusABC] = None
+    buses: Dict[str, can.bus.BusABC] = {}
+    player: Optional[replay.Replay] = None
     can_recorder = can_bus.Recorder()
     plot_manager = plotting.PlotManager()
+    overview = plotting.Overview()
+    heatmap = plotting.Heatmap()
+    analyzer = analysis.Analyzer()
+    classifier = analysis.Classifier()
+    group_channels = False
+    hide_noise = False
+    _hidden: FrozenSet[can_bus.CanKey] = frozenset()
+    _mark: Optional[float] = None
+    # Background jobs awaiting delivery on the main thread
+    _results: Tuple[Tuple[Future, Callable[[Future], None]], ...] = ()
+    _refreshing = False
+    _sync = 0.0
+
+    @property
+    def bus(self) -> Optional[can.bus.BusABC]:
+        return next(iter(self.buses.values()), None)
 
     @property
     def state(self) -> State:
@@ -39,8 +69,94 @@ class MainApp:
         Repopulate all plots in ascending order.
         """
         self.plot_manager.clear_all()
-        for can_id, payload_buffer in sorted(self.can_recorder.items()):
-            self.plot_manager.add(can_id, payload_buffer)
+        self.plot_manager.sort_key = self._sort_key
+        self.overview.delete()
+        self.heatmap.delete()
+        can_ids = sorted(self.can_recorder, key=self._sort_key)
+        if self.overview.enabled:
+            self.overview.set_ids(can_ids)
+            return
+        for can_id in can_ids:
+            # Note: ids may be evicted by the budget on the ingest thread
+            buffer = self.can_recorder.get(can_id)
+            if buffer is not None and can_id not in self._hidden:
+                self.plot_manager.add(can_id, buffer)
+
+    def _sort_key(self, can_id: int) -> tuple:
+        channel = getattr(can_id, "channel", "") if self.group_channels else ""
+        return (channel, can_id)
+
+    def _sync_budget(self) -> None:
+        """
+        Remove plots of evicted ids and share which ids are visible.
+        """
+        budget = self.can_recorder.budget
+        while budget.evicted:
+            can_id = budget.evicted.popleft()
+            self.classifier.remove(can_id)
+            if can_id in self.plot_manager():
+                self.plot_manager.delete(can_id)
+        budget.visible = frozenset(self.plot_manager.visible())
+
+    def _classify(self) -> None:
+        """
+        Classify the bytes of every id, masking counters and checksums from its
+        plot and removing the plots of ids without any signal.
+        """
+        can_ids = list(self.can_recorder)
+        self.classifier.update(self.can_recorder)
+        classes = self.classifier.classify(can_ids)
+        masks = analysis.noise_mask(classes)
+        signal = (classes == analysis.ByteClass.SIGNAL).any(axis=1)
+
+        self._hidden = frozenset(
+            can_id for i, can_id in enumerate(can_ids) if not signal[i]
+        )
+        for i, can_id in enumerate(can_ids):
+            if can_id in self._hidden:
+                if can_id in self.plot_manager():
+                    self.plot_manager.delete(can_id)
+            else:
+                self.plot_manager.set_mask(can_id, masks[i])
+
+    def _update_heatmap(self) -> None:
+        """
+        Update the heatmap, recreating it if ids were added or removed or a
+        payload is wider than its columns.
+        """
+        buffers = list(self.can_recorder.values())
+        columns = max([8, *(buffer.width for buffer in buffers)])
+        if len(self.heatmap.ids) != len(buffers) or columns > self.heatmap.columns:
+            self.heatmap.set_ids(sorted(self.can_recorder, key=self._sort_key), columns)
+        self.heatmap.update(self.can_recorder)
+
+    def step(self) -> None:
+        """
+        Run a single iteration of the main loop, updating the active view.
+        """
+        if time.monotonic() >= self._sync:
+            self._sync = time.monotonic() + self.can_recorder.budget.interval
+            self._sync_budget()
+            if self.hide_noise:
+                self._classify()
+        if self.heatmap.enabled:
+            self._update_heatmap()
+            return
+        if self.overview.enabled:
+            if len(self.overview.ids) != len(self.can_recorder):
+                self.repopulate()
+            self.overview.update(self.can_recorder)
+            return
+        # Note: must convert can_recorder to avoid runtime error
+        for can_id in tuple(self.can_recorder):
+            if can_id in self._hidden:
+                continue
+            if can_id not in self.plot_manager():
+                buffer = self.can_recorder.get(can_id)
+                if buffer is not None:
+                    self.plot_manager.add(can_id, buffer)
+            else:
+                self.plot_manager.update(can_id)
 
     def _get_worker(self) -> threading.Thread:
         """
@@ -51,14 +167,9 @@ class MainApp:
         """
 
         def loop() -> None:
+            self._sync = 0.0
             while not self._cancel.wait(self._rate):
-                # Note: must convert can_recorder to avoid runtime error
-                for can_id in tuple(self.can_recorder):
-                    if can_id not in self.plot_manager():
-                        self.repopulate()
-                        break
-                    else:
-                        self.plot_manager.update(can_id)
+                self.step()
             self._cancel.clear()
 
         return threading.Thread(target=loop, daemon=True)
@@ -70,11 +181,12 @@ class MainApp:
         Raises:
             Exception: If CAN bus does not exist.
         """
-        if self.bus is None:
+        if not self.buses:
             raise RuntimeError("Must apply settings before starting")
-
-        self.can_recorder.set_bus(self.bus)
+        self.can_recorder.set_buses(self.buses)
         self.can_recorder.start()
+        if self.player is not None:
+            self.player.start()
 
         self._worker = self._get_worker()
         self._worker.start()
@@ -85,6 +197,8 @@ class MainApp:
         """
         Stop the app loop.
         """
+        if self.player is not None:
+            self.player.stop()
         self.can_recorder.stop()
         self._cancel.set()
         self._worker.join()
@@ -95,7 +209,268 @@ class MainApp:
         """
         Set CAN bus to use during app loop.
         """
-        self.bus = bus
+        self.set_buses({"": bus})
+
+    def set_buses(self, buses: Dict[str, can.BusABC]) -> None:
+        """
+        Set multiple CAN buses, keyed by channel name, to capture simultaneously.
+        Buses replaced are shut down.
+        """
+        self._close_buses(keep=buses.values())
+        self.buses = dict(buses)
+
+    def set_replay(self, path: Optional[Path], speed: Optional[float] = 1.0) -> None:
+        """
+        Replay a log into the recorder when started, instead of receiving from
+        the buses, which are shut down. Frames pass through the same pipeline
+        as frames received from a bus.
+
+        Args:
+            path (Path, optional): Candump, ASC or BLF log, or None to stop
+                replaying
+            speed (float, optional): Multiple of real time, or None for as fast
+                as possible
+        """
+        if path is None:
+            if self.player is not None:
+                self._close_buses()
+            return
+
+        bus = replay.ReplayBus(indexer.build(path), speed)
+        self._close_buses()
+        self.buses = {"": bus}
+        self.player = bus.player
+
+    def close(self) -> None:
+        """
+        Shut down the buses, ending any replay.
+        """
+        self._close_buses()
+
+    def _close_buses(self, keep: Collection[can.BusABC] = ()) -> None:
+        for bus in self.buses.values():
+            if not any(bus is i for i in keep):
+                bus.shutdown()
+        self.buses = {}
+        self.player = None
+
+    def save_session(self, path: Path, settings: Dict[str, Any]) -> None:
+        """
+        Save all payloads along with view settings.
+
+        Args:
+            path (Path)
+            settings (Dict[str, Any])
+        """
+        session.save(path, self.can_recorder, settings)
+
+    def load_session(self, path: Path) -> Dict[str, Any]:
+        """
+        Replace all payloads with those of a saved session.
+
+        Args:
+            path (Path)
+
+        Raises:
+            RuntimeError: If the app is active
+
+        Returns:
+            Dict[str, Any]: View settings saved with the session
+        """
+        if self.is_active():
+            raise RuntimeError("App must be stopped before loading a session")
+
+        saved = session.load(path)
+        self.can_recorder.clear()
+        self.can_recorder.update(saved.buffers)
+        self.repopulate()
+        return saved.settings
+
+    def load_log(
+        self,
+        path: Path,
+        start: Optional[float] = None,
+        stop: Optional[float] = None,
+        ids: Optional[Collection[int]] = None,
+    ) -> int:
+        """
+        Add the frames of a log within a window, indexing the log first if its
+        index is missing or out of date.
+
+        Args:
+            path (Path): Candump, ASC or BLF log
+            start (float, optional): Inclusive timestamp
+            stop (float, optional): Inclusive timestamp
+            ids (Collection[int], optional): Arbitration ids
+
+        Raises:
+            RuntimeError: If the app is active
+
+        Returns:
+            int: Number of frames added
+        """
+        if self.is_active():
+            raise RuntimeError("App must be stopped before loading a log")
+
+        listener = self.can_recorder.listener()
+        count = 0
+        for msg in indexer.build(path).read(start, stop, ids):
+            listener.on_message_received(msg)
+            count += 1
+        self.repopulate()
+        return count
+
+    def now(self) -> float:
+        """
+        Get the current time on the clock of the frames received, which need
+        not be the wall clock: the replay position, or else the timestamp of
+        the newest frame.
+
+        Returns:
+            float
+        """
+        if self.player is not None:
+            return self.player.position
+        buffers = list(self.can_recorder.values())
+        return max((buffer.last for buffer in buffers), default=0.0)
+
+    def is_marking(self) -> bool:
+        return self._mark is not None
+
+    def start_mark(self, timestamp: float) -> None:
+        """
+        Begin marking an interval of interest.
+
+        Args:
+            timestamp (float)
+        """
+        self._mark = timestamp
+
+    def stop_mark(
+        self, timestamp: float, callback: Optional[Callable[[Future], None]] = None
+    ) -> Future:
+        """
+        End marking an interval and rank every id and byte against it in the
+        background, on a copy of the buffers taken between received batches.
+
+        Args:
+            timestamp (float)
+            callback (Callable, optional): Called with the future on the main
+                thread once complete
+
+        Raises:
+            RuntimeError: If an interval has not been started
+
+        Returns:
+            Future: List of correlation scores
+        """
+        if self._mark is None:
+            raise RuntimeError("Must start marking before stopping")
+
+        start, self._mark = self._mark, None
+        snapshot = self.can_recorder.snapshot()
+        future = self.analyzer.submit(
+            lambda: analysis.correlate(snapshot.result(), start, timestamp)
+        )
+        if callback is not None:
+            self._results = (*self._results, (future, callback))
+        return future
+
+    def _deliver_results(self) -> None:
+        # Note: called from the main thread so callbacks may use dpg
+        done = [result for result in self._results if result[0].done()]
+        if not done:
+            return
+        self._results = tuple(i for i in self._results if i not in done)
+        for future, callback in done:
+            callback(future)
+
+    def set_overview(self, enabled: bool) -> None:
+        """
+        Set whether ids are drawn as rows of a single heatmap or a plot per id.
+        """
+        self.overview.enabled = enabled
+        self.repopulate()
+
+    def set_heatmap(self, enabled: bool) -> None:
+        """
+        Set whether the heatmap is updated instead of the viewer.
+        """
+        self.heatmap.enabled = enabled
+        self.heatmap.delete()
+        if enabled:
+            self._update_heatmap()
+
+    def set_limit(self, x_limit: int) -> None:
+        """
+        Set the number of payloads plotted, updating the plots over the
+        following frames.
+
+        Args:
+            x_limit (int): Number of payloads
+        """
+        self.plot_manager.set_limit(x_limit)
+        self.overview.set_limit(x_limit)
+        if not self._refreshing:
+            self._refreshing = True
+            self._refresh_plots()
+
+    def _refresh_plots(self, *args) -> None:
+        # Note: changes are coalesced, a single refresh is scheduled at a time
+        self._refreshing = self.plot_manager.refresh()
+        if self._refreshing:
+            dpg.set_frame_callback(dpg.get_frame_count() + 1, self._refresh_plots)
+
+    def health(self) -> pipeline.HealthStats:
+        """
+        Get the error, remote frames, gaps and latency of the recorder.
+
+        Returns:
+            HealthStats
+        """
+        return self.can_recorder.health.snapshot()
+
+    def _update_status(self, *args) -> None:
+        # Note: updated from the main thread every so many frames
+        self._deliver_results()
+        stats = self.health()
+        budget = self.can_recorder.budget
+        layout.set_footer_status(
+            f"Error frames: {stats.error_frames}    "
+            f"Remote frames: {stats.remote_frames}    "
+            f"Gaps: {stats.gaps}    "
+            f"Receive errors: {stats.receive_errors}    "
+            f"Dropped: {stats.dropped}    "
+            f"Plugin drops: {stats.plugins_dropped}    "
+            f"Latency: {stats.latency * 1000:.1f} ms "
+            f"(max {stats.latency_max * 1000:.1f} ms)    "
+            f"Memory: {budget.usage() / 1024**2:.1f} of "
+            f"{budget.limit / 1024**2:.0f} MB"
+        )
+        dpg.set_frame_callback(
+            dpg.get_frame_count() + self._status_frames, self._update_status
+        )
+
+    def set_group_channels(self, group: bool) -> None:
+        """
+        Set whether plots are grouped by channel or merged in id order.
+        """
+        self.group_channels = group
+        self.repopulate()
+
+    def set_hide_noise(self, hide: bool) -> None:
+        """
+        Set whether counter and checksum-like bytes are masked from plots, and
+        ids without any signal are hidden.
+        """
+        self.hide_noise = hide
+        if hide:
+            self._classify()
+        else:
+            self._hidden = frozenset()
+            for can_id in list(self.plot_manager.mask):
+                self.plot_manager.set_mask(can_id, None)
+        self.repopulate()
 
 
 app = MainApp()
@@ -111,7 +486,7 @@ def clear_button_callback(sender, app_data, user_data) -> None:
 
 
 def plot_buffer_slider_callback(sender, app_data, user_data) -> None:
-    app.plot_manager.set_limit(layout.get_settings_plot_buffer())
+    app.set_limit(layout.get_settings_plot_buffer())
 
 
 def plot_height_slider_callback(sender, app_data, user_data) -> None:
@@ -119,22 +494,101 @@ def plot_height_slider_callback(sender, app_data, user_data) -> None:
 
 
 def settings_apply_button_callback(sender, app_data, user_data) -> None:
-    user_settings = dict(
+    user_settings: Dict[str, Any] = dict(
         interface=layout.get_settings_interface(),
-        channel=layout.get_settings_channel(),
         bitrate=layout.get_settings_baudrate(),
     )
     if app.is_active():
         raise RuntimeError("App must be stopped before applying new settings")
-    bus = can.Bus(**{k: v for k, v in user_settings.items() if v})  # type: ignore
-    app.set_bus(bus)
+
+    channels = layout.get_settings_channels()
+    if len(channels) < 2:
+        user_settings.update(channel=next(iter(channels), None))
+        bus = can.Bus(**{k: v for k, v in user_settings.items() if v})  # type: ignore
+        app.set_bus(bus)
+    else:
+        app.set_buses(
+            {
+                channel: can.Bus(
+                    channel=channel, **{k: v for k, v in user_settings.items() if v}
+                )
+                for channel in channels
+            }
+        )
 
 
 def settings_can_id_format_callback(sender, app_data, user_data) -> None:
     app.plot_manager.set_id_format(layout.get_settings_id_format())
+    app.overview.set_id_format(layout.get_settings_id_format())
+    app.heatmap.set_id_format(layout.get_settings_id_format())
     app.repopulate()
 
 
+def settings_channel_view_callback(sender, app_data, user_data) -> None:
+    app.set_group_channels(layout.get_settings_group_channels())
+
+
+def settings_view_mode_callback(sender, app_data, user_data) -> None:
+    app.set_overview(layout.get_settings_overview())
+
+
+def settings_hide_noise_callback(sender, app_data, user_data) -> None:
+    app.set_hide_noise(layout.get_settings_hide_noise())
+
+
+def header_tab_callback(sender, app_data, user_data) -> None:
+    app.set_heatmap(layout.get_header_tab() == "Heatmap")
+
+
+def heatmap_color_callback(sender, app_data, user_data) -> None:
+    app.heatmap.set_color(plotting.HeatmapColor(layout.get_heatmap_color()))
+
+
+def settings_session_save_callback(sender, app_data, user_data) -> None:
+    app.save_session(session.SESSION_FILE, layout.get_session_settings())
+
+
+def settings_session_load_callback(sender, app_data, user_data: Optional[Path]) -> None:
+    settings = app.load_session(user_data or session.SESSION_FILE)
+    layout.set_session_settings(settings)
+    app.plot_manager.set_height(layout.get_settings_plot_height())
+    app.plot_manager.set_id_format(layout.get_settings_id_format())
+    app.set_limit(layout.get_settings_plot_buffer())
+    app.overview.set_id_format(layout.get_settings_id_format())
+    app.overview.enabled = layout.get_settings_overview()
+    app.heatmap.set_color(plotting.HeatmapColor(layout.get_heatmap_color()))
+    app.set_group_channels(layout.get_settings_group_channels())
+    app.set_hide_noise(layout.get_settings_hide_noise())
+
+
+def show_correlation(future: Future) -> None:
+    try:
+        scores = future.result()
+    except Exception as exc:
+        layout.popup_error("Correlation failed", exc)
+        return
+
+    id_format = layout.get_settings_id_format()
+    rows = [
+        (
+            plotting.format_id(score.can_id, id_format),
+            score.byte,
+            f"{score.correlation:+.2f}",
+            f"{score.step:+.1f}",
+        )
+        for score in scores[:25]
+    ]
+    layout.popup_table("Correlation", ("ID", "Byte", "Correlation", "Step"), rows)
+
+
+def mark_button_callback(sender, app_data, user_data) -> None:
+    if app.is_marking():
+        app.stop_mark(app.now(), callback=show_correlation)
+    else:
+        app.start_mark(app.now())
+    layout.set_mark_button_label(app.is_marking())
+
+
 def setup():
     dpg.create_context()
 
@@ -145,18 +599,29 @@ def setup():
     layout.set_settings_baudrate_options(can_bus.BAUDRATES)
     layout.set_settings_apply_button_callback(settings_apply_button_callback)
     layout.set_settings_can_id_format_callback(settings_can_id_format_callback)
+    layout.set_settings_channel_view_callback(settings_channel_view_callback)
+    layout.set_settings_view_mode_callback(settings_view_mode_callback)
+    layout.set_settings_hide_noise_callback(settings_hide_noise_callback)
+    layout.set_settings_session_save_callback(settings_session_save_callback)
+    layout.set_settings_session_load_callback(settings_session_load_callback)
 
     layout.set_main_button_label(app.state)
     layout.set_main_button_callback(start_stop_button_callback)
     layout.set_clear_button_callback(clear_button_callback)
+    layout.set_mark_button_label(app.is_marking())
+    layout.set_mark_button_callback(mark_button_callback)
 
     layout.set_plot_buffer_slider_callback(plot_buffer_slider_callback)
     layout.set_plot_height_slider_callback(plot_height_slider_callback)
 
+    layout.set_header_tab_callback(header_tab_callback)
+    layout.set_heatmap_color_callback(heatmap_color_callback)
+
     dpg.create_viewport(title=Default.TITLE, width=Default.WIDTH, height=Default.HEIGHT)
     dpg.set_viewport_resize_callback(layout.resize)
     dpg.setup_dearpygui()
     layout.resize()
+    dpg.set_frame_callback(1, app._update_status)
 
     dpg.set_primary_window(app_main, True)
 
@@ -180,6 +645,12 @@ def main(test_config: Optional[Callable] = None):
     dpg.show_viewport()
     dpg.start_dearpygui()
 
+    if app.is_active():
+        app.stop()
+    if layout.get_settings_save_on_exit():
+        settings_session_save_callback(None, None, None)
+    app.close()
+
     teardown()
 
 
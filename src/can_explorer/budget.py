@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, Final, FrozenSet, Optional
+
+import numpy as np
+
+# Note: module import as can_bus imports this module
+from can_explorer import can_bus
+from can_explorer.pipeline import Batch, Pipeline, Stage
+
+if TYPE_CHECKING:
+    from can_explorer.can_bus import CanKey, PayloadBuffer
+
+DEFAULT_LIMIT: Final = 64 * 1024**2
+
+
+class MemoryBudget(Stage):
+    """
+    Distribute a fixed amount of memory across the payload buffers of a recorder.
+
+    Capacity is shared in proportion to the receive rate of each id, with
+    visible ids weighted higher, and clamped between PayloadBuffer.MIN and MAX
+    rows. If even the minimum capacity of every id exceeds the limit, the
+    ids received least recently are evicted, hidden ids first. Every stage of
+    the pipeline is told of an evicted id, so state kept for it is released.
+
+    Runs as an inline pipeline stage so buffers are only resized or evicted on
+    the ingest thread. Buffers grow lazily, so memory in use is often well
+    below the limit.
+
+    Args:
+        buffers (Dict[CanKey, PayloadBuffer]): Typically a Recorder
+        limit (int): Bytes of payloads and timestamps
+        interval (float): Seconds between rebalancing
+    """
+
+    VISIBLE_WEIGHT: Final = 10.0
+
+    def __init__(
+        self,
+        buffers: Dict[CanKey, PayloadBuffer],
+        limit: int = DEFAULT_LIMIT,
+        interval: float = 0.5,
+    ) -> None:
+        self.buffers = buffers
+        self.limit = limit
+        self.interval = interval
+        # Note: replaced, not mutated, by the gui thread
+        self.visible: FrozenSet = frozenset()
+        self.evicted: Deque[CanKey] = deque()
+        self.pipeline: Optional[Pipeline] = None
+        self._next = 0.0
+
+    def usage(self) -> int:
+        """
+        Bytes currently allocated by all buffers.
+
+        Returns:
+            int
+        """
+        return sum(buffer.nbytes for buffer in list(self.buffers.values()))
+
+    def process(self, batch: Batch) -> Batch:
+        now = time.monotonic()
+        if now >= self._next:
+            self._next = now + self.interval
+            self.rebalance()
+        return batch
+
+    def rebalance(self) -> None:
+        """
+        Evict ids until the minimum capacity of every id fits within the limit,
+        then resize each buffer to its share.
+        """
+        items = list(self.buffers.items())
+        if not items:
+            return
+
+        visible = self.visible
+        row_bytes = np.array([buffer.width + 8 for _, buffer in items], dtype=float)
+        shown = np.array([key in visible for key, _ in items], dtype=bool)
+
+        minimum = row_bytes * can_bus.PayloadBuffer.MIN
+        excess = minimum.sum() - self.limit
+        if excess > 0:
+            last = np.array([buffer.last for _, buffer in items])
+            # Hidden before visible, then least recently received first
+            order = np.lexsort((last, shown))
+            n = int(np.searchsorted(np.cumsum(minimum[order]), excess)) + 1
+            evict = order[:n]
+            for i in evict:
+                key = items[i][0]
+                self.buffers.pop(key, None)
+                self.evicted.append(key)
+                if self.pipeline is not None:
+                    self.pipeline.on_evict(key)
+            keep = np.ones(len(items), dtype=bool)
+            keep[evict] = False
+            items = [items[i] for i in np.flatnonzero(keep)]
+            row_bytes, shown = row_bytes[keep], shown[keep]
+
+        rate = np.array([buffer.rate() for _, buffer in items])
+        weight = np.maximum(rate, 1e-3) * np.where(shown, self.VISIBLE_WEIGHT, 1.0)
+        capacity = self._share(
+            weight, row_bytes, can_bus.PayloadBuffer.MIN, can_bus.PayloadBuffer.MAX
+        )
+        for i, (_, buffer) in enumerate(items):
+            if buffer.capacity != capacity[i] or buffer.rows > capacity[i]:
+                buffer.resize(int(capacity[i]))
+
+    def _share(
+        self, weight: np.ndarray, row_bytes: np.ndarray, low: int, high: int
+    ) -> np.ndarray:
+        # Find the largest scale where rows proportional to weight fit the limit
+        if (row_bytes * high).sum() <= self.limit:
+            return np.full(len(weight), high)
+
+        lo, hi = 0.0, high / weight.min()
+        for _ in range(50):
+            scale = (lo + hi) / 2
+            rows = np.clip(scale * weight, low, high)
+            if (rows * row_bytes).sum() <= self.limit:
+                lo = scale
+            else:
+                hi = scale
+        return np.clip(lo * weight, low, high).astype(int)
@@ -1,12 +1,29 @@
 from __future__ import annotations
 
-from collections import defaultdict, deque
-from typing import Final
+import bisect
+import struct
+from array import array
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import (
+    Dict,
+    Final,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+    overload,
+)
 
 from can.bus import BusABC
 from can.interfaces import VALID_INTERFACES
 from can.listener import Listener
-from can.notifier import Notifier
+from can.message import Message
+
+# Note: module imports as each imports this module
+from can_explorer import budget, pipeline, trigger
 
 INTERFACES: Final = sorted(list(VALID_INTERFACES))
 
@@ -14,57 +31,463 @@ _BAUDRATES = [33_333, 125_000, 250_000, 500_000, 1_000_000]
 BAUDRATES: Final = [format(i, "_d") for i in _BAUDRATES]
 
 
+class CanKey(NamedTuple):
+    """
+    Unique identity of a stream of frames.
+
+    Note: compares and hashes equal to a plain tuple of the same values
+    """
+
+    arbitration_id: int
+    is_extended_id: bool = False
+    is_fd: bool = False
+    channel: str = ""
+
+    def __index__(self) -> int:
+        return self.arbitration_id
+
+
+class Window(NamedTuple):
+    """
+    Payloads of a single id received within a time range.
+    """
+
+    timestamps: Tuple[float, ...]
+    payloads: bytes
+    width: int
+
+    def frames(self) -> Iterator[Tuple[float, bytes]]:
+        """
+        Iterate over each timestamp and payload.
+
+        Yields:
+            Tuple[float, bytes]
+        """
+        width = self.width
+        for i, timestamp in enumerate(self.timestamps):
+            yield timestamp, self.payloads[i * width : (i + 1) * width]
+
+
 class _Listener(Listener):
-    def __init__(self, buffer: Recorder, *args, **kwargs):
+    def __init__(self, buffer: Recorder, channel: str = "", *args, **kwargs):
         self.buffer = buffer
+        self.channel = channel
+        self.triggers = buffer.triggers
         super().__init__(*args, **kwargs)
 
-    def on_message_received(self, msg) -> None:
-        val = int.from_bytes(msg.data, byteorder="big")
-        self.buffer[msg.arbitration_id].append(val)
+    def on_message_received(self, msg: Message) -> None:
+        # Note: plain tuple avoids creating a CanKey for every frame
+        key = (msg.arbitration_id, msg.is_extended_id, msg.is_fd, self.channel)
+        self.buffer[key].append(msg.data, msg.timestamp)
+        if self.triggers.armed:
+            self.triggers.check(key, msg, self.buffer)
+
+
+class PayloadBuffer:
+    """
+    Ring buffer storing payloads as fixed width rows of a single bytearray,
+    alongside the timestamp each payload was received at.
 
+    Rows are allocated as payloads arrive, doubling from MIN up to `capacity`
+    rows, after which the oldest payload is overwritten. The buffer always
+    presents MAX values, where payloads not (or no longer) held read as zero.
+
+    The width is set by the first payload and widened if a longer one arrives.
+    Shorter payloads are right padded with zeros, so byte i of every row is
+    byte i of its payload. Indexing returns the big endian value of the leading
+    VALUE_SIZE bytes of each payload.
+    """
 
-class PayloadBuffer(deque):
     MIN = 50
     MAX = 2500
+    VALUE_SIZE = 8
 
-    def __init__(self):
-        super().__init__([0] * self.MAX, maxlen=self.MAX)
+    _FORMATS: Final = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+    def __init__(self, capacity: int = MAX) -> None:
+        self.width = 0
+        self.count = 0
+        self.capacity = min(capacity, self.MAX)
+        self._data: Union[bytearray, memoryview] = bytearray()
+        self._times: Union[array, memoryview[float]] = array("d")
+        self._head = 0
+        self._held = 0
+
+    @classmethod
+    def from_raw(
+        cls,
+        data: Union[bytearray, memoryview],
+        times: Union[array, memoryview[float]],
+        width: int,
+        count: int = 0,
+        held: Optional[int] = None,
+    ) -> PayloadBuffer:
+        """
+        Create a buffer around existing payloads without copying them.
 
-    def __getitem__(self, index) -> tuple:  # type: ignore [override]
-        # Add ability to utilize slicing
-        # Note: must convert deque to avoid runtime error
+        Args:
+            data (bytearray | memoryview): Writable rows * width bytes, oldest first
+            times (array | memoryview): Writable rows doubles, oldest first
+            width (int): Bytes per payload
+            count (int): Total number of payloads received
+            held (int, optional): Number of newest rows which are payloads,
+                all rows up to count if None
+
+        Returns:
+            PayloadBuffer
+        """
+        if len(data) != len(times) * width or len(times) > cls.MAX:
+            raise ValueError(f"Expected up to {cls.MAX} payloads of {width} bytes")
+        buffer = cls()
+        buffer._data = data
+        buffer._times = times
+        buffer._head = len(times)
+        buffer.width = width
+        buffer.count = count
+        buffer._held = min(count if held is None else held, len(times))
+        return buffer
+
+    def __len__(self) -> int:
+        return self.MAX
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self[:])
+
+    @overload
+    def __getitem__(self, index: int) -> int: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> tuple: ...
+
+    def __getitem__(self, index) -> Union[int, tuple]:
         if isinstance(index, slice):
-            return tuple(self)[index.start : index.stop : index.step]
-        return tuple(deque.__getitem__(self, index))
+            start, stop, step = index.indices(self.MAX)
+            if step != 1:
+                return self._values(0, self.MAX)[start:stop:step]
+            return self._values(start, max(start, stop))
+        if index < 0:
+            index += self.MAX
+        if not 0 <= index < self.MAX:
+            raise IndexError("PayloadBuffer index out of range")
+        return self._values(index, index + 1)[0]
+
+    @property
+    def rows(self) -> int:
+        """
+        Number of rows currently allocated.
+        """
+        return len(self._times)
+
+    @property
+    def held(self) -> int:
+        """
+        Number of payloads currently held.
+        """
+        return self._held
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._times) * (self.width + 8)
+
+    @property
+    def last(self) -> float:
+        """
+        Timestamp of the newest payload.
+        """
+        if not self.held:
+            return 0.0
+        return self._times[self._head - 1]
+
+    def rate(self) -> float:
+        """
+        Estimate the receive rate from the timestamps of the payloads held.
+
+        Returns:
+            float: Payloads per second
+        """
+        held = self.held
+        if held < 2:
+            return 0.0
+        times, head = self._times, self._head
+        span = times[head - 1] - times[(head - held) % len(times)]
+        return (held - 1) / span if span > 0 else 0.0
+
+    def _resize(self, width: int) -> None:
+        rows = len(self._times)
+        data = bytearray(rows * width)
+        if self.width:
+            old = self.width
+            for i in range(rows):
+                data[i * width : i * width + old] = self._data[i * old : (i + 1) * old]
+        self._data = data
+        self.width = width
+
+    def _grow(self) -> int:
+        rows = len(self._times)
+        if rows >= self.capacity:
+            return 0
+
+        # Note: rows are oldest first whenever the head reaches the end, so new
+        # (empty) rows are placed after them and become the oldest
+        extra = min(self.capacity, max(self.MIN, 2 * rows)) - rows
+        data = bytearray((rows + extra) * self.width)
+        data[: rows * self.width] = self._data
+        times = array("d", self._times)
+        times.frombytes(bytes(8 * extra))
+        self._data = data
+        self._times = times
+        return rows
+
+    def resize(self, capacity: int) -> None:
+        """
+        Set the maximum number of rows, discarding the oldest payloads if more
+        are currently allocated.
+
+        Note: must be called from the thread appending payloads
+
+        Args:
+            capacity (int)
+        """
+        capacity = max(1, min(capacity, self.MAX))
+        self.capacity = capacity
+        rows = len(self._times)
+        if rows <= capacity:
+            return
+
+        self._held = min(self._held, capacity)
+        discard = rows - capacity
+        self._data = bytearray(self.raw()[discard * self.width :])
+        self._times = array("d", self.raw_timestamps()[discard * 8 :])
+        self._head = 0
+
+    def append(self, payload: bytes, timestamp: float = 0.0) -> None:
+        """
+        Add a payload, overwriting the oldest once at capacity.
+
+        Args:
+            payload (bytes)
+            timestamp (float)
+        """
+        width = self.width
+        if len(payload) != width:
+            if len(payload) > width:
+                self._resize(len(payload))
+                width = self.width
+            else:
+                payload = bytes(payload).ljust(width, b"\0")
+
+        head = self._head
+        if head == len(self._times):
+            head = self._grow()
+        offset = head * width
+        self._data[offset : offset + width] = payload
+        self._times[head] = timestamp
+        self._head = head + 1
+        self.count += 1
+        if self._held < len(self._times):
+            self._held += 1
+
+    def copy(self) -> PayloadBuffer:
+        """
+        Copy the payloads held into a new buffer.
+
+        Note: must be called from the thread appending payloads to be consistent
+
+        Returns:
+            PayloadBuffer
+        """
+        held = self.held
+        times = self.raw_timestamps()
+        return PayloadBuffer.from_raw(
+            bytearray(self.raw(held)),
+            array("d", times[len(times) - 8 * held :]),
+            self.width,
+            self.count,
+        )
+
+    def timestamps(self) -> List[float]:
+        """
+        Get the timestamp of every row, oldest first.
+
+        Returns:
+            List[float]
+        """
+        head = self._head
+        return [*self._times[head:], *self._times[:head]]
+
+    def window(self, start: float, stop: float) -> Window:
+        """
+        Get the payloads received within a time range.
+
+        Args:
+            start (float): Inclusive timestamp
+            stop (float): Inclusive timestamp
+
+        Returns:
+            Window
+        """
+        # Note: rows not holding a payload are left out, their zero timestamps
+        # would fall in windows starting near zero
+        held = self.held
+        times = self.timestamps()[self.rows - held :]
+        data = self.raw(held)
+        first = bisect.bisect_left(times, start)
+        last = bisect.bisect_right(times, stop)
+        return Window(
+            tuple(times[first:last]),
+            data[first * self.width : last * self.width],
+            self.width,
+        )
+
+    def raw(self, count: Optional[int] = None) -> bytes:
+        """
+        Get all rows, or only the newest, oldest first as a single block of bytes.
+
+        Args:
+            count (int, optional): Number of newest rows
+
+        Returns:
+            bytes: rows * width bytes
+        """
+        data = self._data
+        split = self._head * self.width
+        if count is None or count * self.width >= len(data):
+            return bytes(data[split:]) + bytes(data[:split])
+        start = split - count * self.width
+        if start >= 0:
+            return bytes(data[start:split])
+        return bytes(data[start:]) + bytes(data[:split])
+
+    def raw_timestamps(self) -> bytes:
+        """
+        Get all timestamps, oldest first, as native doubles.
+
+        Returns:
+            bytes: rows * 8 bytes
+        """
+        head = self._head
+        return bytes(self._times[head:]) + bytes(self._times[:head])
+
+    def _values(self, start: int, stop: int) -> tuple:
+        count = stop - start
+        width = self.width
+        data = self._data
+        # Note: rows are derived from the data so a concurrent resize can not
+        # leave them inconsistent
+        rows = len(data) // width if width else 0
+
+        # Positions before the oldest row are empty
+        empty = self.MAX - rows
+        zeros = min(count, max(0, empty - start))
+        count -= zeros
+        if not count:
+            return (0,) * zeros
+
+        # Rotate the requested range of rows into chronological order
+        first = (self._head + max(0, start - empty)) % rows
+        block: Union[bytes, bytearray, memoryview]
+        if first + count <= rows:
+            block = data[first * width : (first + count) * width]
+        else:
+            wrap = first + count - rows
+            block = bytes(data[first * width :]) + bytes(data[: wrap * width])
+
+        size = min(width, self.VALUE_SIZE)
+        code = self._FORMATS.get(size)
+        if code is None:
+            values = tuple(
+                int.from_bytes(block[i : i + size], "big")
+                for i in range(0, len(block), width)
+            )
+        else:
+            pad = f"{width - size}x" if width > size else ""
+            values = struct.unpack(f">{(code + pad) * count}", block)
+        return (0,) * zeros + values if zeros else values
 
 
 class Recorder(defaultdict):
+    """
+    Payload buffers for every id received on one or more buses.
+
+    Frames are received through an ingestion pipeline, with keys tagged by the
+    channel name each bus was added under. The pipeline stores frames, checks
+    them against any armed triggers and keeps all buffers within the memory
+    budget, after which further stages may be added.
+    """
+
     _active = False
-    _notifier: Notifier
-    _listener: _Listener
-    _bus: BusABC
+    _buses: Dict[str, BusABC]
 
     def __init__(self):
         super().__init__(PayloadBuffer)
+        self._buses = {}
+        self.triggers = trigger.TriggerEngine()
+        self.budget = budget.MemoryBudget(self)
+        self.health = pipeline.Health()
+        self.pipeline = pipeline.Pipeline(
+            [self.health, pipeline.Store(self), self.budget]
+        )
+        self.health.pipeline = self.budget.pipeline = self.pipeline
+
+    def __missing__(self, key: Union[int, tuple]) -> PayloadBuffer:
+        key = CanKey(key) if isinstance(key, int) else CanKey(*key)
+        # Note: a plain id does not hash equal to its key, which may exist
+        buffer = self.get(key)
+        if buffer is None:
+            buffer = self[key] = PayloadBuffer()
+        return buffer
 
     def is_active(self) -> bool:
         return self._active
 
+    def snapshot(self) -> Future:
+        """
+        Copy every buffer from the ingest task, so payloads and timestamps are
+        not changed while being copied.
+
+        Returns:
+            Future: Dict[CanKey, PayloadBuffer] of copies
+        """
+        return self.pipeline.call(
+            lambda: {key: buffer.copy() for key, buffer in list(self.items())}
+        )
+
+    def listener(self, channel: str = "") -> _Listener:
+        """
+        Create a listener storing frames received on a channel.
+
+        Args:
+            channel (str)
+
+        Returns:
+            _Listener
+        """
+        return _Listener(self, channel)
+
     def start(self) -> None:
         if self.is_active():
             return
 
-        self._listener = _Listener(self)
-        self._notifier = Notifier(self._bus, [self._listener])
+        self.pipeline.start(self._buses)
         self._active = True
 
     def stop(self) -> None:
         if not self.is_active():
             return
 
-        self._notifier.stop()  # type: ignore [union-attr]
+        self.pipeline.stop()
+        self.triggers.flush(self)
         self._active = False
 
     def set_bus(self, bus: BusABC) -> None:
-        self._bus = bus
+        self.set_buses({"": bus})
+
+    def set_buses(self, buses: Dict[str, BusABC]) -> None:
+        """
+        Set the buses to capture, keyed by channel name.
+
+        Args:
+            buses (Dict[str, BusABC])
+        """
+        self._buses = dict(buses)
+        self.health.buses = self._buses
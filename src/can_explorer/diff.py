@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple
+
+import numpy as np
+
+from can_explorer import indexer, session
+from can_explorer.analysis import ValueSets
+from can_explorer.can_bus import CanKey, PayloadBuffer, Recorder
+from can_explorer.plotting import format_id
+
+
+class Capture(NamedTuple):
+    values: ValueSets
+    counts: Dict[CanKey, int]
+    rates: Dict[CanKey, float]
+
+
+class IdChange(NamedTuple):
+    can_id: CanKey
+    first_rate: float
+    second_rate: float
+    distance: float
+    score: float
+
+
+class ByteChange(NamedTuple):
+    can_id: CanKey
+    byte: int
+    distance: float
+    added: int
+    removed: int
+
+
+class Diff(NamedTuple):
+    added: List[CanKey]
+    removed: List[CanKey]
+    id_changes: List[IdChange]
+    byte_changes: List[ByteChange]
+
+
+def from_buffers(buffers: Dict[CanKey, PayloadBuffer]) -> Capture:
+    """
+    Summarise the payloads held by buffers, such as those of a session.
+
+    Args:
+        buffers (Dict[CanKey, PayloadBuffer])
+
+    Returns:
+        Capture
+    """
+    values = ValueSets()
+    values.update(buffers)
+    return Capture(
+        values,
+        {can_id: buffer.count for can_id, buffer in buffers.items()},
+        {can_id: buffer.rate() for can_id, buffer in buffers.items()},
+    )
+
+
+def load(path: Path) -> Capture:
+    """
+    Summarise a session, or every frame of a candump, ASC or BLF log.
+
+    Frames of a log are stored into buffers as they are read, which are folded
+    into the value sets before any could be overwritten.
+
+    Args:
+        path (Path)
+
+    Returns:
+        Capture
+    """
+    if session.is_session(path):
+        return from_buffers(session.load(path).buffers)
+
+    index = indexer.build(path)
+    recorder = Recorder()
+    listener = recorder.listener()
+    values = ValueSets()
+    for n, msg in enumerate(index.read(), 1):
+        listener.on_message_received(msg)
+        if n % PayloadBuffer.MAX == 0:
+            values.update(recorder)
+    values.update(recorder)
+
+    start, stop = index.duration()
+    span = stop - start
+    counts = {can_id: buffer.count for can_id, buffer in recorder.items()}
+    return Capture(
+        values,
+        counts,
+        {can_id: count / span if span > 0 else 0.0 for can_id, count in counts.items()},
+    )
+
+
+def compare(first: Capture, second: Capture) -> Diff:
+    """
+    Compare two captures, such as with a feature off and then on.
+
+    Ids received in only one capture are added or removed. Each byte of the
+    ids in both is compared by the Jaccard distance between the sets of values
+    it took, 0 when identical and 1 when disjoint. Ids are ranked by the sum of
+    their greatest byte distance and relative change in rate.
+
+    Args:
+        first (Capture)
+        second (Capture)
+
+    Returns:
+        Diff
+    """
+    added = sorted(set(second.counts) - set(first.counts))
+    removed = sorted(set(first.counts) - set(second.counts))
+    common = sorted(set(first.counts) & set(second.counts))
+
+    values_a = first.values.get(common)
+    values_b = second.values.get(common)
+    union = (values_a | values_b).sum(axis=2)
+    distance = 1 - np.divide(
+        (values_a & values_b).sum(axis=2),
+        union,
+        out=np.ones(union.shape),
+        where=union > 0,
+    )
+    new_values = (values_b & ~values_a).sum(axis=2)
+    old_values = (values_a & ~values_b).sum(axis=2)
+
+    rate_a = np.array([first.rates[can_id] for can_id in common])
+    rate_b = np.array([second.rates[can_id] for can_id in common])
+    fastest = np.maximum(rate_a, rate_b)
+    rate_change = np.divide(
+        np.abs(rate_b - rate_a),
+        fastest,
+        out=np.zeros(len(common)),
+        where=fastest > 0,
+    )
+    score = distance.max(axis=1, initial=0) + rate_change
+
+    id_changes = [
+        IdChange(
+            common[i],
+            float(rate_a[i]),
+            float(rate_b[i]),
+            float(distance[i].max(initial=0)),
+            float(score[i]),
+        )
+        for i in np.argsort(-score, kind="stable")
+    ]
+    changed = np.argwhere(distance > 0)
+    order = np.argsort(-distance[distance > 0], kind="stable")
+    byte_changes = [
+        ByteChange(
+            common[i],
+            int(byte),
+            float(distance[i, byte]),
+            int(new_values[i, byte]),
+            int(old_values[i, byte]),
+        )
+        for i, byte in changed[order]
+    ]
+    return Diff(added, removed, id_changes, byte_changes)
+
+
+def report(diff: Diff, id_format: Callable = hex, limit: int = 25) -> str:
+    """
+    Describe the largest differences of two captures.
+
+    Args:
+        diff (Diff)
+        id_format (Callable)
+        limit (int): Number of ids and bytes listed
+
+    Returns:
+        str
+    """
+
+    def ids(can_ids: List[CanKey]) -> str:
+        return ", ".join(format_id(can_id, id_format) for can_id in can_ids) or "-"
+
+    lines = [
+        f"Added ids: {ids(diff.added)}",
+        f"Removed ids: {ids(diff.removed)}",
+        "",
+        f"{'ID':<16}{'Rate (Hz)':>20}{'Distance':>10}",
+    ]
+    lines.extend(
+        f"{format_id(change.can_id, id_format):<16}"
+        f"{change.first_rate:>9.1f} -> {change.second_rate:<7.1f}"
+        f"{change.distance:>10.2f}"
+        for change in diff.id_changes[:limit]
+        if change.score > 0
+    )
+    lines.extend(
+        ["", f"{'ID':<16}{'Byte':>5}{'Distance':>10}{'Added':>7}{'Removed':>9}"]
+    )
+    lines.extend(
+        f"{format_id(change.can_id, id_format):<16}{change.byte:>5}"
+        f"{change.distance:>10.2f}{change.added:>7}{change.removed:>9}"
+        for change in diff.byte_changes[:limit]
+    )
+    return "\n".join(lines)
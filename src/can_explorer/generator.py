@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import argparse
+import heapq
+import random
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Final, Iterator, List, Optional, Sequence
+
+import can
+from can.bus import BusABC
+from can.listener import Listener
+
+CLASSIC_LENGTHS: Final = tuple(range(9))
+FD_LENGTHS: Final = (*range(9), 12, 16, 20, 24, 32, 48, 64)
+
+
+class Shape(str, Enum):
+    CONSTANT = "constant"
+    COUNTER = "counter"
+    RAMP = "ramp"
+    NOISE = "noise"
+    BURST = "burst"
+
+
+def frame_bits(length: int, is_extended_id: bool = False, is_fd: bool = False) -> int:
+    """
+    Approximate the number of bits a frame occupies on the bus.
+
+    Note: assumes worst case bit stuffing and no bitrate switch for CAN-FD
+
+    Args:
+        length (int): Number of data bytes
+        is_extended_id (bool)
+        is_fd (bool)
+
+    Returns:
+        int: Bits including interframe space
+    """
+    if is_fd:
+        header = 41 if is_extended_id else 22
+        crc = 17 if length <= 16 else 21
+        stuffed = header + 8 * length
+        return stuffed + stuffed // 4 + crc + crc // 4 + 5 + 13
+
+    header = 39 if is_extended_id else 19
+    stuffed = header + 8 * length + 15
+    return stuffed + (stuffed - 1) // 4 + 13
+
+
+@dataclass
+class Signal:
+    """
+    Periodic traffic for a single arbitration id.
+
+    Args:
+        arbitration_id (int)
+        rate (float): Frames per second
+        length (int): Number of data bytes
+        shape (Shape): Payload pattern
+        period (int): Frames per ramp cycle or between bursts
+        is_extended_id (bool)
+        is_fd (bool)
+    """
+
+    arbitration_id: int
+    rate: float
+    length: int = 8
+    shape: Shape = Shape.COUNTER
+    period: int = 100
+    is_extended_id: bool = False
+    is_fd: bool = False
+
+    def __post_init__(self) -> None:
+        valid = FD_LENGTHS if self.is_fd else CLASSIC_LENGTHS
+        if self.length not in valid:
+            raise ValueError(f"Invalid data length {self.length} for id {self}")
+        if self.rate <= 0:
+            raise ValueError(f"Rate must be positive for id {self}")
+
+    @property
+    def bits(self) -> int:
+        return frame_bits(self.length, self.is_extended_id, self.is_fd)
+
+    def payload(self, n: int, rng: random.Random) -> bytes:
+        """
+        Create the payload of the nth frame.
+
+        Args:
+            n (int): Frame index
+            rng (random.Random)
+
+        Returns:
+            bytes
+        """
+        width = 8 * self.length
+        if self.shape is Shape.COUNTER:
+            value = n
+        elif self.shape is Shape.RAMP:
+            value = ((n % self.period) << width) // self.period
+        elif self.shape is Shape.NOISE:
+            value = rng.getrandbits(width)
+        elif self.shape is Shape.BURST:
+            value = rng.getrandbits(width) if n % self.period < 5 else 0
+        else:
+            value = self.arbitration_id
+
+        return (value & ((1 << width) - 1)).to_bytes(self.length, "big")
+
+
+class TrafficGenerator:
+    """
+    Create a deterministic, timestamp ordered stream of frames from signals.
+    """
+
+    def __init__(self, signals: Sequence[Signal], seed: int = 0) -> None:
+        self.signals = list(signals)
+        self.seed = seed
+
+    @classmethod
+    def uniform(
+        cls,
+        n_ids: int,
+        rate: float = 100,
+        length: int = 8,
+        shape: Shape = Shape.COUNTER,
+        is_extended_id: bool = False,
+        is_fd: bool = False,
+        seed: int = 0,
+    ) -> TrafficGenerator:
+        """
+        Create a generator where every id shares the same configuration.
+
+        Args:
+            n_ids (int): Number of unique arbitration ids
+            rate (float): Frames per second per id
+
+        Returns:
+            TrafficGenerator
+        """
+        max_id = 0x1FFFFFFF if is_extended_id else 0x7FF
+        ids = sorted(random.Random(seed).sample(range(max_id + 1), n_ids))
+        signals = [
+            Signal(i, rate, length, shape, is_extended_id=is_extended_id, is_fd=is_fd)
+            for i in ids
+        ]
+        return cls(signals, seed)
+
+    @property
+    def bits_per_second(self) -> float:
+        return sum(signal.rate * signal.bits for signal in self.signals)
+
+    def load(self, bitrate: int) -> float:
+        """
+        Calculate the fraction of a bus the generated traffic would occupy.
+
+        Args:
+            bitrate (int)
+
+        Returns:
+            float: Bus load where 1.0 == saturated
+        """
+        return self.bits_per_second / bitrate
+
+    def saturate(self, bitrate: int) -> TrafficGenerator:
+        """
+        Scale all rates so the generated traffic saturates a bus.
+
+        Args:
+            bitrate (int)
+
+        Returns:
+            TrafficGenerator: self
+        """
+        factor = 1 / self.load(bitrate)
+        for signal in self.signals:
+            signal.rate *= factor
+        return self
+
+    def messages(
+        self, duration: Optional[float] = None, start: float = 0.0
+    ) -> Iterator[can.Message]:
+        """
+        Generate frames in timestamp order.
+
+        Args:
+            duration (float, optional): Seconds of traffic, infinite if None
+            start (float): Timestamp of the first frame
+
+        Yields:
+            can.Message
+        """
+        rng = random.Random(self.seed)
+        # (timestamp, index, frame count)
+        schedule = [(start, i, 0) for i in range(len(self.signals))]
+        heapq.heapify(schedule)
+        end = start + duration if duration is not None else float("inf")
+
+        while schedule:
+            timestamp, i, n = schedule[0]
+            if timestamp >= end:
+                return
+            signal = self.signals[i]
+            heapq.heapreplace(schedule, (start + (n + 1) / signal.rate, i, n + 1))
+            yield can.Message(
+                timestamp=timestamp,
+                arbitration_id=signal.arbitration_id,
+                is_extended_id=signal.is_extended_id,
+                is_fd=signal.is_fd,
+                data=signal.payload(n, rng),
+            )
+
+    def feed(self, listener: Listener, duration: float) -> int:
+        """
+        Pass frames directly to a listener as fast as possible.
+
+        Args:
+            listener (Listener)
+            duration (float): Seconds of traffic
+
+        Returns:
+            int: Number of frames
+        """
+        count = 0
+        for msg in self.messages(duration):
+            listener.on_message_received(msg)
+            count += 1
+        return count
+
+    def send(
+        self,
+        bus: BusABC,
+        duration: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> int:
+        """
+        Transmit frames onto a bus in real time.
+
+        Args:
+            bus (BusABC)
+            duration (float, optional): Seconds of traffic, infinite if None
+            cancel (threading.Event, optional): Stops transmitting once set
+
+        Returns:
+            int: Number of frames
+        """
+        count = 0
+        origin = time.perf_counter()
+        for msg in self.messages(duration):
+            if cancel is not None and cancel.is_set():
+                break
+            delay = msg.timestamp - (time.perf_counter() - origin)
+            if delay > 0:
+                time.sleep(delay)
+            msg.timestamp = time.time()
+            bus.send(msg)
+            count += 1
+        return count
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m can_explorer.generator",
+        description="Transmit synthetic CAN traffic for load testing.",
+    )
+    parser.add_argument("-i", "--interface", default="virtual")
+    parser.add_argument("-c", "--channel")
+    parser.add_argument("-b", "--bitrate", type=int)
+    parser.add_argument("-n", "--ids", type=int, default=50)
+    parser.add_argument("-r", "--rate", type=float, default=100, help="Hz per id")
+    parser.add_argument("-l", "--length", type=int, default=8)
+    parser.add_argument("-s", "--shape", choices=[s.value for s in Shape])
+    parser.add_argument("-d", "--duration", type=float)
+    parser.add_argument("--fd", action="store_true")
+    parser.add_argument("--extended", action="store_true")
+    parser.add_argument(
+        "--saturate", action="store_true", help="scale rates to fill --bitrate"
+    )
+    args = parser.parse_args(argv)
+
+    generator = TrafficGenerator.uniform(
+        args.ids,
+        args.rate,
+        args.length,
+        Shape(args.shape or Shape.COUNTER),
+        is_extended_id=args.extended,
+        is_fd=args.fd,
+    )
+    if args.saturate:
+        generator.saturate(args.bitrate or 1_000_000)
+
+    config = dict(interface=args.interface, channel=args.channel, fd=args.fd)
+    if args.bitrate:
+        config.update(bitrate=args.bitrate)
+    with can.Bus(**{k: v for k, v in config.items() if v}) as bus:
+        generator.send(bus, args.duration)
+
+
+if __name__ == "__main__":
+    main()
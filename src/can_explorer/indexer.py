@@ -0,0 +1,501 @@
+from __future__ import annotations
+
+import io
+import itertools
+import json
+import os
+import re
+import struct
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import (
+    Collection,
+    Dict,
+    Final,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Union,
+)
+
+import can
+
+_MAGIC: Final = b"CANXIDX1"
+_HEADER: Final = struct.Struct("<8sI")  # magic, json length
+_VERSION: Final = 1
+
+BLOCK_SIZE: Final = 1024**2
+CHUNK_SIZE: Final = 64 * 1024**2
+BLF_BLOCK_FRAMES: Final = 10_000
+
+# Bytes preceding the indexed size which must be unchanged to index incrementally
+_TAIL: Final = 64
+
+# Timestamp and id of a frame line, the id is in group 2 or 3
+_PATTERNS: Final[Dict[str, Pattern[bytes]]] = {
+    ".log": re.compile(rb"^\((\d+\.\d+)\)[ \t]+\S+[ \t]+([0-9A-Fa-f]+)#", re.M),
+    ".asc": re.compile(
+        rb"^[ \t]*(\d+\.\d+)[ \t]+(?:CANFD[ \t]+\d+[ \t]+(?:Rx|Tx)[ \t]+"
+        rb"([0-9A-Fa-f]+)x?[ \t]|\d+[ \t]+([0-9A-Fa-f]+)x?[ \t]+(?:Rx|Tx))",
+        re.M,
+    ),
+}
+
+# Characters of an id in the patterns above
+_ID: Final = rb"([0-9A-Fa-f]+)"
+
+_READERS: Final = {
+    ".log": can.CanutilsLogReader,
+    ".asc": can.ASCReader,
+    ".blf": can.BLFReader,
+}
+
+
+class Block(NamedTuple):
+    """
+    A contiguous range of a log.
+
+    Note: for BLF logs the offsets are frame numbers rather than bytes
+    """
+
+    offset: int
+    end: int
+    start: float
+    stop: float
+    counts: Dict[int, int]
+
+
+def index_path(path: Path) -> Path:
+    """
+    Get the path of the sidecar index of a log.
+
+    Args:
+        path (Path)
+
+    Returns:
+        Path
+    """
+    return path.with_name(path.name + ".idx")
+
+
+def _id_pattern(suffix: str, ids: Collection[int], base: int) -> Pattern[bytes]:
+    # Only match frame lines of the ids, so other lines are skipped by the regex
+    digits = b"|".join(
+        format(can_id, "x" if base == 16 else "d").encode() for can_id in ids
+    )
+    pattern = _PATTERNS[suffix]
+    return re.compile(
+        pattern.pattern.replace(_ID, rb"(0*(?:" + digits + rb"))"),
+        pattern.flags | re.IGNORECASE,
+    )
+
+
+def _block(offset: int, end: int, times: List[float], counts: Counter) -> Block:
+    return Block(
+        offset,
+        end,
+        min(times, default=0.0),
+        max(times, default=0.0),
+        dict(counts),
+    )
+
+
+def _scan(
+    path: str, suffix: str, base: int, start: int, stop: int, block_size: int
+) -> List[Block]:
+    """
+    Index the lines of a text log beginning within a range of bytes.
+
+    Note: runs in a worker process
+    """
+    pattern = _PATTERNS[suffix]
+    with open(path, "rb") as f:
+        if start:
+            # Skip the remainder of a line beginning before the range
+            f.seek(start - 1)
+            f.readline()
+        offset = f.tell()
+        data = f.read(max(0, stop - offset))
+        if data and not data.endswith(b"\n"):
+            # Note: a line left unterminated at the end of the log is indexed too
+            data += f.readline()
+
+    blocks = []
+    first = 0
+    while first < len(data):
+        end = data.find(b"\n", first + block_size - 1) + 1 or len(data)
+        matches = list(pattern.finditer(data, first, end))
+        blocks.append(
+            _block(
+                offset + first,
+                offset + end,
+                [float(match[1]) for match in matches],
+                Counter(int(match[2] or match[3], base) for match in matches),
+            )
+        )
+        first = end
+    return blocks
+
+
+def _scan_blf(path: str, block_frames: int) -> List[Block]:
+    blocks = []
+    frames = iter(can.BLFReader(path))
+    offset = 0
+    while True:
+        msgs = list(itertools.islice(frames, block_frames))
+        if not msgs:
+            break
+        blocks.append(
+            _block(
+                offset,
+                offset + len(msgs),
+                [msg.timestamp for msg in msgs],
+                Counter(msg.arbitration_id for msg in msgs),
+            )
+        )
+        offset += len(msgs)
+    return blocks
+
+
+class LogIndex:
+    """
+    Sidecar index of a candump, ASC or BLF log, so a time window or set of ids
+    can be read without parsing the rest of the file.
+
+    The log is divided into blocks, each recording its offset, time span and
+    the number of frames of each id. BLF logs are compressed so can not be read
+    from an offset, they are indexed by frame number and read from the start.
+
+    Args:
+        path (Path): Log
+        size (int): Bytes indexed
+        tail (bytes): Bytes preceding `size`
+        header (int): Offset of the first frame
+        base (int): Base of ids in text logs
+        blocks (List[Block])
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        size: int = 0,
+        tail: bytes = b"",
+        header: int = 0,
+        base: int = 16,
+        blocks: Optional[List[Block]] = None,
+    ) -> None:
+        self.path = path
+        self.size = size
+        self.tail = tail
+        self.header = header
+        self.base = base
+        self.blocks = blocks or []
+
+    @property
+    def suffix(self) -> str:
+        return self.path.suffix.lower()
+
+    def counts(self) -> Dict[int, int]:
+        """
+        Number of frames of each id.
+
+        Returns:
+            Dict[int, int]
+        """
+        counts: Counter = Counter()
+        for block in self.blocks:
+            counts.update(block.counts)
+        return dict(counts)
+
+    def duration(self) -> tuple:
+        """
+        First and last timestamp of the log.
+
+        Returns:
+            tuple: start, stop
+        """
+        blocks = [block for block in self.blocks if block.counts]
+        if not blocks:
+            return (0.0, 0.0)
+        return (
+            min(block.start for block in blocks),
+            max(block.stop for block in blocks),
+        )
+
+    def offset(self, timestamp: float) -> int:
+        """
+        Get the offset of the first block with frames at or after a timestamp.
+
+        Args:
+            timestamp (float)
+
+        Returns:
+            int: Offset, or the size indexed if all frames are older
+        """
+        for block in self.blocks:
+            if block.counts and block.stop >= timestamp:
+                return block.offset
+        return self.blocks[-1].end if self.blocks else 0
+
+    def select(
+        self,
+        start: Optional[float] = None,
+        stop: Optional[float] = None,
+        ids: Optional[Collection[int]] = None,
+    ) -> List[Block]:
+        """
+        Get the blocks which may hold frames within a window.
+
+        Args:
+            start (float, optional): Inclusive timestamp
+            stop (float, optional): Inclusive timestamp
+            ids (Collection[int], optional): Arbitration ids
+
+        Returns:
+            List[Block]
+        """
+        return [
+            block
+            for block in self.blocks
+            if block.counts
+            and (start is None or block.stop >= start)
+            and (stop is None or block.start <= stop)
+            and (ids is None or any(can_id in block.counts for can_id in ids))
+        ]
+
+    def read(
+        self,
+        start: Optional[float] = None,
+        stop: Optional[float] = None,
+        ids: Optional[Collection[int]] = None,
+    ) -> Iterator[can.Message]:
+        """
+        Read the frames within a window, parsing only the blocks which hold them.
+
+        Note: the window applies to the timestamps as written in the log
+
+        Args:
+            start (float, optional): Inclusive timestamp
+            stop (float, optional): Inclusive timestamp
+            ids (Collection[int], optional): Arbitration ids
+
+        Yields:
+            can.Message
+        """
+        wanted = set(ids) if ids is not None else None
+        blocks = self.select(start, stop, wanted)
+        if not blocks:
+            return
+
+        def keep(timestamp: float, can_id: int) -> bool:
+            return (
+                (start is None or timestamp >= start)
+                and (stop is None or timestamp <= stop)
+                and (wanted is None or can_id in wanted)
+            )
+
+        if self.suffix == ".blf":
+            frames = itertools.islice(
+                can.BLFReader(self.path), blocks[0].offset, blocks[-1].end
+            )
+            for msg in frames:
+                if keep(msg.timestamp, msg.arbitration_id):
+                    yield msg
+            return
+
+        if wanted is None:
+            pattern = _PATTERNS[self.suffix]
+        else:
+            pattern = _id_pattern(self.suffix, wanted, self.base)
+        with open(self.path, "rb") as f:
+            header = f.read(self.header)
+            for block in blocks:
+                # Note: the header is prepended to every block instead
+                offset = max(block.offset, self.header)
+                f.seek(offset)
+                data = f.read(block.end - offset)
+                inside = (start is None or block.start >= start) and (
+                    stop is None or block.stop <= stop
+                )
+                if not inside or wanted is not None:
+                    data = b"".join(
+                        data[match.start() : data.find(b"\n", match.start()) + 1]
+                        for match in pattern.finditer(data)
+                        if keep(float(match[1]), int(match[2] or match[3], self.base))
+                    )
+                text = (header + data).decode()
+                yield from _READERS[self.suffix](io.StringIO(text))
+
+    def matches(self, path: Path) -> bool:
+        """
+        Check whether a log begins with the contents indexed.
+
+        Args:
+            path (Path)
+
+        Returns:
+            bool
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < self.size:
+                return False
+            f.seek(self.size - len(self.tail))
+            return f.read(len(self.tail)) == self.tail
+
+    def save(self, path: Path) -> None:
+        """
+        Write the index.
+
+        Args:
+            path (Path)
+        """
+        index = json.dumps(
+            dict(
+                version=_VERSION,
+                size=self.size,
+                tail=self.tail.hex(),
+                header=self.header,
+                base=self.base,
+                blocks=[
+                    [*block[:4], list(map(list, block.counts.items()))]
+                    for block in self.blocks
+                ],
+            )
+        ).encode()
+
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, len(index)))
+            f.write(index)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path, log: Path) -> LogIndex:
+        """
+        Read an index.
+
+        Args:
+            path (Path): Index
+            log (Path): Log indexed
+
+        Raises:
+            ValueError: If the file is not a compatible index
+
+        Returns:
+            LogIndex
+        """
+        with open(path, "rb") as f:
+            magic, length = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC:
+                raise ValueError(f"{path} is not a log index")
+            index = json.loads(f.read(length))
+        if index["version"] != _VERSION:
+            raise ValueError(f"{path} was written by an incompatible version")
+
+        return cls(
+            log,
+            index["size"],
+            bytes.fromhex(index["tail"]),
+            index["header"],
+            index["base"],
+            [
+                Block(offset, end, start, stop, dict(counts))
+                for offset, end, start, stop, counts in index["blocks"]
+            ],
+        )
+
+
+def _header(path: Path, pattern: Pattern[bytes]) -> tuple:
+    # Offset of the first frame and base of ids, from the lines preceding it
+    base = 16
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if pattern.match(line):
+                break
+            if line.strip().lower().startswith(b"base dec"):
+                base = 10
+            offset += len(line)
+    return offset, base
+
+
+def build(
+    path: Union[str, Path],
+    workers: Optional[int] = None,
+    block_size: int = BLOCK_SIZE,
+    chunk_size: int = CHUNK_SIZE,
+) -> LogIndex:
+    """
+    Index a log, scanning chunks of it in parallel across a process pool.
+
+    The index is saved alongside the log (when writable) and reused while the
+    log is unchanged.
+    If the log has been appended to, only the new contents are scanned.
+
+    Args:
+        path (Union[str, Path]): Candump (.log), ASC (.asc) or BLF (.blf) log
+        workers (int, optional): Processes, defaults to the number of CPUs
+        block_size (int): Bytes per block of a text log
+        chunk_size (int): Bytes scanned by each task
+
+    Raises:
+        ValueError: If the log format is not supported
+
+    Returns:
+        LogIndex
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix not in _READERS:
+        raise ValueError(f"Can not index {path.name}, expected {', '.join(_READERS)}")
+
+    sidecar = index_path(path)
+    try:
+        index: Optional[LogIndex] = LogIndex.load(sidecar, path)
+        if not index.matches(path):  # type: ignore [union-attr]
+            index = None
+    except (OSError, ValueError, KeyError):
+        index = None
+
+    size = path.stat().st_size
+    if index is not None and index.size == size:
+        return index
+
+    if suffix == ".blf":
+        # Note: compressed containers can not be split, so always a full scan
+        blocks = _scan_blf(str(path), BLF_BLOCK_FRAMES)
+        index = LogIndex(path, size, blocks=blocks)
+    else:
+        if index is None:
+            header, base = _header(path, _PATTERNS[suffix])
+            index = LogIndex(path, header=header, base=base)
+        elif index.blocks and not index.tail.endswith(b"\n"):
+            # The last line was unterminated and may since have been completed
+            index.size = index.blocks.pop().offset
+        starts = range(index.size, size, chunk_size)
+        args = [
+            (str(path), suffix, index.base, start, start + chunk_size, block_size)
+            for start in starts
+        ]
+        if len(args) > 1 and workers != 1:
+            with ProcessPoolExecutor(workers) as pool:
+                futures = [pool.submit(_scan, *arg) for arg in args]
+                chunks = [future.result() for future in futures]
+        else:
+            chunks = [_scan(*arg) for arg in args]
+        index.blocks.extend(itertools.chain.from_iterable(chunks))
+        # Note: the log may have grown while being scanned
+        index.size = max(size, index.blocks[-1].end if index.blocks else 0)
+
+    with open(path, "rb") as f:
+        f.seek(max(0, index.size - _TAIL))
+        index.tail = f.read(index.size - f.tell())
+    try:
+        index.save(sidecar)
+    except OSError:
+        # Note: the log may be on a read only file system, ie installed resources
+        pass
+    return index
@@ -1,5 +1,5 @@
 from enum import Enum, Flag, auto, unique
-from typing import Callable, Final, Iterable, Union, cast
+from typing import Any, Callable, Dict, Final, Iterable, List, Sequence, Union, cast
 
 import dearpygui.dearpygui as dpg
 from dearpygui_ext.themes import create_theme_imgui_light
@@ -36,9 +36,12 @@ class Tag(str, Enum):
     HEADER = auto()
     BODY = auto()
     FOOTER = auto()
+    FOOTER_STATUS = auto()
     MAIN_BUTTON = auto()
     CLEAR_BUTTON = auto()
+    MARK_BUTTON = auto()
     TAB_VIEWER = auto()
+    TAB_HEATMAP = auto()
     TAB_SETTINGS = auto()
     SETTINGS_PLOT_BUFFER = auto()
     SETTINGS_PLOT_HEIGHT = auto()
@@ -47,11 +50,20 @@ class Tag(str, Enum):
     SETTINGS_BAUDRATE = auto()
     SETTINGS_APPLY = auto()
     SETTINGS_ID_FORMAT = auto()
+    SETTINGS_CHANNEL_VIEW = auto()
+    SETTINGS_VIEW_MODE = auto()
+    SETTINGS_HIDE_NOISE = auto()
+    SETTINGS_SESSION_SAVE = auto()
+    SETTINGS_SESSION_LOAD = auto()
+    SETTINGS_SESSION_ON_EXIT = auto()
+    HEATMAP_COLOR = auto()
 
 
 class PercentageWidthTableRow:
     # https://github.com/hoffstadt/DearPyGui/discussions/1306
 
+    __slots__ = ("table_id", "stage_id")
+
     def __init__(self, **kwargs):
         self.table_id = dpg.add_table(
             header_row=False,
@@ -77,6 +89,8 @@ class PlotTable(PercentageWidthTableRow):
     COLUMN_1_WIDTH: Final = 15
     COLUMN_2_WIDTH: Final = 85
 
+    __slots__ = ()
+
     def __init__(self, **kwargs):
         super().__init__(parent=Tag.TAB_VIEWER, **kwargs)
 
@@ -111,32 +125,39 @@ def _init_themes():
     dpg.bind_theme(default)
 
 
-def _header() -> None:
-    def tab_callback(sender, app_data, user_data) -> None:
-        current_tab = dpg.get_item_label(app_data)
+# Group shown for each header tab
+_TABS: Final = {
+    "Viewer": Tag.TAB_VIEWER,
+    "Heatmap": Tag.TAB_HEATMAP,
+    "Settings": Tag.TAB_SETTINGS,
+}
+
 
-        if current_tab == "Viewer":
-            dpg.configure_item(Tag.TAB_VIEWER, show=True)
-            dpg.configure_item(Tag.TAB_SETTINGS, show=False)
-        else:
-            dpg.configure_item(Tag.TAB_VIEWER, show=False)
-            dpg.configure_item(Tag.TAB_SETTINGS, show=True)
+def _tab_callback(sender, app_data, user_data) -> None:
+    current_tab = dpg.get_item_label(app_data)
 
-    with dpg.tab_bar(tag=Tag.HEADER, callback=tab_callback):
-        dpg.add_tab(label="Viewer")
-        dpg.add_tab(label="Settings")
+    for label, tag in _TABS.items():
+        dpg.configure_item(tag, show=label == current_tab)
+
+
+def _header() -> None:
+    with dpg.tab_bar(tag=Tag.HEADER, callback=_tab_callback):
+        for label in _TABS:
+            dpg.add_tab(label=label)
 
 
 def _body() -> None:
     with dpg.child_window(tag=Tag.BODY, border=False):
         with dpg.group(tag=Tag.TAB_VIEWER, show=True):
             _viewer_tab()
+        with dpg.group(tag=Tag.TAB_HEATMAP, show=False):
+            _heatmap_tab()
         with dpg.group(tag=Tag.TAB_SETTINGS, show=False):
             _settings_tab()
 
 
 def _footer() -> None:
-    with dpg.child_window(tag=Tag.FOOTER, height=110, border=False, no_scrollbar=True):
+    with dpg.child_window(tag=Tag.FOOTER, height=130, border=False, no_scrollbar=True):
         dpg.add_spacer(height=2)
         dpg.add_separator()
         dpg.add_spacer(height=2)
@@ -173,12 +194,19 @@ def _footer() -> None:
                         format="%d%%",
                     )
         dpg.add_spacer(height=2)
+        dpg.add_text(tag=Tag.FOOTER_STATUS)
+        dpg.add_spacer(height=2)
 
         dpg.add_separator()
         dpg.add_spacer(height=2)
         with dpg.group(horizontal=True):
             dpg.add_button(
                 tag=Tag.MAIN_BUTTON,
+                width=-200,
+                height=50,
+            )
+            dpg.add_button(
+                tag=Tag.MARK_BUTTON,
                 width=-100,
                 height=50,
             )
@@ -194,10 +222,23 @@ def _viewer_tab() -> None:
     ...
 
 
+def _heatmap_tab() -> None:
+    with dpg.group(horizontal=True):
+        dpg.add_text("Color")
+        dpg.add_radio_button(
+            ["Value", "Changes"],
+            tag=Tag.HEATMAP_COLOR,
+            default_value="Value",
+            horizontal=True,
+        )
+
+
 def _settings_tab() -> None:
     with dpg.collapsing_header(label="CAN Bus", default_open=True):
         dpg.add_combo(tag=Tag.SETTINGS_INTERFACE, label="Interface")
-        dpg.add_input_text(tag=Tag.SETTINGS_CHANNEL, label="Channel")
+        dpg.add_input_text(
+            tag=Tag.SETTINGS_CHANNEL, label="Channel", hint="can0, can1, ..."
+        )
         dpg.add_combo(tag=Tag.SETTINGS_BAUDRATE, label="Baudrate")
         dpg.add_spacer(height=5)
         dpg.add_button(tag=Tag.SETTINGS_APPLY, label="Apply", height=30)
@@ -211,6 +252,23 @@ def _settings_tab() -> None:
                 tag=Tag.SETTINGS_ID_FORMAT,
                 horizontal=True,
             )
+        with dpg.group(horizontal=True):
+            dpg.add_text("Channels")
+            dpg.add_radio_button(
+                ["Merged", "Grouped"],
+                tag=Tag.SETTINGS_CHANNEL_VIEW,
+                horizontal=True,
+            )
+        with dpg.group(horizontal=True):
+            dpg.add_text("View")
+            dpg.add_radio_button(
+                ["Plots", "Overview"],
+                tag=Tag.SETTINGS_VIEW_MODE,
+                horizontal=True,
+            )
+        dpg.add_checkbox(
+            tag=Tag.SETTINGS_HIDE_NOISE, label="Hide counters and checksums"
+        )
         with dpg.group(horizontal=True):
             dpg.add_text("Theme")
             dpg.add_radio_button(
@@ -229,6 +287,13 @@ def _settings_tab() -> None:
         )
         dpg.add_spacer(height=5)
 
+    with dpg.collapsing_header(label="Session"):
+        dpg.add_checkbox(tag=Tag.SETTINGS_SESSION_ON_EXIT, label="Save on exit")
+        with dpg.group(horizontal=True):
+            dpg.add_button(tag=Tag.SETTINGS_SESSION_SAVE, label="Save", height=30)
+            dpg.add_button(tag=Tag.SETTINGS_SESSION_LOAD, label="Load", height=30)
+        dpg.add_spacer(height=5)
+
 
 def create() -> None:
     _init_fonts()
@@ -282,6 +347,26 @@ def popup_error(name: Union[str, Exception], info: Union[str, Exception]) -> Non
     )
 
 
+def popup_table(
+    label: str, headers: Sequence[str], rows: Iterable[Sequence[Any]]
+) -> None:
+    """
+    Show rows of results in a window, replacing any previous window of the label.
+    """
+    tag = f"popup_table_{label}"
+    if dpg.does_item_exist(tag):
+        dpg.delete_item(tag)
+
+    with dpg.window(tag=tag, label=label, width=400, height=300):
+        with dpg.table(header_row=True, policy=dpg.mvTable_SizingStretchSame):
+            for header in headers:
+                dpg.add_table_column(label=header)
+            for row in rows:
+                with dpg.table_row():
+                    for cell in row:
+                        dpg.add_text(str(cell))
+
+
 def get_settings_plot_buffer() -> int:
     max_value = PayloadBuffer.MAX
     percentage = dpg.get_value(Tag.SETTINGS_PLOT_BUFFER)
@@ -302,6 +387,10 @@ def get_settings_channel() -> str:
     return dpg.get_value(Tag.SETTINGS_CHANNEL)
 
 
+def get_settings_channels() -> List[str]:
+    return [i.strip() for i in get_settings_channel().split(",") if i.strip()]
+
+
 def get_settings_baudrate() -> int:
     return dpg.get_value(Tag.SETTINGS_BAUDRATE)
 
@@ -312,11 +401,87 @@ def get_settings_id_format() -> Callable:
     )
 
 
+def get_settings_group_channels() -> bool:
+    return dpg.get_value(Tag.SETTINGS_CHANNEL_VIEW).lower() == "grouped"
+
+
+def get_settings_overview() -> bool:
+    return dpg.get_value(Tag.SETTINGS_VIEW_MODE).lower() == "overview"
+
+
+def get_settings_hide_noise() -> bool:
+    return dpg.get_value(Tag.SETTINGS_HIDE_NOISE)
+
+
+def get_header_tab() -> str:
+    tab = dpg.get_value(Tag.HEADER)
+    # Note: no tab is selected until the first frame is rendered
+    return dpg.get_item_label(tab) if tab else next(iter(_TABS))
+
+
+def get_heatmap_color() -> str:
+    return dpg.get_value(Tag.HEATMAP_COLOR)
+
+
+def get_settings_save_on_exit() -> bool:
+    return dpg.get_value(Tag.SETTINGS_SESSION_ON_EXIT)
+
+
+# Settings which are persisted with a session
+_SESSION_SETTINGS: Final = (
+    Tag.SETTINGS_PLOT_BUFFER,
+    Tag.SETTINGS_PLOT_HEIGHT,
+    Tag.SETTINGS_INTERFACE,
+    Tag.SETTINGS_CHANNEL,
+    Tag.SETTINGS_BAUDRATE,
+    Tag.SETTINGS_ID_FORMAT,
+    Tag.SETTINGS_CHANNEL_VIEW,
+    Tag.SETTINGS_VIEW_MODE,
+    Tag.SETTINGS_HIDE_NOISE,
+    Tag.SETTINGS_SESSION_ON_EXIT,
+    Tag.HEATMAP_COLOR,
+)
+
+
+def get_session_settings() -> Dict[str, Any]:
+    return {tag.name: dpg.get_value(tag) for tag in _SESSION_SETTINGS}
+
+
+def set_session_settings(settings: Dict[str, Any]) -> None:
+    for tag in _SESSION_SETTINGS:
+        if tag.name in settings:
+            dpg.set_value(tag, settings[tag.name])
+
+
 def set_main_button_label(state: Flag) -> None:
     labels = ("Stop", "Start")
     dpg.set_item_label(Tag.MAIN_BUTTON, labels[not state])
 
 
+def set_mark_button_label(marking: bool) -> None:
+    dpg.set_item_label(Tag.MARK_BUTTON, "End Mark" if marking else "Mark")
+
+
+def set_footer_status(text: str) -> None:
+    dpg.set_value(Tag.FOOTER_STATUS, text)
+
+
+def set_mark_button_callback(callback: Callable) -> None:
+    dpg.configure_item(Tag.MARK_BUTTON, callback=callback)
+
+
+def set_header_tab_callback(callback: Callable) -> None:
+    def tab_callback(sender, app_data, user_data) -> None:
+        _tab_callback(sender, app_data, user_data)
+        callback(sender, app_data, user_data)
+
+    dpg.configure_item(Tag.HEADER, callback=tab_callback)
+
+
+def set_heatmap_color_callback(callback: Callable) -> None:
+    dpg.configure_item(Tag.HEATMAP_COLOR, callback=callback)
+
+
 def set_main_button_callback(callback: Callable) -> None:
     dpg.configure_item(Tag.MAIN_BUTTON, callback=callback)
 
@@ -341,6 +506,26 @@ def set_settings_can_id_format_callback(callback: Callable) -> None:
     dpg.configure_item(Tag.SETTINGS_ID_FORMAT, callback=callback)
 
 
+def set_settings_channel_view_callback(callback: Callable) -> None:
+    dpg.configure_item(Tag.SETTINGS_CHANNEL_VIEW, callback=callback)
+
+
+def set_settings_view_mode_callback(callback: Callable) -> None:
+    dpg.configure_item(Tag.SETTINGS_VIEW_MODE, callback=callback)
+
+
+def set_settings_hide_noise_callback(callback: Callable) -> None:
+    dpg.configure_item(Tag.SETTINGS_HIDE_NOISE, callback=callback)
+
+
+def set_settings_session_save_callback(callback: Callable) -> None:
+    dpg.configure_item(Tag.SETTINGS_SESSION_SAVE, callback=callback)
+
+
+def set_settings_session_load_callback(callback: Callable) -> None:
+    dpg.configure_item(Tag.SETTINGS_SESSION_LOAD, callback=callback)
+
+
 def set_settings_interface_options(iterable: Iterable[str], default: str = "") -> None:
     dpg.configure_item(Tag.SETTINGS_INTERFACE, items=iterable, default_value=default)
 
@@ -0,0 +1,585 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Final,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import can
+from can.bus import BusABC
+from can.listener import AsyncBufferedReader, Listener
+from can.message import Message
+from can.notifier import Notifier
+
+if TYPE_CHECKING:
+    from can_explorer.can_bus import Recorder
+
+
+class Batch(NamedTuple):
+    channel: str
+    messages: List[Message]
+
+
+class Stage:
+    """
+    Base processing stage, subclass and override process to create a plugin.
+
+    Inline stages run in order on the ingest task and may filter or replace a
+    batch by returning a different one. Other stages each run on their own
+    task behind a bounded queue, so a slow stage drops batches (counted by
+    `dropped`) rather than delaying ingestion. Their process method runs in a
+    worker thread unless it is a coroutine function.
+    """
+
+    dropped = 0
+
+    def process(self, batch: Batch) -> Batch:
+        """
+        Handle a batch of frames received on a single channel.
+
+        Args:
+            batch (Batch)
+
+        Returns:
+            Batch: Passed to the next inline stage
+        """
+        return batch
+
+    def on_error(self, channel: str, exc: Exception) -> None:
+        """
+        Called when receiving from a bus failed, after which it is not read.
+
+        Args:
+            channel (str)
+            exc (Exception)
+        """
+
+    def on_evict(self, key: tuple) -> None:
+        """
+        Called when the memory budget evicted an id, to release state kept for it.
+
+        Args:
+            key (tuple): CanKey of the id
+        """
+
+    def close(self) -> None:
+        """
+        Called once the pipeline has stopped.
+        """
+
+
+class Filter(Stage):
+    """
+    Drop frames which do not satisfy a predicate.
+    """
+
+    def __init__(self, predicate: Callable[[Message], bool]) -> None:
+        self.predicate = predicate
+
+    def process(self, batch: Batch) -> Batch:
+        return Batch(batch.channel, list(filter(self.predicate, batch.messages)))
+
+
+class Decode(Stage):
+    """
+    Decode payloads into named values, keeping the latest values of each id.
+
+    Args:
+        decoders (Dict[int, Callable]): Decoder of each arbitration id
+    """
+
+    def __init__(
+        self, decoders: Dict[int, Callable[[bytearray], Dict[str, Any]]]
+    ) -> None:
+        self.decoders = decoders
+        self.values: Dict[tuple, Dict[str, Any]] = {}
+
+    def process(self, batch: Batch) -> Batch:
+        decoders = self.decoders
+        for msg in batch.messages:
+            decoder = decoders.get(msg.arbitration_id)
+            if decoder is not None:
+                key = (msg.arbitration_id, msg.is_extended_id, msg.is_fd, batch.channel)
+                self.values[key] = decoder(msg.data)
+        return batch
+
+    def on_evict(self, key: tuple) -> None:
+        self.values.pop(key, None)
+
+
+class Stats(Stage):
+    """
+    Count frames and payload bytes of each id.
+    """
+
+    def __init__(self) -> None:
+        self.frames: Counter = Counter()
+        self.bytes = 0
+        # first, last timestamp
+        self.span: Dict[tuple, Tuple[float, float]] = {}
+
+    def process(self, batch: Batch) -> Batch:
+        channel = batch.channel
+        frames, span = self.frames, self.span
+        for msg in batch.messages:
+            key = (msg.arbitration_id, msg.is_extended_id, msg.is_fd, channel)
+            frames[key] += 1
+            self.bytes += len(msg.data)
+            first = span[key][0] if key in span else msg.timestamp
+            span[key] = (first, msg.timestamp)
+        return batch
+
+    def rate(self, key: tuple) -> float:
+        """
+        Average frames per second of an id.
+
+        Args:
+            key (tuple)
+
+        Returns:
+            float
+        """
+        first, last = self.span.get(key, (0.0, 0.0))
+        if last <= first:
+            return 0.0
+        return (self.frames[key] - 1) / (last - first)
+
+    def on_evict(self, key: tuple) -> None:
+        self.frames.pop(key, None)
+        self.span.pop(key, None)
+
+
+class HealthStats(NamedTuple):
+    error_frames: int
+    remote_frames: int
+    gaps: int
+    receive_errors: int
+    latency: float
+    latency_max: float
+    dropped: int
+    plugins_dropped: int
+
+
+class Health(Stage):
+    """
+    Account for frames which tell whether a missing signal comes from the bus
+    or from receiving too slowly.
+
+    - Error and remote frames are counted per channel. They are left in the
+      batch for later stages, but carry no payload so are not stored.
+    - An interval between frames of an id longer than GAP times its mean
+      interval is counted as a gap, where frames were likely dropped
+    - Errors receiving from a bus are counted per channel
+    - Latency is the time the oldest frame of each batch waited before being
+      processed, as a moving average and maximum. It is only meaningful when
+      interfaces timestamp frames with the wall clock.
+    - Frames dropped before reaching the viewer are read from buses which
+      count them, such as a RemoteBus whose capture agent fell behind
+    - Frames dropped by plugins of the pipeline which fell behind, such as a
+      RingRecorder writing to a slow disk, are summed across its plugins
+
+    Args:
+        clock (Callable[[], float]): Wall clock seconds
+    """
+
+    GAP: Final = 3.0
+    MIN_INTERVALS: Final = 8
+    # Latencies beyond this are from timestamps not on the wall clock
+    MAX_LATENCY: Final = 60.0
+
+    def __init__(self, clock: Callable[[], float] = time.time) -> None:
+        self.clock = clock
+        self.error_frames: Counter = Counter()
+        self.remote_frames: Counter = Counter()
+        self.gaps: Counter = Counter()
+        self.receive_errors: Counter = Counter()
+        self.last_error: Optional[Exception] = None
+        self.latency = 0.0
+        self.latency_max = 0.0
+        self.buses: Dict[str, BusABC] = {}
+        self.pipeline: Optional[Pipeline] = None
+        self._batches = 0
+        # Last timestamp, mean interval and number of intervals of each id
+        self._intervals: Dict[tuple, Tuple[float, float, int]] = {}
+        self._evicted_gaps = 0
+
+    def process(self, batch: Batch) -> Batch:
+        channel = batch.channel
+        messages = batch.messages
+        latency = self.clock() - messages[0].timestamp
+        if 0 <= latency <= self.MAX_LATENCY:
+            # Note: the moving average starts from the first batch
+            self._batches = min(self._batches + 1, 16)
+            self.latency += (latency - self.latency) / self._batches
+            self.latency_max = max(self.latency_max, latency)
+
+        intervals, gap, ready = self._intervals, self.GAP, self.MIN_INTERVALS
+        for msg in messages:
+            if msg.is_error_frame:
+                self.error_frames[channel] += 1
+                continue
+            if msg.is_remote_frame:
+                self.remote_frames[channel] += 1
+                continue
+
+            key = (msg.arbitration_id, msg.is_extended_id, msg.is_fd, channel)
+            timestamp = msg.timestamp
+            if key not in intervals:
+                intervals[key] = (timestamp, 0.0, 0)
+                continue
+            last, mean, n = intervals[key]
+            interval = timestamp - last
+            if n >= ready and interval > gap * mean:
+                # Note: gaps are left out of the mean interval
+                self.gaps[key] += 1
+                intervals[key] = (timestamp, mean, n)
+            else:
+                # Cumulative mean, then a moving average of 32 intervals
+                n += 1
+                intervals[key] = (timestamp, mean + (interval - mean) / min(n, 32), n)
+        return batch
+
+    def on_error(self, channel: str, exc: Exception) -> None:
+        self.receive_errors[channel] += 1
+        self.last_error = exc
+
+    def on_evict(self, key: tuple) -> None:
+        self._intervals.pop(key, None)
+        # Note: gaps of evicted ids still count towards the total
+        self._evicted_gaps += self.gaps.pop(key, 0)
+
+    def snapshot(self) -> HealthStats:
+        """
+        Get the totals across all channels and ids.
+
+        Returns:
+            HealthStats
+        """
+        return HealthStats(
+            sum(self.error_frames.values()),
+            sum(self.remote_frames.values()),
+            sum(self.gaps.values()) + self._evicted_gaps,
+            sum(self.receive_errors.values()),
+            self.latency,
+            self.latency_max,
+            sum(getattr(bus, "dropped", 0) for bus in list(self.buses.values())),
+            sum(stage.dropped for stage in self.pipeline.plugins)
+            if self.pipeline is not None
+            else 0,
+        )
+
+
+class Store(Stage):
+    """
+    Store payloads in a recorder and check its triggers, skipping error and
+    remote frames.
+    """
+
+    def __init__(self, recorder: Recorder) -> None:
+        self.recorder = recorder
+        self._listeners: Dict[str, Listener] = {}
+
+    def process(self, batch: Batch) -> Batch:
+        listener = self._listeners.get(batch.channel)
+        if listener is None:
+            listener = self._listeners[batch.channel] = self.recorder.listener(
+                batch.channel
+            )
+        on_message_received = listener.on_message_received
+        for msg in batch.messages:
+            if msg.is_error_frame or msg.is_remote_frame:
+                continue
+            on_message_received(msg)
+        return batch
+
+
+class Export(Stage):
+    """
+    Write frames to any log format supported by python-can.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.logger = can.Logger(path)
+
+    def process(self, batch: Batch) -> Batch:
+        for msg in batch.messages:
+            self.logger.on_message_received(msg)
+        return batch
+
+    def close(self) -> None:
+        self.logger.stop()
+
+
+class _Reader(AsyncBufferedReader):
+    # Note: the notifier stops reading a bus once it has reported an error
+    def __init__(self, pipeline: Pipeline, channel: str) -> None:
+        super().__init__()
+        self.pipeline = pipeline
+        self.channel = channel
+
+    def on_error(self, exc: Exception) -> None:
+        self.pipeline.on_error(self.channel, exc)
+
+
+class Pipeline:
+    """
+    Receive frames from buses with asyncio and pass them through stages in batches.
+
+    Each bus is read by a Notifier bound to the pipeline event loop, which runs
+    on its own thread once started.
+
+    Args:
+        stages (Sequence[Stage]): Inline stages
+        batch_size (int): Maximum frames per batch
+        queue_size (int): Batches held for each non inline stage
+    """
+
+    def __init__(
+        self, stages: Sequence[Stage] = (), batch_size: int = 512, queue_size: int = 64
+    ) -> None:
+        self.stages: List[Stage] = list(stages)
+        self.plugins: List[Stage] = []
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self._queues: Dict[Stage, asyncio.Queue] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._calls: Deque[Tuple[Callable[[], Any], Future]] = deque()
+        self._lock = threading.Lock()
+
+    def add(
+        self, stage: Stage, inline: bool = False, index: Optional[int] = None
+    ) -> Stage:
+        """
+        Add a stage, which may be done while running.
+
+        Args:
+            stage (Stage)
+            inline (bool): Run on the ingest task, see Stage
+            index (int, optional): Position among inline stages, last if None
+
+        Returns:
+            Stage
+        """
+        if inline:
+            stages = list(self.stages)
+            stages.insert(len(stages) if index is None else index, stage)
+            # Note: replaced rather than mutated as the ingest task may be iterating
+            self.stages = stages
+        else:
+            self.plugins = [*self.plugins, stage]
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._spawn, stage)
+        return stage
+
+    def remove(self, stage: Stage) -> None:
+        if stage in self.stages:
+            self.stages = [i for i in self.stages if i is not stage]
+            return
+        self.plugins = [i for i in self.plugins if i is not stage]
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._release, stage)
+
+    def process(self, batch: Batch) -> None:
+        """
+        Pass a batch through the inline stages and queue it for all others.
+
+        Args:
+            batch (Batch)
+        """
+        for stage in self.stages:
+            batch = stage.process(batch)
+            if not batch.messages:
+                return
+        for stage, queue in self._queues.items():
+            try:
+                queue.put_nowait(batch)
+            except asyncio.QueueFull:
+                stage.dropped += len(batch.messages)
+
+    def call(self, func: Callable[[], Any]) -> Future:
+        """
+        Run a function on the ingest task between batches, where it sees every
+        inline stage in a consistent state. Runs immediately when not running.
+
+        Args:
+            func (Callable[[], Any])
+
+        Returns:
+            Future: Result of func
+        """
+        future: Future = Future()
+        with self._lock:
+            if self._loop is not None:
+                self._calls.append((func, future))
+                self._loop.call_soon_threadsafe(self._run_calls)
+                return future
+        self._calls.append((func, future))
+        self._run_calls()
+        return future
+
+    def _run_calls(self) -> None:
+        while self._calls:
+            try:
+                func, future = self._calls.popleft()
+            except IndexError:
+                return
+            try:
+                future.set_result(func())
+            except Exception as exc:
+                future.set_exception(exc)
+
+    def on_error(self, channel: str, exc: Exception) -> None:
+        """
+        Pass an error receiving from a bus to every stage.
+
+        Args:
+            channel (str)
+            exc (Exception)
+        """
+        for stage in [*self.stages, *self.plugins]:
+            stage.on_error(channel, exc)
+
+    def on_evict(self, key: tuple) -> None:
+        """
+        Pass an id evicted by the memory budget to every stage.
+
+        Args:
+            key (tuple): CanKey of the id
+        """
+        for stage in [*self.stages, *self.plugins]:
+            stage.on_evict(key)
+
+    def _spawn(self, stage: Stage) -> None:
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self._queues[stage] = queue
+        self._tasks.append(asyncio.ensure_future(self._consume(stage, queue)))
+
+    def _release(self, stage: Stage) -> None:
+        queue = self._queues.pop(stage, None)
+        if queue is not None:
+            # Note: waits for space so every queued batch is processed first
+            asyncio.ensure_future(queue.put(None))
+
+    async def _consume(self, stage: Stage, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    break
+                if asyncio.iscoroutinefunction(stage.process):
+                    await stage.process(batch)
+                else:
+                    await loop.run_in_executor(None, stage.process, batch)
+        finally:
+            stage.close()
+
+    async def _ingest(self, channel: str, reader: AsyncBufferedReader) -> None:
+        queue = reader.buffer
+        size = self.batch_size
+        while True:
+            messages = [await queue.get()]
+            while len(messages) < size and not queue.empty():
+                messages.append(queue.get_nowait())
+            self.process(Batch(channel, messages))
+
+    async def run(self, buses: Dict[str, BusABC]) -> None:
+        """
+        Process frames from buses, keyed by channel name, until stopped.
+
+        Args:
+            buses (Dict[str, BusABC])
+        """
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        self._stopping = asyncio.Event()
+        for stage in self.plugins:
+            self._spawn(stage)
+
+        readers = {channel: _Reader(self, channel) for channel in buses}
+        notifiers = [
+            Notifier(bus, [readers[channel]], loop=loop)
+            for channel, bus in buses.items()
+        ]
+        ingest = [
+            asyncio.ensure_future(self._ingest(channel, reader))
+            for channel, reader in readers.items()
+        ]
+        try:
+            await self._stopping.wait()
+        finally:
+            for notifier in notifiers:
+                notifier.stop()
+            for task in ingest:
+                task.cancel()
+            await asyncio.gather(*ingest, return_exceptions=True)
+
+            # Process frames received while stopping
+            for channel, reader in readers.items():
+                queue = reader.buffer
+                while not queue.empty():
+                    messages: List[Message] = []
+                    while len(messages) < self.batch_size and not queue.empty():
+                        messages.append(queue.get_nowait())
+                    self.process(Batch(channel, messages))
+
+            for stage in list(self._queues):
+                self._release(stage)
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            for stage in self.stages:
+                stage.close()
+            self._tasks.clear()
+            with self._lock:
+                self._loop = None
+            # Calls made while stopping
+            self._run_calls()
+
+    def start(self, buses: Dict[str, BusABC]) -> None:
+        """
+        Run on a background thread.
+
+        Args:
+            buses (Dict[str, BusABC])
+        """
+        ready = threading.Event()
+
+        async def main() -> None:
+            task = asyncio.ensure_future(self.run(buses))
+            await asyncio.sleep(0)
+            ready.set()
+            await task
+
+        self._thread = threading.Thread(
+            target=asyncio.run, args=(main(),), name="pipeline", daemon=True
+        )
+        self._thread.start()
+        ready.wait()
+
+    def stop(self) -> None:
+        """
+        Stop the background thread once all received frames are processed.
+        """
+        if self._thread is None:
+            return
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join()
+        self._thread = None
@@ -1,12 +1,28 @@
 from __future__ import annotations
 
-from typing import Callable, Dict, Iterable
+import bisect
+import math
+import time
+from enum import Enum
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Final,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import dearpygui.dearpygui as dpg
+import numpy as np
 
-from can_explorer.can_bus import PayloadBuffer
-from can_explorer.layout import Default, Font, PlotTable
-from can_explorer.resources import generate_tag
+from can_explorer import analysis
+from can_explorer.can_bus import CanKey, PayloadBuffer
+from can_explorer.layout import Default, Font, PlotTable, Tag
 
 
 class Config:
@@ -26,70 +42,102 @@ class Config:
     Y_AXIS = dict(axis=dpg.mvYAxis, lock_min=True, lock_max=True, no_tick_labels=True)
 
 
-class Plot(str):
-    x_axis: str
-    y_axis: str
-    series: str
+class Plot:
+    __slots__ = ("tag", "x_axis", "y_axis", "series")
 
-    def __new__(cls, x: Iterable, y: Iterable) -> Plot:
-        with dpg.plot(tag=str(generate_tag()), **Config.PLOT) as plot:
-            plot = super().__new__(cls, plot)
-            plot.x_axis = dpg.add_plot_axis(**Config.X_AXIS)
-            plot.y_axis = dpg.add_plot_axis(**Config.Y_AXIS)
-            plot.series = dpg.add_line_series(parent=plot.y_axis, x=x, y=y)
+    def __init__(self, x: Iterable, y: Iterable) -> None:
+        with dpg.plot(**Config.PLOT) as plot:
+            self.tag = plot
+            self.x_axis = dpg.add_plot_axis(**Config.X_AXIS)
+            self.y_axis = dpg.add_plot_axis(**Config.Y_AXIS)
+            self.series = dpg.add_line_series(parent=self.y_axis, x=x, y=y)
 
-        return plot
-
-    def update(self, x: Iterable, y: Iterable) -> None:
-        dpg.set_axis_limits(self.x_axis, min(x), max(x))
+    def update(self, x: Sequence, y: Iterable) -> None:
+        # Note: x is always ascending
+        dpg.set_axis_limits(self.x_axis, x[0], x[-1])
         dpg.set_axis_limits(self.y_axis, min(y), max(y))
         dpg.configure_item(self.series, x=x, y=y)
 
 
-class Label(str):
-    def __new__(cls) -> Label:
-        label = dpg.add_button(
-            tag=str(generate_tag()),
-            **Config.LABEL,
-        )
-        dpg.bind_item_font(label, Font.LABEL)
+def add_label() -> int:
+    """
+    Add the button labelling a row.
 
-        return super().__new__(cls, label)
+    Returns:
+        int: Tag
+    """
+    label = dpg.add_button(**Config.LABEL)
+    dpg.bind_item_font(label, Font.LABEL)
+    return label
 
 
 class Row:
+    __slots__ = ("_can_id", "table", "label", "plot", "height", "label_format")
+
     table: PlotTable
-    label: Label
+    label: int
     plot: Plot
     height: int
     label_format: Callable
 
     def __init__(
-        self, can_id: int, id_format: Callable, height: int, x: Iterable, y: Iterable
+        self,
+        can_id: int,
+        id_format: Callable,
+        height: int,
+        x: Iterable,
+        y: Iterable,
+        before: int = 0,
     ) -> None:
         self._can_id = can_id
-        self.table = PlotTable()
-        self.label = Label()
+        self.table = PlotTable(before=before)
+        self.label = add_label()
         self.plot = Plot(x, y)
         self.table.add_label(self.label)
-        self.table.add_plot(self.plot)
+        self.table.add_plot(self.plot.tag)
         self.table.submit()
         self.set_label(id_format)
         self.set_height(height)
 
     def set_height(self, height: int) -> None:
         dpg.set_item_height(self.label, height)
-        dpg.set_item_height(self.plot, height)
+        dpg.set_item_height(self.plot.tag, height)
         self.height = height
 
     def set_label(self, id_format: Callable) -> None:
-        dpg.set_item_label(self.label, id_format(self._can_id))
+        dpg.set_item_label(self.label, format_id(self._can_id, id_format))
         self.label_format = id_format
 
+    def is_visible(self) -> bool:
+        return dpg.is_item_visible(self.plot.tag)
+
     def delete(self) -> None:
         dpg.delete_item(self.table.table_id)
 
 
+def format_id(can_id: Union[int, CanKey], id_format: Callable) -> str:
+    """
+    Format a CAN id, marking the channel, extended and CAN-FD ids.
+
+    Args:
+        can_id (Union[int, CanKey])
+        id_format (Callable)
+
+    Returns:
+        str: Label
+    """
+    label = str(id_format(can_id))
+    if not isinstance(can_id, CanKey):
+        return label
+    if can_id.channel:
+        label = f"{can_id.channel} {label}"
+    if can_id.is_extended_id:
+        label += " ext"
+    if can_id.is_fd:
+        label += " fd"
+    return label
+
+
 class AxisData(dict):
     x: tuple
     y: tuple
@@ -99,23 +147,141 @@ class AxisData(dict):
         y = tuple(payloads)
         super().__init__(dict(x=x, y=y))
 
+    @classmethod
+    def from_xy(cls, x: Iterable, y: Iterable) -> AxisData:
+        data = cls(())
+        data.update(x=x, y=y)
+        return data
 
-class PlotManager:
-    row: Dict[int, Row] = {}
-    payload: Dict[int, PayloadBuffer] = {}
-    _height = Default.PLOT_HEIGHT
-    _x_limit = Default.BUFFER_SIZE
-    _id_format: Callable = Default.ID_FORMAT
 
-    def __call__(self) -> dict[int, Row]:
+class Decimation:
+    """
+    Min/max views of the values of a buffer, one per power of two bucket size.
+
+    Each level halves the previous one, and levels and the views sliced from
+    them are built on first use and kept until the buffer receives a payload,
+    so returning to a previous number of values plotted is a lookup.
+
+    Args:
+        payloads (PayloadBuffer)
+        mask (np.ndarray, optional): Mask of each leading byte
+    """
+
+    def __init__(
+        self, payloads: PayloadBuffer, mask: Optional[np.ndarray] = None
+    ) -> None:
+        self.payloads = payloads
+        self.mask = mask
+        self._key: tuple = ()
+        self._levels: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._views: Dict[Tuple[int, int], AxisData] = {}
+
+    def _level(self, size: int) -> Tuple[np.ndarray, np.ndarray]:
+
+        if size not in self._levels:
+            if size == 1:
+                if self.mask is None:
+                    values = np.array(self.payloads[:], dtype=float)
+                else:
+                    values = analysis.masked_values(self.payloads, self.mask)
+                self._levels[1] = (values, values)
+            else:
+                low, high = self._level(size // 2)
+                # Buckets end at the newest value, the oldest odd one is dropped
+                start = len(low) % 2
+                self._levels[size] = (
+                    low[start:].reshape(-1, 2).min(axis=1),
+                    high[start:].reshape(-1, 2).max(axis=1),
+                )
+        return self._levels[size]
+
+    def view(self, limit: int, points: int) -> AxisData:
+        """
+        Get the newest `limit` values as the min and max of buckets, so at most
+        2 * `points` points are plotted.
+
+        Args:
+            limit (int): Number of newest values
+            points (int): Maximum number of buckets
+
+        Returns:
+            AxisData
+        """
+        key = (self.payloads.count, self.payloads.rows)
+        if key != self._key:
+            self._key = key
+            self._levels.clear()
+            self._views.clear()
+        if (limit, points) in self._views:
+            return self._views[limit, points]
+
+        size = 1 << max(0, math.ceil(math.log2(limit / points)))
+        low, high = self._level(size)
+        buckets = min(len(low), -(-limit // size))
+        start = limit - buckets * size + np.arange(buckets) * size
+
+        x = np.empty(2 * buckets)
+        y = np.empty(2 * buckets)
+        x[0::2], x[1::2] = start, start + size - 1
+        y[0::2], y[1::2] = low[-buckets:], high[-buckets:]
+        view = self._views[limit, points] = AxisData.from_xy(x.tolist(), y.tolist())
+        return view
+
+
+def _identity(can_id: int) -> Any:
+    return can_id
+
+
+class PlotManager:
+    """
+    Plots the newest payloads of each id in a row of its own.
+
+    Rows are kept in order of `sort_key` by a sorted index, so a new id is
+    inserted in place rather than repopulating every row.
+
+    Plots of more than POINTS payloads show the min and max of buckets from a
+    cached Decimation. Changing the limit only marks rows as stale, they are
+    then updated by `refresh` a few at a time once the limit stops changing.
+    """
+
+    POINTS: Final = 500
+    REFRESH_ROWS: Final = 50
+    DEBOUNCE: Final = 0.1
+
+    def __init__(self) -> None:
+        self.row: Dict[int, Row] = {}
+        self.payload: Dict[int, PayloadBuffer] = {}
+        # Note: masks are kept while rows are removed and added again
+        self.mask: Dict[int, np.ndarray] = {}
+        self.sort_key: Callable[[int], Any] = _identity
+        # Sort keys of the rows in display order, with their ids
+        self._keys: List[Any] = []
+        self._ids: List[int] = []
+        self._decimation: Dict[int, Decimation] = {}
+        self._stale: Dict[int, None] = {}
+        self._changed = 0.0
+        self._height = Default.PLOT_HEIGHT
+        self._x_limit = Default.BUFFER_SIZE
+        self._id_format: Callable = Default.ID_FORMAT
+
+    def __call__(self) -> Dict[int, Row]:
         """
         Get all of the currently active plots.
 
         Returns:
-            dict[int, Row]: Plots
+            Dict[int, Row]: Plots
         """
         return self.row
 
+    def ids(self) -> List[int]:
+        """
+        Get the ids of all plots in the order they are displayed.
+
+        Returns:
+            List[int]
+        """
+        return list(self._ids)
+
     def _slice(self, payloads: PayloadBuffer) -> Iterable:
         """
         Reduce the number of payloads by returning the N newest amount.
@@ -130,6 +296,17 @@ class PlotManager:
         """
         return payloads[len(payloads) - self._x_limit :]
 
+    def _axis_data(self, can_id: int, payloads: PayloadBuffer) -> AxisData:
+        mask = self.mask.get(can_id)
+        if self._x_limit <= self.POINTS:
+            if mask is not None:
+                values = analysis.masked_values(payloads, mask)
+                return AxisData(values[len(values) - self._x_limit :].tolist())
+            return AxisData(self._slice(payloads))
+        if can_id not in self._decimation:
+            self._decimation[can_id] = Decimation(payloads, mask)
+        return self._decimation[can_id].view(self._x_limit, self.POINTS)
+
     def add(self, can_id: int, payloads: PayloadBuffer) -> None:
         """
         Create a new plot.
@@ -144,10 +321,22 @@ class PlotManager:
         if can_id in self.row:
             raise Exception(f"Error: id {can_id} already exists")
 
+        key = self.sort_key(can_id)
+        index = bisect.bisect(self._keys, key)
+        # Note: 0 appends the row after all others
+        before = 0
+        if index < len(self._ids):
+            before = self.row[self._ids[index]].table.table_id
         row = Row(
-            can_id, self._id_format, self._height, **AxisData(self._slice(payloads))
+            can_id,
+            self._id_format,
+            self._height,
+            **self._axis_data(can_id, payloads),
+            before=before,
         )
 
+        self._keys.insert(index, key)
+        self._ids.insert(index, can_id)
         self.payload[can_id] = payloads
         self.row[can_id] = row
 
@@ -158,9 +347,15 @@ class PlotManager:
         Args:
             can_id (int)
         """
-        self.payload[can_id].pop()
-        self.row[can_id].delete()
-        self.row.pop(can_id)
+        index = bisect.bisect_left(self._keys, self.sort_key(can_id))
+        if index >= len(self._ids) or self._ids[index] != can_id:
+            # The sort key changed since the plot was added
+            index = self._ids.index(can_id)
+        del self._keys[index], self._ids[index]
+        self.payload.pop(can_id)
+        self._decimation.pop(can_id, None)
+        self._stale.pop(can_id, None)
+        self.row.pop(can_id).delete()
 
     def update(self, can_id: int) -> None:
         """
@@ -171,15 +366,28 @@ class PlotManager:
             payloads (PayloadBuffer)
         """
         row = self.row[can_id]
+        self._stale.pop(can_id, None)
 
-        row.plot.update(**AxisData(self._slice(self.payload[can_id])))
+        row.plot.update(**self._axis_data(can_id, self.payload[can_id]))
 
     def clear_all(self) -> None:
         """
         Remove all plots.
         """
-        while self.row:
-            self.delete(list(self.row).pop())
+        for row in self.row.values():
+            row.delete()
+        self.row, self.payload = {}, {}
+        self._keys, self._ids = [], []
+        self._decimation, self._stale = {}, {}
+
+    def visible(self) -> List[int]:
+        """
+        Get the ids of plots currently scrolled into view.
+
+        Returns:
+            List[int]
+        """
+        return [can_id for can_id, row in self.row.items() if row.is_visible()]
 
     def set_height(self, height: int) -> None:
         """
@@ -205,14 +413,295 @@ class PlotManager:
         for row in self.row.values():
             row.set_label(self._id_format)
 
+    def set_mask(self, can_id: int, mask: Optional[np.ndarray]) -> None:
+        """
+        Set the bits of each leading byte of an id which are plotted, or None
+        to plot every bit, updating its plot if the mask changed.
+
+        Args:
+            can_id (int)
+            mask (np.ndarray, optional): Mask of each leading byte
+        """
+        previous = self.mask.get(can_id)
+        if mask is None and previous is None:
+            return
+        if mask is not None and previous is not None and (mask == previous).all():
+            return
+
+        if mask is None:
+            del self.mask[can_id]
+        else:
+            self.mask[can_id] = mask
+        self._decimation.pop(can_id, None)
+        if can_id in self.row:
+            self.update(can_id)
+
     def set_limit(self, x_limit: int) -> None:
         """
-        Set the number of payloads to plot on the x axis.
+        Set the number of payloads to plot on the x axis, marking every row as
+        stale until it is updated.
 
         Args:
             x_limit (int): Number of payloads
         """
         self._x_limit = x_limit
+        self._changed = time.monotonic()
 
-        for can_id in self.row:
-            self.update(can_id)
+        visible = {can_id: bool(row.is_visible()) for can_id, row in self.row.items()}
+        # Note: rows are popped from the end, so visible rows are placed last
+        self._stale = dict.fromkeys(sorted(visible, key=visible.__getitem__))
+
+    def refresh(self, count: int = REFRESH_ROWS) -> bool:
+        """
+        Update some of the rows left stale by changing the limit, visible rows
+        first, once the limit has not changed for DEBOUNCE seconds.
+
+        Args:
+            count (int): Maximum number of rows to update
+
+        Returns:
+            bool: If rows remain stale
+        """
+        if time.monotonic() - self._changed < self.DEBOUNCE:
+            return bool(self._stale)
+
+        for _ in range(count):
+            try:
+                can_id, _ = self._stale.popitem()
+            except KeyError:
+                break
+            if can_id in self.row:
+                self.update(can_id)
+        return bool(self._stale)
+
+
+def _colormap(anchors: Sequence[Sequence[float]], size: int = 256) -> np.ndarray:
+    # Linear interpolation between evenly spaced RGB anchors, as RGBA rows
+    colors = np.asarray(anchors, dtype=np.float32)
+    positions = np.linspace(0, 1, len(colors))
+    steps = np.linspace(0, 1, size)
+    rgb = [np.interp(steps, positions, colors[:, i]) for i in range(3)]
+    return np.stack([*rgb, np.ones(size)], axis=1).astype(np.float32)
+
+
+class _TextureMap:
+    """
+    Base for views drawing ids as the rows of a single texture, with a pixel per
+    column. The texture is reused while the ids fit, with only the rows in use
+    shown.
+    """
+
+    MIN_ROWS: Final = 64
+    COLORMAP: Final = _colormap(
+        ((0.27, 0.0, 0.33), (0.13, 0.56, 0.55), (0.99, 0.91, 0.14))
+    )
+
+    parent: Tag = Tag.TAB_VIEWER
+    x_axis: dict = Config.X_AXIS
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.ids: List[int] = []
+        self.columns = 0
+        self._id_format: Callable = Default.ID_FORMAT
+        self._registry: Optional[int] = None
+        self._texture: Optional[int] = None
+        self._pixels = np.zeros((0, 0, 4), dtype=np.float32)
+        self._plot: Optional[int] = None
+        self._x_axis: Optional[int] = None
+
+    def _allocate(self, rows: int, columns: int) -> None:
+        if self._texture is not None and dpg.does_item_exist(self._texture):
+            if rows <= len(self._pixels) and columns == self._pixels.shape[1]:
+                return
+            dpg.delete_item(self._texture)
+        if self._registry is None or not dpg.does_item_exist(self._registry):
+            self._registry = dpg.add_texture_registry()
+
+        height = max(self.MIN_ROWS, 1 << (rows - 1).bit_length())
+        self._pixels = np.zeros((height, columns, 4), dtype=np.float32)
+        self._texture = dpg.add_dynamic_texture(
+            columns, height, self._pixels.ravel(), parent=self._registry
+        )
+
+    def _create(self, ids: Sequence[int], columns: int) -> None:
+        self.delete()
+        self.ids = list(ids)
+        self.columns = columns
+        rows = len(self.ids)
+        if not rows:
+            return
+
+        self._allocate(rows, columns)
+        self._pixels[:rows] = 0
+        with dpg.plot(parent=self.parent, height=-1, width=-1, **Config.PLOT) as plot:
+            self._x_axis = dpg.add_plot_axis(**self.x_axis)
+            y_axis = dpg.add_plot_axis(dpg.mvYAxis, lock_min=True, lock_max=True)
+            dpg.set_axis_limits(self._x_axis, 0, columns)
+            dpg.set_axis_limits(y_axis, 0, rows)
+            dpg.set_axis_ticks(
+                y_axis,
+                tuple(
+                    (format_id(can_id, self._id_format), rows - i - 0.5)
+                    for i, can_id in enumerate(self.ids)
+                ),
+            )
+            dpg.add_image_series(
+                self._texture,
+                (0, 0),
+                (columns, rows),
+                uv_max=(1, rows / len(self._pixels)),
+                parent=y_axis,
+            )
+        self._plot = plot
+
+    def delete(self) -> None:
+        if self._plot is not None:
+            dpg.delete_item(self._plot)
+        self._plot = None
+        self.ids = []
+
+    def set_id_format(self, id_format: Callable) -> None:
+        self._id_format = id_format
+
+
+class Overview(_TextureMap):
+    """
+    Draw ids as the rows of a single heatmap texture instead of a plot per id.
+
+    Each row is sampled at a fixed number of columns and normalised to its own
+    range, so every id is drawn by a single texture update and image series
+    rather than a series each.
+    """
+
+    COLUMNS: Final = 256
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._x_limit = Default.BUFFER_SIZE
+
+    def set_ids(self, ids: Sequence[int]) -> None:
+        """
+        Recreate the heatmap with a row per id, top to bottom.
+
+        Args:
+            ids (Sequence[int])
+        """
+        self._create(ids, self.COLUMNS)
+
+    def update(self, buffers: Dict[int, PayloadBuffer]) -> None:
+        """
+        Redraw every row from the newest payloads.
+
+        Args:
+            buffers (Dict[int, PayloadBuffer])
+        """
+        if self._plot is None:
+            return
+
+        empty = PayloadBuffer()
+        values = analysis.sample_values(
+            [buffers.get(can_id, empty) for can_id in self.ids],
+            self._x_limit,
+            self.COLUMNS,
+        )
+        low = values.min(axis=1, keepdims=True)
+        span = values.max(axis=1, keepdims=True) - low
+        scale = np.divide(len(self.COLORMAP) - 1, span, where=span > 0, out=span)
+        index = ((values - low) * scale).astype(np.uint8)
+        np.take(self.COLORMAP, index, axis=0, out=self._pixels[: len(values)])
+        dpg.set_value(self._texture, self._pixels.ravel())
+
+    def set_limit(self, x_limit: int) -> None:
+        self._x_limit = x_limit
+
+
+class HeatmapColor(Enum):
+    VALUE = "Value"
+    CHANGES = "Changes"
+
+
+class Heatmap(_TextureMap):
+    """
+    Draw the payload bytes of every id as the cells of a single texture, with a
+    row per id and a column per byte.
+
+    Cells are colored by the newest value of the byte, or by how often it
+    changed across the newest WINDOW payloads. Only ids which received payloads
+    since the previous update are read, and only the cells whose color changed
+    are written to the pixels.
+    """
+
+    WINDOW: Final = 32
+
+    parent = Tag.TAB_HEATMAP
+    x_axis = dict(axis=dpg.mvXAxis, lock_min=True, lock_max=True)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.color = HeatmapColor.VALUE
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._cells = np.zeros((0, 0), dtype=np.uint8)
+
+    def set_ids(self, ids: Sequence[int], columns: int = 8) -> None:
+        """
+        Recreate the heatmap with a row per id, top to bottom.
+
+        Args:
+            ids (Sequence[int])
+            columns (int): Number of leading payload bytes
+        """
+        self._create(ids, columns)
+        self.reset()
+        if self._plot is not None:
+            dpg.set_axis_ticks(
+                self._x_axis, tuple((str(i), i + 0.5) for i in range(columns))
+            )
+
+    def set_color(self, color: HeatmapColor) -> None:
+        self.color = color
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Redraw every cell on the next update.
+        """
+        self._counts = np.full(len(self.ids), -1, dtype=np.int64)
+        self._cells = np.zeros((len(self.ids), self.columns), dtype=np.uint8)
+        self._pixels[: len(self.ids)] = self.COLORMAP[0]
+
+    def update(self, buffers: Dict[int, PayloadBuffer]) -> int:
+        """
+        Redraw the cells of ids which received payloads since the last update.
+
+        Args:
+            buffers (Dict[int, PayloadBuffer])
+
+        Returns:
+            int: Number of cells written
+        """
+        if self._plot is None:
+            return 0
+
+        empty = PayloadBuffer()
+        rows = [buffers.get(can_id, empty) for can_id in self.ids]
+        counts = np.fromiter((buffer.count for buffer in rows), np.int64, len(rows))
+        fresh = np.flatnonzero(counts != self._counts)
+        if not len(fresh):
+            return 0
+        self._counts[fresh] = counts[fresh]
+
+        rows = [rows[i] for i in fresh]
+        if self.color is HeatmapColor.VALUE:
+            cells = analysis.newest_bytes(rows, self.columns)
+        else:
+            changes = analysis.byte_changes(rows, self.columns, self.WINDOW)
+            cells = (changes * (len(self.COLORMAP) - 1)).astype(np.uint8)
+
+        row, column = np.nonzero(cells != self._cells[fresh])
+        if not len(row):
+            return 0
+        self._cells[fresh[row], column] = cells[row, column]
+        self._pixels[fresh[row], column] = self.COLORMAP[cells[row, column]]
+        dpg.set_value(self._texture, self._pixels.ravel())
+        return len(row)
@@ -0,0 +1,400 @@
+"""
+Stream frames from a capture agent running next to the bus to a remote viewer.
+
+Frames are sent in batches, each prefixed by a header:
+
+    u32 length, u16 frame count, u32 frames dropped, f64 base timestamp
+
+followed by every frame encoded as:
+
+    u8 flags, varint timestamp delta (us, zigzag), varint arbitration id,
+    u8 length, payload
+
+The payload is delta encoded against the previous payload of the same id as a
+bitmask of changed bytes followed by only those bytes, unless the FULL flag is
+set. The agent drops (and counts) frames when the viewer can not keep up rather
+than blocking the bus.
+"""
+
+from __future__ import annotations
+
+import argparse
+import select
+import socket
+import struct
+import threading
+from collections import deque
+from typing import Deque, Dict, Final, List, Optional, Tuple, Union
+
+import can
+from can.bus import BusABC
+from can.exceptions import CanOperationError
+from can.listener import Listener
+from can.notifier import Notifier
+
+DEFAULT_PORT: Final = 29536
+
+_BATCH: Final = struct.Struct("<IHId")
+
+_EXTENDED: Final = 0x01
+_FD: Final = 0x02
+_REMOTE: Final = 0x04
+_ERROR: Final = 0x08
+_BRS: Final = 0x10
+_ESI: Final = 0x20
+_FULL: Final = 0x40
+
+Address = Union[str, Tuple[str, int]]
+
+
+def parse_address(channel: str) -> Tuple[int, Address]:
+    """
+    Parse a channel of the form `unix:///path`, `tcp://host:port` or `host:port`.
+
+    Args:
+        channel (str)
+
+    Returns:
+        Tuple[int, Address]: Socket family and address
+    """
+    if channel.startswith("unix://"):
+        return socket.AF_UNIX, channel[len("unix://") :]
+    if channel.startswith("tcp://"):
+        channel = channel[len("tcp://") :]
+    host, _, port = channel.rpartition(":")
+    return socket.AF_INET, (host or "localhost", int(port or DEFAULT_PORT))
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class Encoder:
+    """
+    Encode batches of frames for a single connection.
+    """
+
+    def __init__(self) -> None:
+        self._last: Dict[tuple, bytes] = {}
+
+    def encode(self, messages: List[can.Message], dropped: int = 0) -> bytes:
+        """
+        Encode a batch of frames.
+
+        Args:
+            messages (List[can.Message])
+            dropped (int): Frames dropped since the previous batch
+
+        Returns:
+            bytes
+        """
+        base = messages[0].timestamp if messages else 0.0
+        previous = round(base * 1e6)
+        out = bytearray()
+        for msg in messages:
+            flags = (
+                msg.is_extended_id * _EXTENDED
+                | msg.is_fd * _FD
+                | msg.is_remote_frame * _REMOTE
+                | msg.is_error_frame * _ERROR
+                | msg.bitrate_switch * _BRS
+                | msg.error_state_indicator * _ESI
+            )
+            data = bytes(msg.data)
+            key = (msg.arbitration_id, flags & (_EXTENDED | _FD))
+            last = self._last.get(key)
+            self._last[key] = data
+            if last is None or len(last) != len(data):
+                flags |= _FULL
+
+            timestamp = round(msg.timestamp * 1e6)
+            delta = timestamp - previous
+            previous = timestamp
+
+            out.append(flags)
+            _write_varint(out, (delta << 1) ^ (delta >> 63))
+            _write_varint(out, msg.arbitration_id)
+            out.append(len(data))
+            if flags & _FULL:
+                out += data
+                continue
+
+            mask = 0
+            changed = bytearray()
+            for i, new in enumerate(data):
+                if last[i] != new:  # type: ignore [index]
+                    mask |= 1 << i
+                    changed.append(new)
+            out += mask.to_bytes((len(data) + 7) // 8, "little")
+            out += changed
+
+        return _BATCH.pack(len(out), len(messages), dropped, base) + out
+
+
+class Decoder:
+    """
+    Decode a stream of batches from a single connection.
+    """
+
+    def __init__(self) -> None:
+        self.dropped = 0
+        self._last: Dict[tuple, bytes] = {}
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[can.Message]:
+        """
+        Decode all complete batches received so far.
+
+        Args:
+            data (bytes): Bytes received from the stream
+
+        Returns:
+            List[can.Message]
+        """
+        self._buffer += data
+        messages: List[can.Message] = []
+        while len(self._buffer) >= _BATCH.size:
+            length, count, dropped, base = _BATCH.unpack_from(self._buffer)
+            end = _BATCH.size + length
+            if len(self._buffer) < end:
+                break
+            self._decode(bytes(self._buffer[_BATCH.size : end]), count, base, messages)
+            self.dropped += dropped
+            del self._buffer[:end]
+        return messages
+
+    def _decode(
+        self, data: bytes, count: int, base: float, messages: List[can.Message]
+    ) -> None:
+        offset = 0
+        timestamp = round(base * 1e6)
+        for _ in range(count):
+            flags = data[offset]
+            delta, offset = _read_varint(data, offset + 1)
+            timestamp += (delta >> 1) ^ -(delta & 1)
+            arbitration_id, offset = _read_varint(data, offset)
+            length = data[offset]
+            offset += 1
+
+            key = (arbitration_id, flags & (_EXTENDED | _FD))
+            if flags & _FULL:
+                payload = data[offset : offset + length]
+                offset += length
+            else:
+                size = (length + 7) // 8
+                mask = int.from_bytes(data[offset : offset + size], "little")
+                offset += size
+                updated = bytearray(self._last[key])
+                for i in range(length):
+                    if mask >> i & 1:
+                        updated[i] = data[offset]
+                        offset += 1
+                payload = bytes(updated)
+            self._last[key] = payload
+
+            messages.append(
+                can.Message(
+                    timestamp=timestamp / 1e6,
+                    arbitration_id=arbitration_id,
+                    is_extended_id=bool(flags & _EXTENDED),
+                    is_fd=bool(flags & _FD),
+                    is_remote_frame=bool(flags & _REMOTE),
+                    is_error_frame=bool(flags & _ERROR),
+                    bitrate_switch=bool(flags & _BRS),
+                    error_state_indicator=bool(flags & _ESI),
+                    dlc=length,
+                    data=payload,
+                )
+            )
+
+
+class _AgentListener(Listener):
+    def __init__(self, queue_size: int) -> None:
+        self.queue: Deque[can.Message] = deque()
+        self.queue_size = queue_size
+        self.connected = False
+        self.dropped = 0
+
+    def on_message_received(self, msg: can.Message) -> None:
+        if not self.connected:
+            return
+        if len(self.queue) < self.queue_size:
+            self.queue.append(msg)
+        else:
+            self.dropped += 1
+
+
+class CaptureAgent:
+    """
+    Capture frames from a bus and stream them to one viewer at a time.
+
+    Args:
+        bus (BusABC)
+        channel (str): Address to listen on, see parse_address
+        queue_size (int): Frames held while the viewer is behind before dropping
+        batch_size (int): Maximum frames per batch
+        interval (float): Seconds between batches
+    """
+
+    def __init__(
+        self,
+        bus: BusABC,
+        channel: str = f"0.0.0.0:{DEFAULT_PORT}",
+        queue_size: int = 100_000,
+        batch_size: int = 1000,
+        interval: float = 0.01,
+    ) -> None:
+        self.bus = bus
+        self.batch_size = batch_size
+        self.interval = interval
+        self._listener = _AgentListener(queue_size)
+        self._cancel = threading.Event()
+
+        family, address = parse_address(channel)
+        self._server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(address)
+        self._server.listen(1)
+        self._server.settimeout(interval)
+        self.address = self._server.getsockname()
+
+    @property
+    def dropped(self) -> int:
+        return self._listener.dropped
+
+    def serve_forever(self) -> None:
+        notifier = Notifier(self.bus, [self._listener])
+        try:
+            while not self._cancel.is_set():
+                try:
+                    connection, _ = self._server.accept()
+                except socket.timeout:
+                    continue
+                with connection:
+                    self._stream(connection)
+        finally:
+            notifier.stop()
+            self._server.close()
+
+    def _stream(self, connection: socket.socket) -> None:
+        encoder = Encoder()
+        queue = self._listener.queue
+        queue.clear()
+        self._listener.connected = True
+        reported = self._listener.dropped
+        try:
+            while not self._cancel.is_set():
+                readable, *_ = select.select([connection], [], [], self.interval)
+                # Note: the viewer never sends, so the connection only becomes
+                # readable once it is closed, even while there is no traffic
+                if readable and not connection.recv(1 << 12):
+                    break
+                while queue or self._listener.dropped != reported:
+                    batch = [
+                        queue.popleft() for _ in range(min(len(queue), self.batch_size))
+                    ]
+                    dropped, reported = (
+                        self._listener.dropped - reported,
+                        self._listener.dropped,
+                    )
+                    # Note: blocks while the viewer is behind, causing the
+                    # listener queue to fill and drop frames
+                    connection.sendall(encoder.encode(batch, dropped))
+        except OSError:
+            pass
+        finally:
+            self._listener.connected = False
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self._cancel.set()
+
+
+class RemoteBus(BusABC):
+    """
+    Receive only bus which reads frames streamed by a CaptureAgent.
+
+    Available to python-can as the `remote` interface, where the channel is the
+    agent address.
+    """
+
+    def __init__(self, channel: str, **kwargs) -> None:
+        family, address = parse_address(str(channel))
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        self._socket.connect(address)
+        self._decoder = Decoder()
+        self._pending: Deque[can.Message] = deque()
+        self.channel_info = f"remote {channel}"
+        super().__init__(channel=channel, **kwargs)
+
+    @property
+    def dropped(self) -> int:
+        """
+        Frames the agent dropped because this bus could not keep up.
+        """
+        return self._decoder.dropped
+
+    def _recv_internal(
+        self, timeout: Optional[float]
+    ) -> Tuple[Optional[can.Message], bool]:
+        if not self._pending:
+            readable, *_ = select.select([self._socket], [], [], timeout)
+            if readable:
+                data = self._socket.recv(1 << 16)
+                if not data:
+                    raise CanOperationError("Capture agent closed the connection")
+                self._pending.extend(self._decoder.feed(data))
+
+        if self._pending:
+            return self._pending.popleft(), False
+        return None, False
+
+    def send(self, msg: can.Message, timeout: Optional[float] = None) -> None:
+        raise CanOperationError("Remote bus is receive only")
+
+    def shutdown(self) -> None:
+        self._socket.close()
+        super().shutdown()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m can_explorer.remote",
+        description="Stream CAN traffic to a remote can-explorer viewer.",
+    )
+    parser.add_argument("-i", "--interface", required=True)
+    parser.add_argument("-c", "--channel")
+    parser.add_argument("-b", "--bitrate", type=int)
+    parser.add_argument("-l", "--listen", default=f"0.0.0.0:{DEFAULT_PORT}")
+    args = parser.parse_args(argv)
+
+    config = dict(interface=args.interface, channel=args.channel, bitrate=args.bitrate)
+    with can.Bus(**{k: v for k, v in config.items() if v}) as bus:
+        agent = CaptureAgent(bus, args.listen)
+        try:
+            agent.serve_forever()
+        except KeyboardInterrupt:
+            agent.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Final, Optional, Tuple
+
+import can
+from can import BufferedReader, Listener
+from can.bus import BusABC
+from can.exceptions import CanOperationError
+
+from can_explorer.indexer import LogIndex
+
+MIN_SPEED: Final = 0.1
+MAX_SPEED: Final = 100.0
+
+
+class Replay:
+    """
+    Play the frames of an indexed log into a listener from a background thread,
+    preserving the time between frames scaled by a speed.
+
+    Frames are scheduled against the time playback started (or last changed
+    speed or position), so delays in delivering one frame are not carried over
+    to the next. Frames already due are delivered without waiting, so high
+    rates are limited only by the listener. How late frames are delivered is
+    recorded as the lag.
+
+    Args:
+        index (LogIndex)
+        listener (Listener): Receives frames, typically of a Recorder
+        speed (float, optional): Multiple of real time, or None for as fast as
+            possible
+        clock (Callable[[], float]): Monotonic seconds
+    """
+
+    def __init__(
+        self,
+        index: LogIndex,
+        listener: Listener,
+        speed: Optional[float] = 1.0,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self.index = index
+        self.listener = listener
+        self.clock = clock
+        self.position = index.duration()[0]
+        self.frames = 0
+        self.lag_max = 0.0
+        self._lag_total = 0.0
+        self._speed = self._clamp(speed)
+        self._seek: Optional[float] = None
+        self._rebase = False
+        self._closing = False
+        self._playing = threading.Event()
+        self._wake = threading.Event()
+        self._finished = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _clamp(speed: Optional[float]) -> Optional[float]:
+        return None if speed is None else min(max(speed, MIN_SPEED), MAX_SPEED)
+
+    @property
+    def speed(self) -> Optional[float]:
+        return self._speed
+
+    @speed.setter
+    def speed(self, speed: Optional[float]) -> None:
+        self._speed = self._clamp(speed)
+        self._rebase = True
+        self._wake.set()
+
+    @property
+    def lag(self) -> float:
+        """
+        Mean seconds frames were delivered after they were due.
+        """
+        return self._lag_total / self.frames if self.frames else 0.0
+
+    def is_playing(self) -> bool:
+        return self._playing.is_set() and not self._finished.is_set()
+
+    def is_finished(self) -> bool:
+        return self._finished.is_set()
+
+    def start(self) -> None:
+        """
+        Play from the current position, or from the beginning once finished.
+        """
+        if self._finished.is_set():
+            self.seek(self.index.duration()[0])
+
+        self._playing.set()
+        self._wake.set()
+        if self._thread is None or not self._thread.is_alive():
+            self._closing = False
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Pause at the current frame.
+        """
+        self._playing.clear()
+        self._wake.set()
+
+    def close(self) -> None:
+        """
+        Stop playing and end the background thread.
+        """
+        self._closing = True
+        self.stop()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def seek(self, timestamp: float) -> None:
+        """
+        Continue from the first frame at or after a timestamp of the log.
+
+        Args:
+            timestamp (float)
+        """
+        self._finished.clear()
+        if self._thread is not None and self._thread.is_alive():
+            self._seek = timestamp
+            self._wake.set()
+        else:
+            self.position = timestamp
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the end of the log is reached.
+
+        Args:
+            timeout (float, optional): Seconds
+
+        Returns:
+            bool: If the end was reached
+        """
+        return self._finished.wait(timeout)
+
+    def _run(self) -> None:
+        start = self.position
+        while True:
+            self._seek = None
+            reached = self._play(start)
+            if self._closing:
+                return
+            if reached:
+                self._finished.set()
+                return
+            start = self._seek  # type: ignore [assignment]
+
+    def _play(self, start: float) -> bool:
+        # Returns whether the end of the log was reached
+        listener = self.listener
+        clock = self.clock
+        anchor: Optional[tuple] = None
+        for msg in self.index.read(start=start):
+            while True:
+                if self._closing or self._seek is not None:
+                    return False
+                if not self._playing.is_set():
+                    # Note: timing restarts from the first frame after a pause
+                    anchor = None
+                    self._wake.wait()
+                    self._wake.clear()
+                    continue
+                if self._speed is None:
+                    break
+                if anchor is None or self._rebase:
+                    self._rebase = False
+                    anchor = (clock(), msg.timestamp)
+                due = anchor[0] + (msg.timestamp - anchor[1]) / self._speed
+                delay = due - clock()
+                if delay <= 0:
+                    self._lag_total -= delay
+                    self.lag_max = max(self.lag_max, -delay)
+                    break
+                self._wake.wait(delay)
+                self._wake.clear()
+
+            listener.on_message_received(msg)
+            self.position = msg.timestamp
+            self.frames += 1
+        return True
+
+
+class ReplayBus(BusABC):
+    """
+    Receive only bus which delivers the frames of a replay, so they pass
+    through the same pipeline as frames from a live bus.
+
+    Args:
+        index (LogIndex)
+        speed (float, optional): Multiple of real time, or None for as fast as
+            possible
+        clock (Callable[[], float]): Monotonic seconds
+    """
+
+    def __init__(
+        self,
+        index: LogIndex,
+        speed: Optional[float] = 1.0,
+        clock: Callable[[], float] = time.perf_counter,
+        **kwargs,
+    ) -> None:
+        self._reader = BufferedReader()
+        self.player = Replay(index, self._reader, speed, clock)
+        self.channel_info = f"replay {index.path}"
+        super().__init__(channel="replay", **kwargs)
+
+    def _recv_internal(
+        self, timeout: Optional[float]
+    ) -> Tuple[Optional[can.Message], bool]:
+        # Note: BusABC.recv keeps waiting while no frame is returned
+        timeout = 0.5 if timeout is None else timeout
+        return self._reader.get_message(timeout), False
+
+    def send(self, msg: can.Message, timeout: Optional[float] = None) -> None:
+        raise CanOperationError("Replay bus is receive only")
+
+    def shutdown(self) -> None:
+        self.player.close()
+        super().shutdown()
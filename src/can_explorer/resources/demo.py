@@ -1,10 +1,10 @@
-import sys
 import threading
 from pathlib import Path
 
-import can.player
+import can
 
 from can_explorer import app, layout
+from can_explorer.generator import Shape, TrafficGenerator
 
 DEMO_FILE = Path(__file__).parent / "ic_sim.log"
 
@@ -16,6 +16,18 @@ def demo_config() -> None:
     # Simulate the apply button press
     app.settings_apply_button_callback(None, None, None)
 
-    # Play simulated logfile
-    sys.argv = [sys.argv[0], "-i", "virtual", str(DEMO_FILE)]
-    threading.Thread(target=can.player.main, daemon=True).start()
+    # Replay simulated logfile once started
+    app.app.set_replay(DEMO_FILE)
+
+
+def synthetic_config(n_ids: int) -> None:
+    # Use the virtual interface as default
+    layout.set_settings_interface_options(iterable=[""], default="virtual")
+
+    # Simulate the apply button press
+    app.settings_apply_button_callback(None, None, None)
+
+    # Transmit generated traffic
+    generator = TrafficGenerator.uniform(n_ids, shape=Shape.RAMP)
+    bus = can.Bus(interface="virtual")
+    threading.Thread(target=generator.send, args=(bus,), daemon=True).start()
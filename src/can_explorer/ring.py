@@ -0,0 +1,461 @@
+from __future__ import annotations
+
+import json
+import lzma
+import os
+import struct
+import time
+import zlib
+from collections import Counter
+from functools import partial
+from pathlib import Path
+from typing import (
+    IO,
+    Callable,
+    Dict,
+    Final,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+import numpy as np
+from can.message import Message
+
+from can_explorer.can_bus import CanKey
+from can_explorer.pipeline import Batch, Stage
+
+SUFFIX: Final = ".cxr"
+SEGMENTS: Final = 16
+
+_MAGIC: Final = b"CANXRNG1"
+_HEADER: Final = struct.Struct("<8s8s")  # magic, codec
+# Compressed size, frames, payload bytes, channel table bytes
+_BLOCK: Final = struct.Struct("<IIIH")
+_VERSION: Final = 1
+
+# Fixed size part of each frame, the payloads follow every record of a block
+_RECORD: Final = np.dtype(
+    [
+        ("timestamp", "<f8"),
+        ("arbitration_id", "<u4"),
+        ("flags", "u1"),
+        ("channel", "u1"),
+        ("dlc", "u1"),
+        ("length", "u1"),
+    ]
+)
+
+# Flags of a record, by bit
+_EXTENDED: Final = 1
+_REMOTE: Final = 2
+_ERROR: Final = 4
+_FD: Final = 8
+_BRS: Final = 16
+_ESI: Final = 32
+_RX: Final = 64
+
+Codec = Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]
+
+CODECS: Final[Dict[str, Codec]] = {
+    "zlib": (partial(zlib.compress, level=1), zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+
+try:
+    import zstandard
+
+    CODECS["zstd"] = (
+        zstandard.ZstdCompressor().compress,
+        zstandard.ZstdDecompressor().decompress,
+    )
+except ImportError:
+    pass
+
+try:
+    import lz4.frame
+
+    CODECS["lz4"] = (lz4.frame.compress, lz4.frame.decompress)
+except ImportError:
+    pass
+
+# Fastest codec installed
+DEFAULT_CODEC: Final = next(i for i in ("zstd", "lz4", "zlib") if i in CODECS)
+
+
+class BlockInfo(NamedTuple):
+    offset: int
+    start: float
+    stop: float
+    frames: int
+
+
+class SegmentIndex(NamedTuple):
+    codec: str
+    start: float
+    stop: float
+    frames: int
+    ids: Dict[CanKey, int]
+    blocks: List[BlockInfo]
+
+
+def index_path(path: Path) -> Path:
+    """
+    Get the path of the index of a segment.
+
+    Args:
+        path (Path)
+
+    Returns:
+        Path
+    """
+    return path.with_suffix(".json")
+
+
+def segments(directory: Path) -> List[Path]:
+    """
+    Get the segments of a recording, oldest first.
+
+    Args:
+        directory (Path)
+
+    Returns:
+        List[Path]
+    """
+    return sorted(directory.glob("*" + SUFFIX))
+
+
+class _Indexer:
+    # Accumulates the index of a segment block by block
+
+    def __init__(self, codec: str) -> None:
+        self.codec = codec
+        self.ids: Counter = Counter()
+        self.blocks: List[BlockInfo] = []
+
+    def add(self, offset: int, records: np.ndarray, channels: List[str]) -> None:
+        times = records["timestamp"]
+        self.blocks.append(
+            BlockInfo(offset, float(times.min()), float(times.max()), len(records))
+        )
+        # Note: counted with numpy by packing each key into a single integer
+        flags = records["flags"].astype(np.uint64) & (_EXTENDED | _FD)
+        keys = (
+            records["arbitration_id"].astype(np.uint64)
+            | flags << 32
+            | records["channel"].astype(np.uint64) << 40
+        )
+        unique, counts = np.unique(keys, return_counts=True)
+        counts = counts.tolist()
+        for i, key in enumerate(unique.tolist()):
+            flag = key >> 32 & 0xFF
+            can_id = CanKey(
+                key & 0xFFFFFFFF,
+                bool(flag & _EXTENDED),
+                bool(flag & _FD),
+                channels[key >> 40],
+            )
+            self.ids[can_id] += counts[i]
+
+    def index(self) -> SegmentIndex:
+        blocks = self.blocks
+        return SegmentIndex(
+            self.codec,
+            min((block.start for block in blocks), default=0.0),
+            max((block.stop for block in blocks), default=0.0),
+            sum(block.frames for block in blocks),
+            dict(self.ids),
+            list(blocks),
+        )
+
+
+def _read_block(
+    f: IO[bytes], decompress: Callable[[bytes], bytes]
+) -> Optional[Tuple[np.ndarray, bytes, List[str]]]:
+    # Returns None at the end of the segment, or a block cut short by a crash
+    header = f.read(_BLOCK.size)
+    if len(header) < _BLOCK.size:
+        return None
+    size, frames, length, channels_size = _BLOCK.unpack(header)
+    channels = f.read(channels_size).decode().split("\0")
+    block = f.read(size)
+    if len(block) < size:
+        return None
+    data = decompress(block)
+    split = frames * _RECORD.itemsize
+    records = np.frombuffer(data, _RECORD, frames)
+    return records, data[split : split + length], channels
+
+
+def _codec(f: IO[bytes], path: Path) -> Tuple[str, Callable[[bytes], bytes]]:
+    magic, name = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != _MAGIC:
+        raise ValueError(f"{path} is not a recording segment")
+    codec = name.rstrip(b"\0").decode()
+    if codec not in CODECS:
+        raise ValueError(f"{path} needs the {codec} codec, which is not installed")
+    return codec, CODECS[codec][1]
+
+
+def load_index(path: Path) -> SegmentIndex:
+    """
+    Read the index of a segment.
+
+    A segment still being written, or which was not closed, has no index yet
+    so one is built by decompressing every block.
+
+    Args:
+        path (Path)
+
+    Raises:
+        ValueError: If the file is not a segment
+
+    Returns:
+        SegmentIndex
+    """
+    try:
+        with open(index_path(path)) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        pass
+    else:
+        if data["version"] == _VERSION:
+            return SegmentIndex(
+                data["codec"],
+                data["start"],
+                data["stop"],
+                data["frames"],
+                {CanKey(*key): count for *key, count in data["ids"]},
+                [BlockInfo(*block) for block in data["blocks"]],
+            )
+
+    with open(path, "rb") as f:
+        codec, decompress = _codec(f, path)
+        indexer = _Indexer(codec)
+        while True:
+            offset = f.tell()
+            block = _read_block(f, decompress)
+            if block is None:
+                break
+            records, _, channels = block
+            indexer.add(offset, records, channels)
+    return indexer.index()
+
+
+def read(
+    directory: Path, start: Optional[float] = None, stop: Optional[float] = None
+) -> Iterator[Message]:
+    """
+    Read the frames of a recording in the order they were written, skipping
+    blocks outside a time window without decompressing them.
+
+    Args:
+        directory (Path)
+        start (float, optional): Inclusive timestamp
+        stop (float, optional): Inclusive timestamp
+
+    Yields:
+        Message
+    """
+    for path in segments(directory):
+        index = load_index(path)
+        if not index.frames:
+            continue
+        if start is not None and index.stop < start:
+            continue
+        if stop is not None and index.start > stop:
+            continue
+
+        with open(path, "rb") as f:
+            _, decompress = _codec(f, path)
+            for info in index.blocks:
+                if start is not None and info.stop < start:
+                    continue
+                if stop is not None and info.start > stop:
+                    continue
+                f.seek(info.offset)
+                block = _read_block(f, decompress)
+                if block is None:
+                    break
+                records, data, channels = block
+                offset = 0
+                for timestamp, can_id, flags, channel, dlc, length in records.tolist():
+                    payload = data[offset : offset + length]
+                    offset += length
+                    if start is not None and timestamp < start:
+                        continue
+                    if stop is not None and timestamp > stop:
+                        continue
+                    yield Message(
+                        timestamp=timestamp,
+                        arbitration_id=can_id,
+                        is_extended_id=bool(flags & _EXTENDED),
+                        is_remote_frame=bool(flags & _REMOTE),
+                        is_error_frame=bool(flags & _ERROR),
+                        is_fd=bool(flags & _FD),
+                        bitrate_switch=bool(flags & _BRS),
+                        error_state_indicator=bool(flags & _ESI),
+                        is_rx=bool(flags & _RX),
+                        channel=channels[channel] or None,
+                        dlc=dlc,
+                        data=payload,
+                    )
+
+
+class RingRecorder(Stage):
+    """
+    Record every frame received to a directory of compressed segment files,
+    keeping only the most recent segments.
+
+    Frames are gathered into blocks, each compressed and appended to the
+    current segment once it holds `block_frames` frames or its oldest frame
+    was buffered `flush_interval` seconds ago. Once a segment reaches
+    `segment_size` bytes its index of time range, ids and blocks is written
+    alongside it and the next segment begins, deleting the oldest segments
+    beyond `segments`.
+
+    Added as a (non inline) pipeline plugin, compression and writing run on a
+    worker thread rather than the ingest task, and batches are dropped rather
+    than delaying ingestion should the disk fall behind.
+
+    Args:
+        directory (Path)
+        segment_size (int): Bytes per segment
+        segments (int): Maximum number of segments kept
+        block_frames (int): Frames per block
+        flush_interval (float): Seconds frames are buffered before a block is
+            written, checked as each batch arrives
+        codec (str): Compression codec, see CODECS
+        clock (Callable[[], float]): Monotonic seconds
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        segment_size: int = 64 * 1024**2,
+        segments: int = SEGMENTS,
+        block_frames: int = 4096,
+        flush_interval: float = 1.0,
+        codec: str = DEFAULT_CODEC,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if codec not in CODECS:
+            raise ValueError(f"Codec {codec} is not installed")
+        self.directory = Path(directory)
+        self.segment_size = segment_size
+        self.segments = segments
+        self.block_frames = block_frames
+        self.flush_interval = flush_interval
+        self.codec = codec
+        self.clock = clock
+        self._compress = CODECS[codec][0]
+        self._file: Optional[IO[bytes]] = None
+        self._path: Optional[Path] = None
+        self._indexer = _Indexer(codec)
+        self._records: List[tuple] = []
+        self._payloads: List[bytearray] = []
+        self._channels: Dict[str, int] = {}
+        self._buffered: Optional[float] = None
+
+    def process(self, batch: Batch) -> Batch:
+        channel = self._channels.setdefault(batch.channel, len(self._channels))
+        records = self._records
+        payloads = self._payloads
+        for msg in batch.messages:
+            data = msg.data
+            records.append(
+                (
+                    msg.timestamp,
+                    msg.arbitration_id,
+                    msg.is_extended_id
+                    | msg.is_remote_frame << 1
+                    | msg.is_error_frame << 2
+                    | msg.is_fd << 3
+                    | msg.bitrate_switch << 4
+                    | msg.error_state_indicator << 5
+                    | msg.is_rx << 6,
+                    channel,
+                    msg.dlc,
+                    len(data),
+                )
+            )
+            payloads.append(data)
+
+        now = self.clock()
+        if self._buffered is None:
+            self._buffered = now
+        if (
+            len(records) >= self.block_frames
+            or now - self._buffered >= self.flush_interval
+        ):
+            self.flush()
+        return batch
+
+    def flush(self) -> None:
+        """
+        Write the frames buffered as a block.
+        """
+        if not self._records:
+            return
+
+        records = np.array(self._records, dtype=_RECORD)
+        data = b"".join(self._payloads)
+        channels = list(self._channels)
+        table = "\0".join(channels).encode()
+        block = self._compress(records.tobytes() + data)
+        self._records = []
+        self._payloads = []
+        self._channels = {}
+        self._buffered = None
+
+        f = self._file or self._open()
+        offset = f.tell()
+        f.write(_BLOCK.pack(len(block), len(records), len(data), len(table)))
+        f.write(table)
+        f.write(block)
+        # Note: flushed so a crash loses at most the frames still buffered
+        f.flush()
+        self._indexer.add(offset, records, channels)
+        if f.tell() >= self.segment_size:
+            self._finish()
+
+    def close(self) -> None:
+        self.flush()
+        self._finish()
+
+    def _open(self) -> IO[bytes]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        existing = segments(self.directory)
+        number = int(existing[-1].stem) + 1 if existing else 0
+        self._path = self.directory / f"{number:08d}{SUFFIX}"
+        self._file = f = open(self._path, "wb")
+        f.write(_HEADER.pack(_MAGIC, self.codec.encode()))
+        self._indexer = _Indexer(self.codec)
+        for path in existing[: max(len(existing) + 1 - self.segments, 0)]:
+            path.unlink()
+            index_path(path).unlink(missing_ok=True)
+        return f
+
+    def _finish(self) -> None:
+        # Close the current segment and write its index
+        if self._file is None or self._path is None:
+            return
+        self._file.close()
+        self._file = None
+        index = self._indexer.index()
+        data = dict(
+            version=_VERSION,
+            codec=index.codec,
+            start=index.start,
+            stop=index.stop,
+            frames=index.frames,
+            ids=[[*key, count] for key, count in index.ids.items()],
+            blocks=[list(block) for block in index.blocks],
+        )
+        path = index_path(self._path)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
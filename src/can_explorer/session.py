@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import json
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, Final, List, NamedTuple
+
+from can_explorer.can_bus import CanKey, PayloadBuffer
+
+SESSION_FILE: Final = Path.home() / ".can_explorer" / "session.bin"
+
+_MAGIC: Final = b"CANXSES1"
+_HEADER: Final = struct.Struct("<8sI")  # magic, json length
+_VERSION: Final = 1
+
+
+class Session(NamedTuple):
+    buffers: Dict[CanKey, PayloadBuffer]
+    settings: Dict[str, Any]
+    saved: float
+
+
+def save(
+    path: Path, buffers: Dict[CanKey, PayloadBuffer], settings: Dict[str, Any]
+) -> None:
+    """
+    Write a snapshot of all payload buffers and view settings.
+
+    The file is a small json index followed by the raw payload rows of each
+    buffer, oldest first, so it can be read straight back into memory.
+
+    Args:
+        path (Path)
+        buffers (Dict[CanKey, PayloadBuffer])
+        settings (Dict[str, Any]): Json serializable view settings
+    """
+    entries = []
+    blocks: List[bytes] = []
+    offset = 0
+    for key, buffer in list(buffers.items()):
+        times, data = buffer.raw_timestamps(), buffer.raw()
+        # Note: pad so every timestamp block remains 8 byte aligned
+        padding = bytes(-len(data) % 8)
+        entries.append(
+            dict(
+                key=list(CanKey(*key) if isinstance(key, tuple) else CanKey(key)),
+                width=buffer.width,
+                rows=len(times) // 8,
+                held=buffer.held,
+                count=buffer.count,
+                offset=offset,
+            )
+        )
+        blocks.extend((times, data, padding))
+        offset += len(times) + len(data) + len(padding)
+
+    index = json.dumps(
+        dict(
+            version=_VERSION,
+            saved=time.time(),
+            settings=settings,
+            buffers=entries,
+        )
+    ).encode()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(index)))
+        f.write(index)
+        f.write(bytes(-(_HEADER.size + len(index)) % 8))
+        f.writelines(blocks)
+    os.replace(tmp, path)
+
+
+def is_session(path: Path) -> bool:
+    """
+    Check whether a file is a session.
+
+    Args:
+        path (Path)
+
+    Returns:
+        bool
+    """
+    with open(path, "rb") as f:
+        return f.read(len(_MAGIC)) == _MAGIC
+
+
+def load(path: Path) -> Session:
+    """
+    Read a snapshot back into memory.
+
+    Note: the payloads are read into a single block which buffers are views
+    of, and the file is closed so it may be replaced (ie when saving on exit)
+
+    Args:
+        path (Path)
+
+    Raises:
+        ValueError: If the file is not a compatible session
+
+    Returns:
+        Session
+    """
+    with open(path, "rb") as f:
+        magic, length = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a session file")
+        index = json.loads(f.read(length))
+        if index["version"] != _VERSION:
+            raise ValueError(f"{path} was saved by an incompatible version")
+
+        start = _HEADER.size + length
+        start += -start % 8
+        f.seek(start)
+        data = memoryview(bytearray(os.fstat(f.fileno()).st_size - start))
+        f.readinto(data)
+
+    buffers = {}
+    for entry in index["buffers"]:
+        key = CanKey(*entry["key"])
+        times = entry["offset"]
+        offset = times + 8 * entry["rows"]
+        size = entry["rows"] * entry["width"]
+        buffers[key] = PayloadBuffer.from_raw(
+            data[offset : offset + size],
+            data[times:offset].cast("d"),
+            entry["width"],
+            entry["count"],
+            entry["held"],
+        )
+
+    return Session(buffers, index["settings"], index["saved"])
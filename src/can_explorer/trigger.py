@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import can
+
+# Note: module import as can_bus imports this module
+from can_explorer import can_bus
+
+if TYPE_CHECKING:
+    from can_explorer.can_bus import CanKey, PayloadBuffer, Window
+
+Predicate = Callable[[bytes], bool]
+
+
+def _key(can_id: Union[int, tuple]) -> CanKey:
+    if isinstance(can_id, tuple):
+        # Note: the id is passed on its own so the required field is checked
+        return can_bus.CanKey(can_id[0], *can_id[1:])
+    return can_bus.CanKey(can_id)
+
+
+@dataclass(eq=False)
+class Condition:
+    """
+    Base condition evaluated against every payload of a single id.
+
+    Args:
+        can_id (int | CanKey): Plain ids match standard frames on the default channel
+    """
+
+    can_id: Union[int, CanKey]
+
+    def __post_init__(self) -> None:
+        self.can_id = _key(self.can_id)
+
+    def compile(self) -> Predicate:
+        """
+        Create a function which checks a payload against this condition.
+
+        Returns:
+            Predicate
+        """
+        return lambda data: True
+
+
+@dataclass(eq=False)
+class IdSeen(Condition):
+    """
+    Matches any payload of the id.
+    """
+
+
+@dataclass(eq=False)
+class ByteMatch(Condition):
+    """
+    Matches when a payload byte, masked, equals a value.
+    """
+
+    index: int = 0
+    value: int = 0
+    mask: int = 0xFF
+
+    def compile(self) -> Predicate:
+        index, value, mask = self.index, self.value & self.mask, self.mask
+        return lambda data: len(data) > index and data[index] & mask == value
+
+
+@dataclass(eq=False)
+class Threshold(Condition):
+    """
+    Matches when a big endian value within the payload crosses a threshold.
+    """
+
+    start: int = 0
+    length: int = 1
+    threshold: int = 0
+    rising: bool = True
+
+    def compile(self) -> Predicate:
+        start, stop = self.start, self.start + self.length
+        threshold, rising = self.threshold, self.rising
+        previous: List[Optional[int]] = [None]
+
+        def predicate(data: bytes) -> bool:
+            value = int.from_bytes(data[start:stop], "big")
+            last, previous[0] = previous[0], value
+            if last is None:
+                return False
+            if rising:
+                return last < threshold <= value
+            return last > threshold >= value
+
+        return predicate
+
+
+@dataclass(eq=False)
+class Trigger:
+    """
+    Condition along with the time window to capture around each match.
+
+    Args:
+        condition (Condition)
+        pre (float): Seconds captured before the match
+        post (float): Seconds captured after the match
+        single (bool): Remove once fired, otherwise re-arm after each capture
+    """
+
+    condition: Condition
+    pre: float = 1.0
+    post: float = 1.0
+    single: bool = False
+    _predicate: Predicate = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._predicate = self.condition.compile()
+
+
+class Snapshot(NamedTuple):
+    timestamp: float
+    trigger: Trigger
+    windows: Dict[CanKey, Window]
+
+    def messages(self) -> Iterator[can.Message]:
+        """
+        Iterate over all captured frames in timestamp order.
+
+        Yields:
+            can.Message
+        """
+        streams = [
+            ((timestamp, key, data) for timestamp, data in window.frames())
+            for key, window in self.windows.items()
+        ]
+        for timestamp, key, data in heapq.merge(*streams, key=lambda i: i[0]):
+            yield can.Message(
+                timestamp=timestamp,
+                arbitration_id=key.arbitration_id,
+                is_extended_id=key.is_extended_id,
+                is_fd=key.is_fd,
+                channel=key.channel or None,
+                data=data,
+            )
+
+    def save(self, path: Path) -> None:
+        """
+        Write all captured frames to any log format supported by python-can.
+
+        Args:
+            path (Path)
+        """
+        with can.Logger(path) as logger:
+            for msg in self.messages():
+                logger.on_message_received(msg)
+
+
+class TriggerEngine:
+    """
+    Evaluate trigger conditions per frame and freeze windows of all ids on a match.
+
+    Predicates are indexed by id so frames of ids without a trigger cost a
+    single dictionary lookup.
+    """
+
+    def __init__(self, max_snapshots: int = 10) -> None:
+        self.armed = False
+        self.snapshots: Deque[Snapshot] = deque(maxlen=max_snapshots)
+        self.callbacks: List[Callable[[Snapshot], None]] = []
+        self._triggers: List[Trigger] = []
+        self._predicates: Dict[CanKey, List[Trigger]] = {}
+        # (deadline, sequence, match timestamp, trigger)
+        self._pending: List[Tuple[float, int, float, Trigger]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def _index(self) -> None:
+        pending = {trigger for *_, trigger in self._pending}
+        predicates: Dict[CanKey, List[Trigger]] = {}
+        for trigger in self._triggers:
+            if trigger not in pending:
+                predicates.setdefault(trigger.condition.can_id, []).append(trigger)  # type: ignore [arg-type]
+        self._predicates = predicates
+        self.armed = bool(predicates or self._pending)
+
+    def add(self, trigger: Trigger) -> None:
+        with self._lock:
+            self._triggers.append(trigger)
+            self._index()
+
+    def remove(self, trigger: Trigger) -> None:
+        with self._lock:
+            self._triggers.remove(trigger)
+            self._index()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._triggers.clear()
+            self._pending.clear()
+            self._index()
+
+    def check(
+        self, key: tuple, msg: can.Message, buffers: Dict[CanKey, PayloadBuffer]
+    ) -> None:
+        """
+        Evaluate a received frame.
+
+        Args:
+            key (tuple): Key the frame was stored under
+            msg (can.Message)
+            buffers (Dict[CanKey, PayloadBuffer]): All buffers to capture from
+        """
+        if self._pending and msg.timestamp >= self._pending[0][0]:
+            self._freeze(buffers, msg.timestamp)
+
+        triggers = self._predicates.get(key)  # type: ignore [call-overload]
+        if triggers:
+            data = msg.data
+            for trigger in triggers:
+                if trigger._predicate(data):
+                    self._fire(trigger, msg.timestamp)
+
+    def flush(self, buffers: Dict[CanKey, PayloadBuffer]) -> None:
+        """
+        Freeze all pending captures without waiting for their post windows.
+
+        Args:
+            buffers (Dict[CanKey, PayloadBuffer])
+        """
+        self._freeze(buffers, float("inf"))
+
+    def _fire(self, trigger: Trigger, timestamp: float) -> None:
+        with self._lock:
+            if trigger not in self._triggers:
+                return
+            if trigger.single:
+                self._triggers.remove(trigger)
+            deadline = timestamp + trigger.post
+            heapq.heappush(
+                self._pending, (deadline, next(self._sequence), timestamp, trigger)
+            )
+            self._index()
+
+    def _freeze(self, buffers: Dict[CanKey, PayloadBuffer], now: float) -> None:
+        with self._lock:
+            due = []
+            while self._pending and self._pending[0][0] <= now:
+                due.append(heapq.heappop(self._pending))
+            self._index()
+
+        for *_, timestamp, trigger in due:
+            windows = {}
+            for key, buffer in list(buffers.items()):
+                window = buffer.window(
+                    timestamp - trigger.pre, timestamp + trigger.post
+                )
+                if window.timestamps:
+                    windows[_key(key)] = window
+            snapshot = Snapshot(timestamp, trigger, windows)
+            self.snapshots.append(snapshot)
+            for callback in self.callbacks:
+                callback(snapshot)
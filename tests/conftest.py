@@ -1,6 +1,6 @@
 from unittest.mock import Mock, patch
 
-import can_explorer
+import can_explorer.app
 import pytest
 
 
@@ -18,7 +18,7 @@ def mock_listener():
 
 @pytest.fixture
 def mock_notifier():
-    with patch("can_explorer.can_bus.Notifier", autospec=True) as mock:
+    with patch("can_explorer.pipeline.Notifier", autospec=True) as mock:
         yield mock
 
 
@@ -56,4 +56,6 @@ def fake_app(fake_manager, fake_recorder):
 def app():
     can_explorer.app.setup()
     yield can_explorer.app.app
+    if can_explorer.app.app.is_active():
+        can_explorer.app.app.stop()
     can_explorer.app.teardown()
@@ -0,0 +1,179 @@
+import math
+import random
+import threading
+from concurrent.futures import Future
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from can_explorer import analysis, app
+from can_explorer.can_bus import CanKey, PayloadBuffer
+
+
+@pytest.fixture
+def buffers():
+    rng = random.Random(0)
+    buffers = {CanKey(i): PayloadBuffer() for i in range(50)}
+    for n in range(1000):
+        timestamp = n / 100
+        for can_id, buffer in buffers.items():
+            payload = bytearray(rng.getrandbits(64).to_bytes(8, "big"))
+            if can_id == CanKey(42):
+                # Brake pressed between 4 and 6 seconds
+                payload[3] = 200 if 4 <= timestamp <= 6 else 10
+            buffer.append(payload, timestamp)
+    yield buffers
+
+
+def test_payload_array_excludes_unused_rows():
+    buffer = PayloadBuffer()
+    buffer.append(b"\x01\x02", 1.0)
+    buffer.append(b"\x03\x04", 2.0)
+    times, data = analysis.payload_array(buffer)
+
+    assert times.tolist() == [1.0, 2.0]
+    assert data.tolist() == [[1, 2], [3, 4]]
+
+
+def test_correlate_ranks_marked_byte_first(buffers):
+    scores = analysis.correlate(buffers, 4, 6)
+
+    assert (scores[0].can_id, scores[0].byte) == (CanKey(42), 3)
+    assert scores[0].correlation == pytest.approx(1.0)
+    assert scores[0].step == pytest.approx(190)
+    assert abs(scores[1].correlation) < 0.5
+    assert len(scores) == 50 * 8
+
+
+def test_app_correlates_marked_interval_in_background(fake_app, fake_recorder, buffers):
+    fake_recorder.update(buffers)
+
+    fake_app.start_mark(4)
+    assert fake_app.is_marking()
+    future = fake_app.stop_mark(6)
+
+    assert not fake_app.is_marking()
+    assert future.result(timeout=5)[0].can_id == CanKey(42)
+
+
+def test_app_delivers_correlation_on_main_thread(fake_app, fake_recorder, buffers):
+    fake_recorder.update(buffers)
+    threads = []
+
+    fake_app.start_mark(4)
+    future = fake_app.stop_mark(
+        6, callback=lambda future: threads.append(threading.get_ident())
+    )
+    future.result(timeout=5)
+    assert threads == []
+
+    fake_app._deliver_results()
+    fake_app._deliver_results()
+    assert threads == [threading.get_ident()]
+
+
+def test_correlation_errors_are_shown():
+    future: Future = Future()
+    future.set_exception(ValueError("bad"))
+    with patch("can_explorer.layout.popup_error") as popup_error:
+        app.show_correlation(future)
+
+    popup_error.assert_called_once()
+
+
+def test_recorder_snapshot_copies_payloads_held(fake_recorder, buffers):
+    fake_recorder.update(buffers)
+    copies = fake_recorder.snapshot().result(timeout=5)
+    buffers[CanKey(42)].append(bytes(8), 10.0)
+
+    assert copies[CanKey(42)].held == 1000
+    assert analysis.payload_array(copies[CanKey(42)])[0][-1] == 9.99
+
+
+def test_removed_ids_release_their_slot():
+    buffer = PayloadBuffer()
+    _frames(buffer, 0, 100)
+    classifier = analysis.Classifier(5)
+    classifier.update({CanKey(1): buffer, CanKey(2): buffer})
+    classifier.remove(CanKey(1))
+    classifier.update({CanKey(3): buffer})
+
+    assert set(classifier._slot) == {CanKey(2), CanKey(3)}
+    assert sorted(classifier._slot.values()) == [0, 1]
+    assert classifier.classify([CanKey(3)])[0, 0] == analysis.ByteClass.COUNTER
+
+
+def test_app_marks_on_the_clock_of_frames(fake_app, fake_recorder, buffers):
+    fake_recorder.update(buffers)
+
+    assert fake_app.now() == 9.99
+
+
+def test_sample_values_fills_positions_not_held():
+    buffer = PayloadBuffer()
+    for n in range(1, 11):
+        buffer.append(bytes([0, n]), float(n))
+    values = analysis.sample_values([buffer, PayloadBuffer()], 20, 20)
+
+    assert values[0].tolist() == [0.0] * 10 + list(range(1, 11))
+    assert not values[1].any()
+
+
+def _frames(buffer, start, stop):
+    rng = random.Random(start)
+    for n in range(start, stop):
+        signal = 100 + round(50 * math.sin(n / 20))
+        counter = (n % 16) | 0xA0
+        checksum = rng.getrandbits(8)
+        buffer.append(bytes([n % 256, counter, checksum, 7, signal]), float(n))
+
+
+def test_classifier_finds_counters_checksums_and_signals():
+    buffer = PayloadBuffer()
+    classifier = analysis.Classifier(5)
+    _frames(buffer, 0, 100)
+    assert classifier.update({CanKey(1): buffer}) == 1
+    _frames(buffer, 100, 300)
+    assert classifier.update({CanKey(1): buffer}) == 1
+    assert classifier.update({CanKey(1): buffer}) == 0
+
+    byte_class = analysis.ByteClass
+    classes = classifier.classify([CanKey(1)])
+    assert classes[0].tolist() == [
+        *(byte_class.COUNTER, byte_class.COUNTER),
+        *(byte_class.CONSTANT, byte_class.COUNTER),
+        *(byte_class.CHECKSUM, byte_class.CHECKSUM),
+        *(byte_class.CONSTANT, byte_class.CONSTANT),
+        *(byte_class.SIGNAL, byte_class.SIGNAL),
+    ]
+    assert analysis.noise_mask(classes)[0].tolist() == [0, 0xF0, 0, 0xFF, 0xFF]
+
+    # Updating incrementally accumulates the same as all at once
+    whole = analysis.Classifier(5)
+    whole.update({CanKey(1): buffer})
+    assert (whole._totals[0] == classifier._totals[0]).all()
+
+
+def test_masked_values_plots_only_masked_bits():
+    buffer = PayloadBuffer()
+    buffer.append(b"\x12\x34", 1.0)
+    values = analysis.masked_values(buffer, np.array([0x0F, 0xFF], dtype=np.uint8))
+
+    assert values[-1] == 0x0234
+    assert not values[:-1].any()
+
+
+def test_app_hides_ids_without_signal(fake_app, fake_manager, fake_recorder):
+    fake_recorder[CanKey(1)] = PayloadBuffer()
+    fake_recorder[CanKey(2)] = PayloadBuffer()
+    _frames(fake_recorder[CanKey(1)], 0, 100)
+    for n in range(100):
+        fake_recorder[CanKey(2)].append(bytes([n % 256, 7]), float(n))
+
+    fake_app.set_hide_noise(True)
+    assert fake_manager.ids() == [CanKey(1)]
+    assert fake_manager.mask[CanKey(1)].tolist()[:3] == [0, 0xF0, 0]
+
+    fake_app.set_hide_noise(False)
+    assert fake_manager.ids() == [CanKey(1), CanKey(2)]
+    assert not fake_manager.mask
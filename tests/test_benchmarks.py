@@ -0,0 +1,10 @@
+import pytest
+from benchmarks.suite import SUITE
+
+
+@pytest.mark.parametrize("group", sorted(SUITE))
+def test_benchmark_suite_runs_headless(group):
+    results = list(SUITE[group](1, 1))
+
+    assert results
+    assert all(result.to_dict()["median"] > 0 for result in results)
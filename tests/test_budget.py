@@ -0,0 +1,55 @@
+from can_explorer.budget import MemoryBudget
+from can_explorer.can_bus import CanKey, PayloadBuffer, Recorder
+from can_explorer.generator import Signal, TrafficGenerator
+from can_explorer.pipeline import Batch
+
+
+def _recorder(signals, duration=1.0):
+    recorder = Recorder()
+    TrafficGenerator(signals).feed(recorder.listener(), duration)
+    return recorder
+
+
+def test_budget_shares_capacity_by_rate():
+    recorder = _recorder([Signal(1, 1000), Signal(2, 10)], duration=3)
+    budget = MemoryBudget(recorder, limit=1500 * 16)
+    budget.rebalance()
+
+    assert recorder[CanKey(1)].capacity > 10 * recorder[CanKey(2)].capacity / 2
+    assert recorder[CanKey(2)].capacity == PayloadBuffer.MIN
+    assert budget.usage() <= budget.limit
+
+
+def test_budget_favours_visible_ids():
+    recorder = _recorder([Signal(1, 100), Signal(2, 100)], duration=10)
+    budget = MemoryBudget(recorder, limit=1000 * 16)
+    budget.visible = frozenset([CanKey(2)])
+    budget.rebalance()
+
+    assert recorder[CanKey(2)].capacity > recorder[CanKey(1)].capacity
+
+
+def test_budget_evicts_least_recent_ids():
+    recorder = _recorder([Signal(i, 10) for i in range(10)])
+    # Id 0 is received again after all others
+    latest = next(TrafficGenerator([Signal(0, 10)]).messages(start=5))
+    recorder.listener().on_message_received(latest)
+    budget = MemoryBudget(recorder, limit=5 * PayloadBuffer.MIN * 16)
+    budget.rebalance()
+
+    assert len(recorder) == 5
+    assert CanKey(0) in recorder
+    assert len(budget.evicted) == 5
+    assert budget.usage() <= budget.limit
+
+
+def test_eviction_releases_state_of_stages():
+    signals = [Signal(i, 10) for i in range(10)]
+    recorder = _recorder(signals)
+    messages = list(TrafficGenerator(signals).messages(1))
+    recorder.health.process(Batch("", messages))
+    recorder.budget.limit = 5 * PayloadBuffer.MIN * 16
+    recorder.budget.rebalance()
+
+    assert len(recorder) == 5
+    assert set(recorder.health._intervals) == set(recorder)
@@ -0,0 +1,145 @@
+from time import sleep
+
+import can
+import pytest
+from can_explorer.can_bus import CanKey, PayloadBuffer, Recorder, _Listener
+
+
+def test_buffer_returns_payload_values_oldest_first():
+    buffer = PayloadBuffer()
+    for i in range(PayloadBuffer.MAX + 10):
+        buffer.append(i.to_bytes(8, "big"))
+
+    assert buffer[-1] == PayloadBuffer.MAX + 9
+    assert buffer[0] == 10
+    assert buffer[len(buffer) - 3 :] == tuple(range(PayloadBuffer.MAX + 7, 2510))
+
+
+def test_buffer_grows_lazily():
+    buffer = PayloadBuffer()
+    assert buffer.nbytes == 0
+
+    for i in range(PayloadBuffer.MIN + 1):
+        buffer.append(i.to_bytes(8, "big"))
+
+    assert buffer.rows == 2 * PayloadBuffer.MIN
+    assert buffer[-1] == PayloadBuffer.MIN
+    assert buffer[len(buffer) - 2 * PayloadBuffer.MIN] == 0
+
+
+def test_buffer_resize_keeps_newest_payloads():
+    buffer = PayloadBuffer()
+    for i in range(300):
+        buffer.append(i.to_bytes(8, "big"), timestamp=i / 100)
+
+    buffer.resize(PayloadBuffer.MIN)
+    buffer.append((300).to_bytes(8, "big"), timestamp=3.0)
+
+    assert buffer.rows == PayloadBuffer.MIN
+    assert buffer.held == PayloadBuffer.MIN
+    assert buffer[len(buffer) - PayloadBuffer.MIN :] == tuple(range(251, 301))
+    assert buffer.rate() == pytest.approx(100)
+
+
+def test_buffer_regrown_after_resize_holds_only_new_payloads():
+    buffer = PayloadBuffer()
+    for i in range(300):
+        buffer.append(i.to_bytes(8, "big"), timestamp=i / 100)
+
+    buffer.resize(PayloadBuffer.MIN)
+    buffer.resize(PayloadBuffer.MAX)
+    for i in range(300, 351):
+        buffer.append(i.to_bytes(8, "big"), timestamp=i / 100)
+
+    assert buffer.rows == 2 * PayloadBuffer.MIN
+    assert buffer.held == 51
+    assert buffer.timestamps()[-51:] == [i / 100 for i in range(300, 351)]
+    assert buffer.rate() == pytest.approx(100)
+
+
+def test_buffer_window_near_zero_skips_rows_not_held():
+    buffer = PayloadBuffer()
+    for i in range(4):
+        buffer.append(bytes([i + 1]), timestamp=i / 100)
+    window = buffer.window(-1.0, 0.02)
+
+    assert buffer.rows == PayloadBuffer.MIN
+    assert window.timestamps == (0.0, 0.01, 0.02)
+    assert window.payloads == b"\x01\x02\x03"
+
+
+def test_buffer_keeps_byte_positions_when_widened():
+    buffer = PayloadBuffer()
+    buffer.append(bytes(range(1, 9)))
+    buffer.append(bytes(range(11, 23)))
+    buffer.append(b"\x04")
+
+    assert buffer.width == 12
+    assert buffer[-3:] == (0x0102030405060708, 0x0B0C0D0E0F101112, 0x04 << 56)
+    assert buffer.raw(3) == (
+        bytes(range(1, 9)) + bytes(4) + bytes(range(11, 23)) + b"\x04" + bytes(11)
+    )
+
+
+@pytest.mark.parametrize("length", [3, 8, 12, 64])
+def test_buffer_values_use_leading_bytes(length):
+    buffer = PayloadBuffer()
+    payload = bytes(range(1, length + 1))
+    buffer.append(payload)
+
+    size = min(length, PayloadBuffer.VALUE_SIZE)
+    assert buffer[-1] == int.from_bytes(payload[:size], "big")
+    assert buffer.raw()[-length:] == payload
+
+
+def test_recorder_separates_extended_and_fd_ids():
+    recorder = Recorder()
+    listener = _Listener(recorder)
+    listener.on_message_received(
+        can.Message(arbitration_id=0x100, is_extended_id=False, data=[1])
+    )
+    listener.on_message_received(
+        can.Message(arbitration_id=0x100, is_extended_id=True, data=[2])
+    )
+    listener.on_message_received(
+        can.Message(
+            arbitration_id=0x100, is_extended_id=False, is_fd=True, data=bytes(64)
+        )
+    )
+
+    assert sorted(recorder) == [
+        CanKey(0x100),
+        CanKey(0x100, is_fd=True),
+        CanKey(0x100, is_extended_id=True),
+    ]
+    assert all(type(key) is CanKey for key in recorder)
+    assert hex(CanKey(0x100, is_extended_id=True)) == "0x100"
+
+
+def test_recorder_accepts_plain_ids():
+    recorder = Recorder()
+    recorder[0x100].append(b"\x01")
+    recorder[0x100].append(b"\x02")
+
+    assert list(recorder) == [CanKey(0x100)]
+    assert recorder[CanKey(0x100)].count == 2
+
+
+def test_recorder_captures_multiple_buses():
+    channels = ("can0", "can1")
+    buses = {
+        channel: can.Bus(interface="virtual", channel=channel) for channel in channels
+    }
+    recorder = Recorder()
+    recorder.set_buses(buses)
+    recorder.start()
+
+    for channel in channels:
+        with can.Bus(interface="virtual", channel=channel) as sender:
+            sender.send(can.Message(arbitration_id=1, is_extended_id=False, data=[1]))
+    sleep(0.2)
+    recorder.stop()
+
+    assert sorted(recorder) == [CanKey(1, channel="can0"), CanKey(1, channel="can1")]
+    for bus in buses.values():
+        bus.shutdown()
@@ -0,0 +1,73 @@
+import can
+import pytest
+from can_explorer import diff, session
+from can_explorer.can_bus import Recorder
+from can_explorer.generator import TrafficGenerator
+
+MESSAGES = list(TrafficGenerator.uniform(10, rate=100).messages(2))
+IDS = sorted({msg.arbitration_id for msg in MESSAGES})
+
+
+def write(path, messages):
+    writer = can.CanutilsLogWriter(path)
+    for msg in messages:
+        writer.on_message_received(msg)
+    writer.stop()
+
+
+@pytest.fixture
+def captures(tmp_path):
+    # The second capture lost an id, fixed a byte and halved a rate
+    second = []
+    halved = 0
+    for msg in MESSAGES:
+        if msg.arbitration_id == IDS[0]:
+            continue
+        if msg.arbitration_id == IDS[1]:
+            msg = can.Message(
+                timestamp=msg.timestamp,
+                arbitration_id=msg.arbitration_id,
+                is_extended_id=msg.is_extended_id,
+                data=b"\xff" + bytes(msg.data[1:]),
+            )
+        if msg.arbitration_id == IDS[2]:
+            halved += 1
+            if halved % 2:
+                continue
+        second.append(msg)
+
+    write(tmp_path / "first.log", MESSAGES)
+    write(tmp_path / "second.log", second)
+    yield diff.load(tmp_path / "first.log"), diff.load(tmp_path / "second.log")
+
+
+def test_compare_ranks_changed_ids_and_bytes(captures):
+    result = diff.compare(*captures)
+
+    assert result.added == []
+    assert [key.arbitration_id for key in result.removed] == [IDS[0]]
+    ranked = [change.can_id.arbitration_id for change in result.id_changes]
+    assert ranked[:2] == [IDS[1], IDS[2]]
+    assert result.id_changes[1].second_rate == pytest.approx(
+        result.id_changes[1].first_rate / 2, rel=0.1
+    )
+    top = result.byte_changes[0]
+    assert (top.can_id.arbitration_id, top.byte, top.added) == (IDS[1], 0, 1)
+    assert top.distance > 0.9
+
+    report = diff.report(result)
+    assert f"Removed ids: {hex(IDS[0])}" in report
+
+
+def test_session_compares_equal_to_itself(tmp_path):
+    recorder = Recorder()
+    listener = recorder.listener()
+    for msg in MESSAGES:
+        listener.on_message_received(msg)
+    path = tmp_path / "session.bin"
+    session.save(path, recorder, {})
+
+    assert session.is_session(path)
+    result = diff.compare(diff.load(path), diff.from_buffers(recorder))
+    assert not (result.added or result.removed or result.byte_changes)
+    assert all(change.score == 0 for change in result.id_changes)
@@ -0,0 +1,47 @@
+import pytest
+from can_explorer.can_bus import Recorder, _Listener
+from can_explorer.generator import Shape, Signal, TrafficGenerator
+
+
+def test_generator_yields_frames_in_timestamp_order():
+    generator = TrafficGenerator([Signal(1, 100), Signal(2, 30), Signal(3, 7)])
+    timestamps = [msg.timestamp for msg in generator.messages(1)]
+
+    assert timestamps == sorted(timestamps)
+    assert len(timestamps) == 100 + 30 + 7
+
+
+def test_generator_is_deterministic():
+    signals = [Signal(i, 50, shape=Shape.NOISE) for i in range(5)]
+    first = [msg.data for msg in TrafficGenerator(signals).messages(1)]
+    second = [msg.data for msg in TrafficGenerator(signals).messages(1)]
+
+    assert first == second
+
+
+def test_generator_saturates_bus():
+    generator = TrafficGenerator.uniform(10).saturate(1_000_000)
+
+    assert generator.load(1_000_000) == pytest.approx(1.0)
+
+
+def test_generator_creates_fd_frames():
+    generator = TrafficGenerator.uniform(3, length=64, is_fd=True)
+    msg = next(generator.messages())
+
+    assert msg.is_fd
+    assert len(msg.data) == 64
+
+
+@pytest.mark.parametrize("length, is_fd", [(9, False), (63, True)])
+def test_signal_rejects_invalid_length(length, is_fd):
+    with pytest.raises(ValueError):
+        Signal(1, 10, length, is_fd=is_fd)
+
+
+def test_generator_feeds_recorder():
+    recorder = Recorder()
+    count = TrafficGenerator.uniform(20).feed(_Listener(recorder), 0.5)
+
+    assert count == 20 * 50
+    assert len(recorder) == 20
@@ -0,0 +1,48 @@
+import pytest
+from benchmarks.headless import Harness
+from can_explorer.generator import TrafficGenerator
+from can_explorer.plotting import PlotManager
+
+
+@pytest.mark.parametrize("n_ids", [10, 100])
+def test_plot_updates_stay_within_budget(n_ids):
+    messages = TrafficGenerator.uniform(n_ids, rate=100).messages(2)
+    with Harness(messages) as harness:
+        first = harness.frame()
+        frames = harness.run(60)
+
+    assert first.calls["add_table"] == n_ids
+    # Each plot updates its two axis limits and series once per frame, passing
+    # no more than 2 * POINTS points of x and y
+    for stats in frames:
+        assert stats.operations <= 3 * n_ids
+        assert stats.nbytes <= n_ids * 2 * 8 * 2 * PlotManager.POINTS
+
+
+def test_new_ids_are_added_without_recreating_plots():
+    # Half of the ids only begin sending after a second
+    messages = [
+        msg
+        for msg in TrafficGenerator.uniform(40, rate=50).messages(2)
+        if msg.timestamp >= 1 or msg.arbitration_id % 2
+    ]
+    with Harness(messages) as harness:
+        frames = harness.run(120)
+
+    added = [stats.calls["add_table"] for stats in frames]
+    assert sum(added) == 40
+    assert added[0] < 40 and added[60] == 40 - added[0]
+    assert harness.stub.calls["delete_item"] == 0
+
+
+def test_limit_changes_add_no_operations_while_receiving():
+    messages = TrafficGenerator.uniform(200, rate=10).messages(2)
+    with Harness(messages) as harness:
+        harness.run(5)
+        for limit in (1000, 2000, PlotManager.POINTS * 4):
+            harness.app.set_limit(limit)
+        frames = harness.run(20)
+
+    # Rows left stale are updated by the main loop before they are refreshed
+    assert all(stats.operations == 3 * 200 for stats in frames)
+    assert not harness.app._refreshing
@@ -0,0 +1,98 @@
+from collections import Counter
+from unittest.mock import patch
+
+import can
+import pytest
+from can_explorer import indexer
+from can_explorer.generator import TrafficGenerator
+
+MESSAGES = list(TrafficGenerator.uniform(10, rate=100).messages(2))
+IDS = sorted({msg.arbitration_id for msg in MESSAGES})
+
+
+def write(path, messages, append=False):
+    if path.suffix == ".log":
+        writer = can.CanutilsLogWriter(path, append=append)
+    else:
+        writer = can.Logger(path)
+    for msg in messages:
+        writer.on_message_received(msg)
+    writer.stop()
+
+
+@pytest.mark.parametrize("suffix", [".log", ".asc", ".blf"])
+def test_index_reads_only_selected_frames(tmp_path, suffix):
+    path = tmp_path / f"capture{suffix}"
+    write(path, MESSAGES)
+    index = indexer.build(path, block_size=4096, chunk_size=16384)
+
+    assert index.counts() == Counter(msg.arbitration_id for msg in MESSAGES)
+    wanted = IDS[3], IDS[7]
+    ids = [msg.arbitration_id for msg in index.read(ids=wanted)]
+    assert ids == [
+        msg.arbitration_id for msg in MESSAGES if msg.arbitration_id in wanted
+    ]
+
+
+def test_index_selects_blocks_by_time(tmp_path):
+    path = tmp_path / "capture.log"
+    write(path, MESSAGES)
+    index = indexer.build(path, block_size=4096)
+    start = MESSAGES[0].timestamp + 0.5
+    stop = start + 0.5
+
+    assert len(index.select(start, stop)) < len(index.blocks)
+    assert [msg.timestamp for msg in index.read(start, stop)] == pytest.approx(
+        [msg.timestamp for msg in MESSAGES if start <= msg.timestamp <= stop]
+    )
+
+
+def test_index_is_reused_and_extended_when_appended(tmp_path):
+    path = tmp_path / "capture.log"
+    write(path, MESSAGES[:1000])
+    first = indexer.build(path, block_size=4096)
+
+    assert indexer.index_path(path).exists()
+    assert indexer.build(path).blocks == first.blocks
+
+    write(path, MESSAGES[1000:], append=True)
+    index = indexer.build(path, block_size=4096)
+
+    assert index.blocks[: len(first.blocks)] == first.blocks
+    assert sum(index.counts().values()) == len(MESSAGES)
+
+
+def test_index_includes_unterminated_last_line(tmp_path):
+    path = tmp_path / "capture.log"
+    path.write_text("(1.000000) can0 100#01\n(2.000000) can0 200#02")
+    index = indexer.build(path)
+
+    assert [msg.arbitration_id for msg in index.read()] == [0x100, 0x200]
+    assert index.size == path.stat().st_size
+    with patch("can_explorer.indexer._scan", side_effect=AssertionError):
+        assert indexer.build(path).blocks == index.blocks
+
+    with open(path, "a") as f:
+        f.write("03\n(3.000000) can0 300#04\n")
+    index = indexer.build(path)
+
+    assert [bytes(msg.data) for msg in index.read()] == [b"\x01", b"\x02\x03", b"\x04"]
+
+
+def test_index_of_log_without_frames_is_reused(tmp_path):
+    path = tmp_path / "capture.asc"
+    path.write_text("date Mon Jan 1 00:00:00 2024\nbase hex timestamps absolute")
+    index = indexer.build(path)
+
+    assert not index.counts()
+    with patch("can_explorer.indexer._scan", side_effect=AssertionError):
+        indexer.build(path)
+
+
+def test_app_loads_selected_ids_of_log(fake_app, mock_listener, tmp_path):
+    path = tmp_path / "capture.log"
+    write(path, MESSAGES)
+
+    assert fake_app.load_log(path, ids=IDS[:2]) == 2 * len(MESSAGES) // 10
+    received = mock_listener.return_value.on_message_received.call_args_list
+    assert {call.args[0].arbitration_id for call in received} == set(IDS[:2])
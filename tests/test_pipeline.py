@@ -0,0 +1,145 @@
+import asyncio
+import threading
+import time
+
+import can
+from can_explorer.can_bus import CanKey, Recorder
+from can_explorer.generator import TrafficGenerator
+from can_explorer.pipeline import (
+    Batch,
+    Filter,
+    Health,
+    Pipeline,
+    Stage,
+    Stats,
+    Store,
+)
+
+MESSAGES = list(TrafficGenerator.uniform(5).messages(0.1))
+
+
+class Collect(Stage):
+    def __init__(self):
+        self.messages = []
+
+    def process(self, batch):
+        self.messages.extend(batch.messages)
+        return batch
+
+
+def test_inline_stages_run_in_order():
+    stats = Stats()
+    pipeline = Pipeline([Filter(lambda msg: msg.arbitration_id % 2 == 0), stats])
+    pipeline.process(Batch("", MESSAGES))
+
+    assert sum(stats.frames.values()) == sum(
+        msg.arbitration_id % 2 == 0 for msg in MESSAGES
+    )
+    assert all(key[0] % 2 == 0 for key in stats.frames)
+
+
+def test_stats_rate():
+    stats = Stats()
+    stats.process(Batch("", list(TrafficGenerator.uniform(1, rate=50).messages(1))))
+
+    assert stats.rate(next(iter(stats.frames))) == 50
+
+
+def test_error_and_remote_frames_are_counted_but_not_stored():
+    recorder = Recorder()
+    health = Health()
+    messages = [
+        can.Message(arbitration_id=1, data=[1], timestamp=0.0),
+        can.Message(is_error_frame=True, timestamp=0.1),
+        can.Message(arbitration_id=2, is_remote_frame=True, timestamp=0.2),
+    ]
+    batch = health.process(Batch("can0", messages))
+    Store(recorder).process(batch)
+
+    assert batch.messages == messages
+    assert health.error_frames == {"can0": 1}
+    assert health.remote_frames == {"can0": 1}
+    assert list(recorder) == [CanKey(1, True, channel="can0")]
+
+
+def test_health_counts_gaps_and_latency():
+    messages = list(TrafficGenerator.uniform(1, rate=100).messages(1))
+    # Drop 10 consecutive frames, then a single frame
+    messages = messages[:50] + messages[60:80] + messages[81:]
+    health = Health(clock=lambda: messages[0].timestamp + 0.5)
+    health.process(Batch("", messages))
+    stats = health.snapshot()
+
+    assert stats.gaps == 1
+    assert stats.latency == stats.latency_max == 0.5
+
+
+def test_receive_errors_reach_every_stage():
+    health = Health()
+    pipeline = Pipeline([health])
+    plugin = pipeline.add(Health())
+    pipeline.on_error("can0", can.CanOperationError("bus off"))
+
+    assert health.snapshot().receive_errors == 1
+    assert plugin.receive_errors == {"can0": 1}
+    assert str(plugin.last_error) == "bus off"
+
+
+def test_recorder_receives_through_pipeline():
+    recorder = Recorder()
+    collect = recorder.pipeline.add(Collect())
+    sender = can.Bus(interface="virtual", channel="pipeline")
+    bus = can.Bus(interface="virtual", channel="pipeline")
+    recorder.set_bus(bus)
+    recorder.start()
+    try:
+        for msg in MESSAGES:
+            sender.send(msg)
+        deadline = time.monotonic() + 5
+        while sum(buffer.count for buffer in recorder.values()) < len(MESSAGES):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        recorder.stop()
+        sender.shutdown()
+        bus.shutdown()
+
+    assert len(recorder) == 5
+    assert len(collect.messages) == len(MESSAGES)
+
+
+def test_slow_plugin_drops_batches():
+    release = threading.Event()
+
+    class Slow(Stage):
+        def process(self, batch):
+            release.wait()
+            return batch
+
+    async def main():
+        pipeline = Pipeline(queue_size=1)
+        slow = pipeline.add(Slow())
+        run = asyncio.ensure_future(pipeline.run({}))
+        await asyncio.sleep(0)
+        for msg in MESSAGES:
+            pipeline.process(Batch("", [msg]))
+        dropped = slow.dropped
+        release.set()
+        pipeline._stopping.set()
+        await run
+        return dropped
+
+    # Only a single batch fits in the queue
+    assert asyncio.run(main()) == len(MESSAGES) - 1
+
+
+def test_call_runs_on_ingest_thread():
+    pipeline = Pipeline()
+    pipeline.start({})
+    try:
+        thread = pipeline.call(threading.current_thread).result(timeout=5)
+    finally:
+        pipeline.stop()
+
+    assert thread.name == "pipeline"
+    assert pipeline.call(lambda: 1).result(timeout=5) == 1
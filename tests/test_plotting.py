@@ -0,0 +1,88 @@
+from unittest.mock import MagicMock
+
+from benchmarks.headless import headless
+from can_explorer import plotting
+from can_explorer.can_bus import CanKey, PayloadBuffer
+from can_explorer.plotting import Decimation, Heatmap, Overview, PlotManager
+
+
+def test_overview_draws_all_ids_with_a_single_texture_update():
+    buffers = {CanKey(i): PayloadBuffer() for i in range(100)}
+    for n in range(10):
+        for _, buffer in buffers.items():
+            buffer.append(bytes([n]), float(n))
+
+    with headless() as stub:
+        overview = Overview()
+        overview.set_ids(sorted(buffers))
+        overview.update(buffers)
+        overview.update(buffers)
+
+    assert stub.calls["add_dynamic_texture"] == 1
+    assert stub.calls["set_value"] == 2
+    # Newest payload of every row maps to the top of the colormap
+    assert (overview._pixels[:100, -1] == Overview.COLORMAP[-1]).all()
+
+
+def test_heatmap_writes_only_changed_cells():
+    buffers = {CanKey(i): PayloadBuffer() for i in range(10)}
+    for can_id, buffer in buffers.items():
+        buffer.append(bytes([can_id, 0, 0, 0, 0, 0, 0, 1]))
+
+    with headless() as stub:
+        heatmap = Heatmap()
+        heatmap.set_ids(sorted(buffers))
+        # Zero bytes keep their initial color
+        assert heatmap.update(buffers) == 19
+        assert heatmap.update(buffers) == 0
+
+        buffers[CanKey(3)].append(bytes([3, 0, 0, 0, 0, 0, 0, 2]))
+        assert heatmap.update(buffers) == 1
+
+    assert stub.calls["set_value"] == 2
+    assert (heatmap._pixels[3, 7] == Heatmap.COLORMAP[2]).all()
+
+
+def test_decimation_keeps_min_and_max_of_buckets():
+    buffer = PayloadBuffer()
+    for n in range(PayloadBuffer.MAX):
+        buffer.append((n % 100).to_bytes(2, "big"))
+    view = Decimation(buffer).view(PayloadBuffer.MAX, 500)
+
+    assert len(view["y"]) <= 1000
+    assert min(view["y"]) == 0 and max(view["y"]) == 99
+    assert view["x"][-1] == PayloadBuffer.MAX - 1
+
+
+def test_set_limit_is_debounced_and_applied_progressively(fake_manager):
+    for can_id in range(120):
+        fake_manager.add(can_id, PayloadBuffer())
+    plot = fake_manager.row[0].plot
+    plot.update.reset_mock()
+
+    for limit in (200, 1000, PayloadBuffer.MAX):
+        fake_manager.set_limit(limit)
+    assert fake_manager.refresh()
+    assert not plot.update.called
+
+    fake_manager._changed -= PlotManager.DEBOUNCE
+    while fake_manager.refresh():
+        pass
+    assert plot.update.call_count == 120
+
+
+def test_plot_manager_inserts_rows_in_order(fake_manager):
+    plotting.Row.side_effect = lambda *args, **kwargs: MagicMock()
+    for can_id in (5, 1, 3):
+        fake_manager.add(can_id, PayloadBuffer())
+    assert fake_manager.ids() == [1, 3, 5]
+    assert not PlotManager().row
+
+    # Row 5 is appended, then rows 1 and 3 are placed before it
+    before = [call.kwargs["before"] for call in plotting.Row.call_args_list]
+    assert before == [0, *[fake_manager.row[5].table.table_id] * 2]
+
+    fake_manager.delete(3)
+    assert fake_manager.ids() == [1, 5]
+    fake_manager.clear_all()
+    assert fake_manager.ids() == [] and not fake_manager.payload
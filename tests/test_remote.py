@@ -0,0 +1,136 @@
+import time
+from unittest.mock import Mock
+
+import can
+import pytest
+from can_explorer.can_bus import Recorder
+from can_explorer.generator import Shape, TrafficGenerator
+from can_explorer.remote import (
+    CaptureAgent,
+    Decoder,
+    Encoder,
+    RemoteBus,
+    _AgentListener,
+    parse_address,
+)
+
+
+def _fields(msg):
+    return (
+        msg.arbitration_id,
+        msg.is_extended_id,
+        msg.is_fd,
+        bytes(msg.data),
+        round(msg.timestamp, 6),
+    )
+
+
+def test_encoder_round_trip():
+    messages = [
+        *TrafficGenerator.uniform(5, shape=Shape.NOISE).messages(0.1, start=1e9),
+        *TrafficGenerator.uniform(3, length=64, is_fd=True).messages(0.1, start=1e9),
+        *TrafficGenerator.uniform(3, is_extended_id=True).messages(0.1, start=1e9),
+    ]
+    encoder, decoder = Encoder(), Decoder()
+    decoded = decoder.feed(encoder.encode(messages[:20]))
+    decoded += decoder.feed(encoder.encode(messages[20:]))
+
+    assert [_fields(msg) for msg in decoded] == [_fields(msg) for msg in messages]
+
+
+def test_decoder_waits_for_complete_batch():
+    messages = list(TrafficGenerator.uniform(3).messages(0.1))
+    data = Encoder().encode(messages)
+    decoder = Decoder()
+
+    assert decoder.feed(data[:-1]) == []
+    assert len(decoder.feed(data[-1:])) == len(messages)
+
+
+def test_encoder_overhead_smaller_than_frame():
+    messages = list(TrafficGenerator.uniform(50).messages(1, start=1e9))
+    data = Encoder().encode(messages)
+
+    assert len(data) / len(messages) < 8
+
+
+def test_agent_listener_drops_when_full():
+    listener = _AgentListener(queue_size=2)
+    listener.connected = True
+    for msg in TrafficGenerator.uniform(1).messages(0.05):
+        listener.on_message_received(msg)
+
+    assert len(listener.queue) == 2
+    assert listener.dropped == 3
+
+
+def test_decoder_reports_dropped():
+    decoder = Decoder()
+    decoder.feed(Encoder().encode([], dropped=7))
+
+    assert decoder.dropped == 7
+
+
+@pytest.mark.parametrize(
+    "channel, expected",
+    [
+        ("localhost:1234", ("localhost", 1234)),
+        ("tcp://10.0.0.2:1234", ("10.0.0.2", 1234)),
+        ("unix:///tmp/can.sock", "/tmp/can.sock"),
+    ],
+)
+def test_parse_address(channel, expected):
+    assert parse_address(channel)[1] == expected
+
+
+def test_remote_bus_over_loopback():
+    messages = list(TrafficGenerator.uniform(5).messages(0.1))
+    sender = can.Bus(interface="virtual", channel="remote")
+    bus = can.Bus(interface="virtual", channel="remote")
+    agent = CaptureAgent(bus, "127.0.0.1:0", interval=0.001)
+    agent.start()
+    host, port = agent.address
+    try:
+        with RemoteBus(f"{host}:{port}") as remote:
+            # Note: frames are only queued once a viewer is connected
+            while not agent._listener.connected:
+                remote.recv(0.01)
+            for msg in messages:
+                sender.send(msg)
+            received = [remote.recv(1) for _ in messages]
+    finally:
+        agent.stop()
+        sender.shutdown()
+        bus.shutdown()
+
+    assert [bytes(msg.data) for msg in received] == [
+        bytes(msg.data) for msg in messages
+    ]
+    assert remote.dropped == 0
+
+
+def test_agent_notices_idle_viewer_disconnect():
+    bus = can.Bus(interface="virtual", channel="remote_idle")
+    agent = CaptureAgent(bus, "127.0.0.1:0", interval=0.001)
+    agent.start()
+    host, port = agent.address
+    try:
+        with RemoteBus(f"{host}:{port}") as remote:
+            while not agent._listener.connected:
+                remote.recv(0.01)
+
+        deadline = time.monotonic() + 5
+        while agent._listener.connected:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        agent.stop()
+        bus.shutdown()
+
+
+def test_recorder_health_reports_frames_dropped_by_agent():
+    remote = Mock(spec=RemoteBus, dropped=7)
+    recorder = Recorder()
+    recorder.set_bus(remote)
+
+    assert recorder.health.snapshot().dropped == 7
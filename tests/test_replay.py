@@ -0,0 +1,119 @@
+import time
+
+import can
+import pytest
+from can_explorer import indexer
+from can_explorer.can_bus import Recorder
+from can_explorer.generator import TrafficGenerator
+from can_explorer.pipeline import Stage
+from can_explorer.replay import Replay, ReplayBus
+
+MESSAGES = list(TrafficGenerator.uniform(10, rate=100).messages(1))
+
+
+class Collect(can.Listener):
+    def __init__(self):
+        self.messages = []
+
+    def on_message_received(self, msg):
+        self.messages.append(msg)
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "capture.log"
+    writer = can.CanutilsLogWriter(path)
+    for msg in MESSAGES:
+        writer.on_message_received(msg)
+    writer.stop()
+    yield indexer.build(path, block_size=4096)
+
+
+def timestamps(messages):
+    return [msg.timestamp for msg in messages]
+
+
+def test_replay_preserves_timing_at_speed(index):
+    collect = Collect()
+    player = Replay(index, collect, speed=10)
+    start = time.perf_counter()
+    player.start()
+
+    assert player.wait(5)
+    assert time.perf_counter() - start == pytest.approx(0.1, abs=0.05)
+    assert timestamps(collect.messages) == pytest.approx(timestamps(MESSAGES))
+    assert player.lag < 0.005
+
+
+def test_replay_resumes_after_pausing(index):
+    collect = Collect()
+    player = Replay(index, collect, speed=None)
+
+    def pause(msg):
+        collect.messages.append(msg)
+        if len(collect.messages) == 100:
+            player.stop()
+
+    collect.on_message_received = pause
+    player.start()
+    time.sleep(0.1)
+    assert len(collect.messages) == 100 and not player.is_finished()
+
+    player.start()
+    assert player.wait(5)
+    assert timestamps(collect.messages) == pytest.approx(timestamps(MESSAGES))
+    player.close()
+
+
+def test_replay_seeks_to_timestamp(index):
+    collect = Collect()
+    player = Replay(index, collect, speed=None)
+    middle = MESSAGES[len(MESSAGES) // 2].timestamp
+    player.seek(middle)
+    player.start()
+
+    assert player.wait(5)
+    assert timestamps(collect.messages) == pytest.approx(
+        [ts for ts in timestamps(MESSAGES) if ts >= middle]
+    )
+
+
+def test_replay_bus_feeds_recorder_pipeline(index):
+    class Plugin(Stage):
+        frames = 0
+
+        def process(self, batch):
+            self.frames += len(batch.messages)
+
+    recorder = Recorder()
+    plugin = recorder.pipeline.add(Plugin())
+    bus = ReplayBus(index, speed=None)
+    recorder.set_bus(bus)
+    recorder.start()
+    try:
+        bus.player.start()
+        assert bus.player.wait(5)
+        deadline = time.monotonic() + 5
+        while sum(buffer.count for buffer in recorder.values()) < len(MESSAGES):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        recorder.stop()
+        bus.shutdown()
+
+    assert plugin.frames == len(MESSAGES)
+
+
+def test_app_shuts_down_buses_replaced_by_replay(fake_app, index):
+    bus = can.Bus(interface="virtual", channel="replaced")
+    fake_app.set_bus(bus)
+    fake_app.set_replay(index.path)
+    replay_bus = fake_app.buses[""]
+
+    assert bus._is_shutdown
+    assert fake_app.player is replay_bus.player
+
+    fake_app.close()
+
+    assert replay_bus._is_shutdown
+    assert fake_app.player is None and not fake_app.buses
@@ -0,0 +1,166 @@
+import asyncio
+import threading
+import time
+
+import can
+import pytest
+from can_explorer import ring
+from can_explorer.can_bus import CanKey, Recorder
+from can_explorer.generator import TrafficGenerator
+from can_explorer.pipeline import Batch
+
+MESSAGES = list(TrafficGenerator.uniform(5, rate=100).messages(2))
+
+
+def record(directory, messages, channel="", **kwargs):
+    recorder = ring.RingRecorder(directory, **kwargs)
+    for i in range(0, len(messages), 100):
+        recorder.process(Batch(channel, messages[i : i + 100]))
+    recorder.close()
+    return recorder
+
+
+def fields(msg):
+    return (
+        msg.timestamp,
+        msg.arbitration_id,
+        msg.is_extended_id,
+        msg.is_remote_frame,
+        msg.is_fd,
+        msg.bitrate_switch,
+        msg.dlc,
+        bytes(msg.data),
+    )
+
+
+@pytest.mark.parametrize("codec", sorted(ring.CODECS))
+def test_frames_are_read_back(tmp_path, codec):
+    messages = [
+        *MESSAGES,
+        can.Message(arbitration_id=0x1ABCDEF, is_extended_id=True, data=[1]),
+        can.Message(arbitration_id=0x10, is_remote_frame=True, dlc=4),
+        can.Message(
+            arbitration_id=0x20, is_fd=True, bitrate_switch=True, data=range(64)
+        ),
+    ]
+    record(tmp_path, messages, "can1", codec=codec)
+    frames = list(ring.read(tmp_path))
+
+    assert list(map(fields, frames)) == list(map(fields, messages))
+    assert {msg.channel for msg in frames} == {"can1"}
+
+
+def test_index_has_time_range_and_ids(tmp_path):
+    record(tmp_path, MESSAGES, block_frames=100)
+    (path,) = ring.segments(tmp_path)
+    index = ring.load_index(path)
+
+    assert ring.index_path(path).exists()
+    assert index.frames == len(MESSAGES)
+    assert index.start == MESSAGES[0].timestamp
+    assert index.stop == MESSAGES[-1].timestamp
+    assert len(index.blocks) == len(MESSAGES) // 100
+    assert index.ids == {
+        CanKey(can_id): 200 for can_id in {msg.arbitration_id for msg in MESSAGES}
+    }
+
+
+def test_segments_rotate_and_oldest_are_deleted(tmp_path):
+    record(tmp_path, MESSAGES, segment_size=1024, segments=3, block_frames=100)
+    paths = ring.segments(tmp_path)
+    frames = list(ring.read(tmp_path))
+
+    assert len(paths) == 3
+    assert len(frames) < len(MESSAGES)
+    assert [path.stem for path in paths] == sorted(path.stem for path in paths)
+    assert len(list(tmp_path.glob("*.json"))) == 3
+    # The newest frames are kept
+    assert list(map(fields, frames)) == list(
+        map(fields, MESSAGES[len(MESSAGES) - len(frames) :])
+    )
+
+
+def test_read_skips_blocks_outside_window(tmp_path):
+    record(tmp_path, MESSAGES, block_frames=100)
+    start = MESSAGES[300].timestamp
+    stop = MESSAGES[600].timestamp
+    expected = [msg for msg in MESSAGES if start <= msg.timestamp <= stop]
+
+    assert list(map(fields, ring.read(tmp_path, start, stop))) == list(
+        map(fields, expected)
+    )
+
+
+def test_unclosed_segment_is_indexed_from_blocks(tmp_path):
+    recorder = ring.RingRecorder(tmp_path, block_frames=100)
+    # Note: blocks are written once a batch brings them to block_frames
+    for i in range(0, 250, 100):
+        recorder.process(Batch("", MESSAGES[i : min(i + 100, 250)]))
+    (path,) = ring.segments(tmp_path)
+    index = ring.load_index(path)
+
+    assert not ring.index_path(path).exists()
+    assert index.frames == 200
+    assert len(list(ring.read(tmp_path))) == 200
+    recorder.close()
+
+
+def test_blocks_are_written_after_flush_interval(tmp_path):
+    now = [0.0]
+    recorder = ring.RingRecorder(tmp_path, clock=lambda: now[0])
+    recorder.process(Batch("", MESSAGES[:10]))
+    now[0] = 2.0
+    recorder.process(Batch("", MESSAGES[10:20]))
+
+    assert len(list(ring.read(tmp_path))) == 20
+    recorder.close()
+
+
+def test_recorder_writes_while_receiving(tmp_path):
+    recorder = Recorder()
+    ring_recorder = recorder.pipeline.add(ring.RingRecorder(tmp_path))
+    sender = can.Bus(interface="virtual", channel="ring")
+    bus = can.Bus(interface="virtual", channel="ring")
+    recorder.set_bus(bus)
+    recorder.start()
+    try:
+        for msg in MESSAGES:
+            sender.send(msg)
+        deadline = time.monotonic() + 5
+        while sum(buffer.count for buffer in recorder.values()) < len(MESSAGES):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        recorder.stop()
+        sender.shutdown()
+        bus.shutdown()
+
+    assert ring_recorder.dropped == 0
+    assert len(list(ring.read(tmp_path))) == len(MESSAGES)
+
+
+def test_stalled_writer_shows_in_health(tmp_path):
+    release = threading.Event()
+
+    class Stalled(ring.RingRecorder):
+        def process(self, batch):
+            release.wait()
+            return super().process(batch)
+
+    recorder = Recorder()
+    recorder.pipeline.queue_size = 1
+    stalled = recorder.pipeline.add(Stalled(tmp_path))
+
+    async def main():
+        run = asyncio.ensure_future(recorder.pipeline.run({}))
+        await asyncio.sleep(0)
+        for i in range(0, len(MESSAGES), 100):
+            recorder.pipeline.process(Batch("", MESSAGES[i : i + 100]))
+        release.set()
+        recorder.pipeline._stopping.set()
+        await run
+
+    asyncio.run(main())
+
+    assert stalled.dropped > 0
+    assert recorder.health.snapshot().plugins_dropped == stalled.dropped
@@ -0,0 +1,104 @@
+import time
+
+import pytest
+from can_explorer import session
+from can_explorer.can_bus import CanKey, PayloadBuffer, Recorder, _Listener
+from can_explorer.generator import TrafficGenerator
+
+
+@pytest.fixture
+def recorder():
+    recorder = Recorder()
+    listener = _Listener(recorder)
+    TrafficGenerator.uniform(20).feed(listener, 1)
+    TrafficGenerator.uniform(5, length=64, is_fd=True).feed(listener, 1)
+    yield recorder
+
+
+def test_session_round_trip(tmp_path, recorder):
+    path = tmp_path / "session.bin"
+    session.save(path, recorder, dict(SETTINGS_ID_FORMAT="Dec"))
+    saved = session.load(path)
+
+    assert saved.settings == dict(SETTINGS_ID_FORMAT="Dec")
+    assert set(saved.buffers) == set(recorder)
+    for key, buffer in recorder.items():
+        assert saved.buffers[key][:] == buffer[:]
+        assert saved.buffers[key].timestamps() == buffer.timestamps()
+        assert saved.buffers[key].count == buffer.count
+
+
+def test_session_buffers_accept_new_payloads(tmp_path, recorder):
+    path = tmp_path / "session.bin"
+    session.save(path, recorder, {})
+    before = path.read_bytes()
+
+    buffer = next(iter(session.load(path).buffers.values()))
+    buffer.append(b"\xff" * buffer.width)
+
+    assert buffer[-1] == int.from_bytes(b"\xff" * buffer.width, "big")
+    assert path.read_bytes() == before
+
+
+def test_session_keeps_payloads_held(tmp_path):
+    recorder = Recorder()
+    buffer = recorder[CanKey(1)]
+    for i in range(300):
+        buffer.append(i.to_bytes(8, "big"), timestamp=i / 100)
+    buffer.resize(PayloadBuffer.MIN)
+    buffer.resize(PayloadBuffer.MAX)
+    for i in range(300, 351):
+        buffer.append(i.to_bytes(8, "big"), timestamp=i / 100)
+    path = tmp_path / "session.bin"
+    session.save(path, recorder, {})
+
+    saved = session.load(path).buffers[CanKey(1)]
+
+    assert saved.held == buffer.held == 51
+    assert saved.rate() == pytest.approx(100)
+
+
+def test_session_can_be_saved_over_while_loaded(tmp_path, recorder):
+    path = tmp_path / "session.bin"
+    session.save(path, recorder, {})
+    buffers = session.load(path).buffers
+    session.save(path, buffers, dict(SETTINGS_ID_FORMAT="Dec"))
+
+    saved = session.load(path)
+
+    assert saved.settings == dict(SETTINGS_ID_FORMAT="Dec")
+    for key, buffer in recorder.items():
+        assert saved.buffers[key][:] == buffer[:]
+
+
+def test_session_loads_quickly(tmp_path):
+    recorder = Recorder()
+    TrafficGenerator.uniform(1000).feed(_Listener(recorder), 0.05)
+    path = tmp_path / "session.bin"
+    session.save(path, recorder, {})
+
+    start = time.perf_counter()
+    saved = session.load(path)
+
+    assert time.perf_counter() - start < 1
+    assert len(saved.buffers) == 1000
+
+
+def test_session_rejects_other_files(tmp_path):
+    path = tmp_path / "session.bin"
+    path.write_bytes(bytes(64))
+
+    with pytest.raises(ValueError):
+        session.load(path)
+
+
+def test_app_restores_session(tmp_path, fake_app, fake_manager, fake_recorder):
+    fake_recorder[CanKey(1)].append(b"\x01")
+    path = tmp_path / "session.bin"
+    fake_app.save_session(path, {})
+    fake_recorder.clear()
+
+    fake_app.load_session(path)
+
+    assert list(fake_recorder) == [CanKey(1)]
+    assert list(fake_manager.row) == [CanKey(1)]
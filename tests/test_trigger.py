@@ -0,0 +1,69 @@
+import can
+import pytest
+from can_explorer.can_bus import Recorder, _Listener
+from can_explorer.generator import Signal, TrafficGenerator
+from can_explorer.trigger import ByteMatch, IdSeen, Threshold, Trigger
+
+SIGNALS = [Signal(0x100, 100), Signal(0x200, 100), Signal(0x300, 10)]
+
+
+@pytest.fixture
+def recorder():
+    yield Recorder()
+
+
+def feed(recorder, duration=2.0):
+    TrafficGenerator(SIGNALS).feed(_Listener(recorder), duration)
+
+
+def test_recorder_is_not_armed_without_triggers(recorder):
+    assert not recorder.triggers.armed
+
+
+def test_trigger_captures_window_across_all_ids(recorder):
+    # Counter payload of 0x100 reaches 100 at t == 1.0
+    condition = ByteMatch(0x100, index=7, value=100)
+    recorder.triggers.add(Trigger(condition, pre=0.5, post=0.25, single=True))
+    feed(recorder)
+
+    (snapshot,) = recorder.triggers.snapshots
+    assert snapshot.timestamp == pytest.approx(1.0)
+    assert set(snapshot.windows) == set(recorder)
+    window = snapshot.windows[0x100, False, False, ""]
+    assert window.timestamps[0] == pytest.approx(0.5)
+    assert window.timestamps[-1] == pytest.approx(1.25)
+    assert len(snapshot.windows[0x300, False, False, ""].timestamps) == 8
+
+
+def test_trigger_rearms_after_capture(recorder):
+    recorder.triggers.add(Trigger(IdSeen(0x300), pre=0, post=0.5))
+    feed(recorder)
+    recorder.triggers.flush(recorder)
+
+    assert [s.timestamp for s in recorder.triggers.snapshots] == pytest.approx(
+        [0.0, 0.5, 1.0, 1.5]
+    )
+
+
+@pytest.mark.parametrize("rising, expected", [(True, 0.5), (False, None)])
+def test_threshold_trigger_detects_crossing(recorder, rising, expected):
+    condition = Threshold(0x100, start=7, threshold=50, rising=rising)
+    recorder.triggers.add(Trigger(condition, pre=0, post=0, single=True))
+    feed(recorder, 1.0)
+    recorder.triggers.flush(recorder)
+
+    timestamps = [s.timestamp for s in recorder.triggers.snapshots]
+    assert timestamps == ([pytest.approx(expected)] if expected else [])
+
+
+def test_snapshot_saves_log(tmp_path, recorder):
+    recorder.triggers.add(Trigger(IdSeen(0x300), pre=0.1, post=0.1, single=True))
+    feed(recorder)
+    path = tmp_path / "snapshot.log"
+
+    snapshot = recorder.triggers.snapshots[0]
+    snapshot.save(path)
+
+    messages = list(can.LogReader(path))
+    assert len(messages) == sum(len(w.timestamps) for w in snapshot.windows.values())
+    assert [m.timestamp for m in messages] == sorted(m.timestamp for m in messages)
@@ -1,10 +1,12 @@
 from random import sample
 from time import sleep
+from unittest.mock import patch
 
 import dearpygui.dearpygui as dpg
 import pytest
-from can_explorer.app import settings_apply_button_callback
-from can_explorer.layout import Tag
+from can_explorer.app import heatmap_color_callback, settings_apply_button_callback
+from can_explorer.can_bus import CanKey
+from can_explorer.layout import Tag, _tab_callback
 
 DELAY = 0.1
 
@@ -32,7 +34,7 @@ def test_app_populates_data_in_ascending_order(fake_app, fake_manager, fake_reco
 
     sleep(DELAY)
     sorted_data = list(sorted(data))
-    sorted_keys = list(fake_manager.row.keys())
+    sorted_keys = fake_manager.ids()
 
     assert sorted_data == sorted_keys
 
@@ -53,3 +55,41 @@ def test_app_must_be_inactive_to_apply_settings(app):
     dpg.set_value(Tag.SETTINGS_INTERFACE, None)
     with pytest.raises(RuntimeError):
         settings_apply_button_callback(None, None, None)
+
+
+def test_app_groups_plots_by_channel(fake_app, fake_manager, fake_recorder):
+    keys = [CanKey(i, channel=channel) for i in (3, 1, 2) for channel in ("b", "a")]
+    for key in keys:
+        fake_recorder[key] = [0]
+
+    fake_app.set_group_channels(True)
+    assert fake_manager.ids() == sorted(keys, key=lambda key: (key.channel, key))
+
+    fake_app.set_group_channels(False)
+    assert fake_manager.ids() == sorted(keys)
+
+
+def test_app_does_not_recreate_evicted_ids(fake_app, fake_manager, fake_recorder):
+    for i in range(3):
+        fake_recorder[i] = [0]
+    add = fake_manager.add
+
+    def evict_while_adding(can_id, payloads):
+        # As the budget would on the ingest thread
+        fake_recorder.pop(2, None)
+        add(can_id, payloads)
+
+    with patch.object(fake_manager, "add", side_effect=evict_while_adding):
+        fake_app.step()
+
+    assert sorted(fake_recorder) == [0, 1]
+    assert fake_manager.ids() == [0, 1]
+
+
+def test_app_wires_view_callbacks_on_setup(app):
+    header = dpg.get_item_configuration(Tag.HEADER)["callback"]
+    color = dpg.get_item_configuration(Tag.HEATMAP_COLOR)["callback"]
+
+    # Note: before setup the header only switches tabs
+    assert header is not _tab_callback
+    assert color is heatmap_color_callback